@@ -0,0 +1,213 @@
+# Tables whose writes change the rollups. Doctors are joined at query time (the table is small),
+# so renaming a doctor or moving them to another department needs no rollup maintenance.
+ANALYTICS_TABLES = {'Appointments', 'MedicalRecords'}
+
+# Dimensions of the appointment cube: SQL over AppointmentCube (alias a) joined to Doctors (alias d)
+DIMENSIONS = {
+    'Day': "a.AppointmentDate",
+    'Month': "substr(a.AppointmentDate, 1, 7)",
+    'Year': "substr(a.AppointmentDate, 1, 4)",
+    'Doctor': "a.DoctorID",
+    'Department': "IFNULL(d.Department, '')",
+    'Clinic': "a.Location",
+    'Status': "a.Status",
+}
+
+# Statuses that close an appointment; the no-show rate is No Show over both
+ATTENDANCE_STATUSES = ('Completed', 'No Show')
+
+def _increment(table, keys, values):
+    return f'''
+                INSERT INTO {table} ({', '.join(keys)}, Count) VALUES ({', '.join(values)}, 1)
+                ON CONFLICT ({', '.join(keys)}) DO UPDATE SET Count = Count + 1;'''
+
+def _decrement(table, keys, values):
+    match = ' AND '.join(f'{key} = {value}' for key, value in zip(keys, values))
+    return f'''
+                UPDATE {table} SET Count = Count - 1 WHERE {match};
+                DELETE FROM {table} WHERE {match} AND Count <= 0;'''
+
+# Move the diagnosis counts of one appointment's records from one doctor to another
+def _move_records(appointment_id, from_doctor, to_doctor):
+    return f'''
+                UPDATE DiagnosisCube SET Count = Count - (
+                    SELECT COUNT(*) FROM MedicalRecords r
+                    WHERE r.AppointmentID = {appointment_id} AND IFNULL(r.Diagnosis, '') = DiagnosisCube.Diagnosis)
+                WHERE DoctorID = {from_doctor}
+                AND Diagnosis IN (SELECT IFNULL(Diagnosis, '') FROM MedicalRecords WHERE AppointmentID = {appointment_id});
+                DELETE FROM DiagnosisCube WHERE DoctorID = {from_doctor} AND Count <= 0;
+                INSERT INTO DiagnosisCube (DoctorID, Diagnosis, Count)
+                SELECT {to_doctor}, IFNULL(Diagnosis, ''), COUNT(*) FROM MedicalRecords
+                WHERE AppointmentID = {appointment_id} GROUP BY 2
+                ON CONFLICT (DoctorID, Diagnosis) DO UPDATE SET Count = Count + excluded.Count;'''
+
+# Migration: rollup tables kept current by triggers.
+# AppointmentCube counts appointments per day x doctor x clinic x status; DiagnosisCube counts
+# medical records per doctor x diagnosis (departments come from Doctors when queried).
+# Missing values are stored as '' or doctor 0 so they still have a cell.
+def create_analytics_tables(c):
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS AppointmentCube (
+            AppointmentDate TEXT NOT NULL,
+            DoctorID INTEGER NOT NULL,
+            Location TEXT NOT NULL,
+            Status TEXT NOT NULL,
+            Count INTEGER NOT NULL,
+            PRIMARY KEY (AppointmentDate, DoctorID, Location, Status)
+        ) WITHOUT ROWID
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS DiagnosisCube (
+            DoctorID INTEGER NOT NULL,
+            Diagnosis TEXT NOT NULL,
+            Count INTEGER NOT NULL,
+            PRIMARY KEY (DoctorID, Diagnosis)
+        ) WITHOUT ROWID
+    ''')
+
+    keys = ['AppointmentDate', 'DoctorID', 'Location', 'Status']
+    new = ["IFNULL(new.AppointmentDate, '')", "IFNULL(new.DoctorID, 0)", "IFNULL(new.Location, '')", "IFNULL(new.Status, '')"]
+    old = ["IFNULL(old.AppointmentDate, '')", "IFNULL(old.DoctorID, 0)", "IFNULL(old.Location, '')", "IFNULL(old.Status, '')"]
+    c.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS Appointments_cube_ai AFTER INSERT ON Appointments BEGIN{_increment('AppointmentCube', keys, new)}{_move_records('new.AppointmentID', '0', 'IFNULL(new.DoctorID, 0)')}
+        END
+    ''')
+    # Records of a deleted appointment stay, without a doctor
+    c.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS Appointments_cube_ad AFTER DELETE ON Appointments BEGIN{_decrement('AppointmentCube', keys, old)}{_move_records('old.AppointmentID', 'IFNULL(old.DoctorID, 0)', '0')}
+        END
+    ''')
+    changed = ' OR '.join(f'{o} != {n}' for o, n in zip(old, new))
+    c.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS Appointments_cube_au AFTER UPDATE OF AppointmentDate, DoctorID, Location, Status ON Appointments
+        WHEN {changed} BEGIN{_decrement('AppointmentCube', keys, old)}{_increment('AppointmentCube', keys, new)}
+        END
+    ''')
+    c.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS Appointments_cube_doctor_au AFTER UPDATE OF DoctorID ON Appointments
+        WHEN IFNULL(old.DoctorID, 0) != IFNULL(new.DoctorID, 0) BEGIN{_move_records('new.AppointmentID', 'IFNULL(old.DoctorID, 0)', 'IFNULL(new.DoctorID, 0)')}
+        END
+    ''')
+
+    doctor = "IFNULL((SELECT DoctorID FROM Appointments WHERE AppointmentID = {}.AppointmentID), 0)"
+    record_keys = ['DoctorID', 'Diagnosis']
+    new_record = [doctor.format('new'), "IFNULL(new.Diagnosis, '')"]
+    old_record = [doctor.format('old'), "IFNULL(old.Diagnosis, '')"]
+    c.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS MedicalRecords_cube_ai AFTER INSERT ON MedicalRecords BEGIN{_increment('DiagnosisCube', record_keys, new_record)}
+        END
+    ''')
+    c.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS MedicalRecords_cube_ad AFTER DELETE ON MedicalRecords BEGIN{_decrement('DiagnosisCube', record_keys, old_record)}
+        END
+    ''')
+    c.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS MedicalRecords_cube_au AFTER UPDATE OF AppointmentID, Diagnosis ON MedicalRecords BEGIN{_decrement('DiagnosisCube', record_keys, old_record)}{_increment('DiagnosisCube', record_keys, new_record)}
+        END
+    ''')
+
+    rebuild_analytics(c)
+
+# Recompute the rollups from the base tables
+def rebuild_analytics(c):
+    c.execute("DELETE FROM AppointmentCube")
+    c.execute('''
+        INSERT INTO AppointmentCube (AppointmentDate, DoctorID, Location, Status, Count)
+        SELECT IFNULL(AppointmentDate, ''), IFNULL(DoctorID, 0), IFNULL(Location, ''), IFNULL(Status, ''), COUNT(*)
+        FROM Appointments GROUP BY 1, 2, 3, 4
+    ''')
+    c.execute("DELETE FROM DiagnosisCube")
+    c.execute('''
+        INSERT INTO DiagnosisCube (DoctorID, Diagnosis, Count)
+        SELECT IFNULL(a.DoctorID, 0), IFNULL(r.Diagnosis, ''), COUNT(*)
+        FROM MedicalRecords r LEFT JOIN Appointments a ON a.AppointmentID = r.AppointmentID
+        GROUP BY 1, 2
+    ''')
+
+# A rollup table together with the same table in attached archive partitions (archive.archives_for)
+def _rollup(table, archives):
+    if not archives:
+        return table
+    return "(" + " UNION ALL ".join([f"SELECT * FROM {table}"] + [f"SELECT * FROM {schema}.{table}" for schema in archives]) + ")"
+
+# Appointment counts grouped by `group_by` dimensions, e.g. ['Month', 'Department'].
+# `filters` maps dimensions to allowed values, `start`/`end` bound AppointmentDate (inclusive),
+# which the cube's primary key turns into a range scan. Archived appointments are counted from the
+# cubes of the attached partitions named in `archives`. Returns rows of (*dimensions, count).
+def slice_cube(c, group_by=(), filters=None, start=None, end=None, archives=()):
+    unknown = [dim for dim in list(group_by) + list(filters or {}) if dim not in DIMENSIONS]
+    if unknown:
+        raise ValueError(f"Unknown dimensions: {', '.join(unknown)}")
+    conditions, params = [], []
+    if start:
+        conditions.append("a.AppointmentDate >= ?")
+        params.append(str(start))
+    if end:
+        conditions.append("a.AppointmentDate <= ?")
+        params.append(str(end))
+    for dim, values in (filters or {}).items():
+        values = list(values)
+        if values:
+            conditions.append(f"{DIMENSIONS[dim]} IN ({', '.join('?' for _ in values)})")
+            params += values
+
+    columns = [DIMENSIONS[dim] for dim in group_by]
+    query = f"SELECT {', '.join(columns + ['SUM(a.Count)'])} FROM {_rollup('AppointmentCube', archives)} a LEFT JOIN Doctors d ON d.DoctorID = a.DoctorID"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    if columns:
+        positions = ', '.join(str(i + 1) for i in range(len(columns)))
+        query += f" GROUP BY {positions} ORDER BY {positions}"
+    return c.execute(query, params).fetchall()
+
+# Per group: total appointments, no-shows and the no-show rate over attended + missed appointments.
+# Returns rows of (*dimensions, total, no_shows, no_show_rate).
+def no_show_rates(c, group_by, filters=None, start=None, end=None, archives=()):
+    rows = slice_cube(c, list(group_by) + ['Status'], filters, start, end, archives)
+    groups = {}
+    for row in rows:
+        key, status, count = tuple(row[:-2]), row[-2], row[-1]
+        totals = groups.setdefault(key, {})
+        totals[status] = totals.get(status, 0) + count
+    result = []
+    for key, totals in groups.items():
+        no_shows = totals.get('No Show', 0)
+        closed = sum(totals.get(status, 0) for status in ATTENDANCE_STATUSES)
+        result.append(key + (sum(totals.values()), no_shows, no_shows / closed if closed else None))
+    return result
+
+# Medical record counts per department and diagnosis, most frequent first; with `archived` the
+# records of the archive partitions are counted too, from their totals in ArchivedDiagnoses
+def diagnosis_frequency(c, department=None, limit=None, archived=True):
+    source = "DiagnosisCube"
+    if archived:
+        source = "(SELECT DoctorID, Diagnosis, Count FROM DiagnosisCube UNION ALL SELECT DoctorID, Diagnosis, Count FROM ArchivedDiagnoses)"
+    query = f'''
+        SELECT IFNULL(d.Department, ''), r.Diagnosis, SUM(r.Count) FROM {source} r
+        LEFT JOIN Doctors d ON d.DoctorID = r.DoctorID
+    '''
+    params = []
+    if department is not None:
+        query += " WHERE IFNULL(d.Department, '') = ?"
+        params.append(department)
+    query += " GROUP BY 1, 2 ORDER BY 1, 3 DESC, 2"
+    if limit:
+        query += " LIMIT ?"
+        params.append(limit)
+    return c.execute(query, params).fetchall()
+
+# First and last appointment dates in the cube (two primary key seeks) and the archive partitions,
+# or (None, None) when empty
+def date_range(c):
+    return c.execute('''
+        SELECT NULLIF(MIN(IFNULL((SELECT MIN(AppointmentDate) FROM AppointmentCube WHERE AppointmentDate > ''), '9999'),
+                          IFNULL((SELECT MIN(FirstDate) FROM ArchivePartitions), '9999')), '9999'),
+               NULLIF(MAX(IFNULL((SELECT MAX(AppointmentDate) FROM AppointmentCube), ''),
+                          IFNULL((SELECT MAX(LastDate) FROM ArchivePartitions), '')), '')
+    ''').fetchone()
+
+# Values a dimension takes, for filter widgets
+def dimension_values(c, dim):
+    if dim == 'Department':
+        return [row[0] for row in c.execute("SELECT DISTINCT Department FROM Doctors WHERE Department IS NOT NULL ORDER BY 1")]
+    return [row[0] for row in slice_cube(c, [dim])]
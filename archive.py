@@ -0,0 +1,379 @@
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+from db import DATABASE, connect, get_database
+
+# Closed appointments older than this many days leave the active tables at the next archive run
+ARCHIVE_AFTER_DAYS = 730
+# Only appointments in these states are archived; anything still open stays active however old
+ARCHIVE_STATUSES = ('Completed', 'Cancelled', 'No Show')
+# Appointments moved per write transaction, so the writer lock is never held for long
+ARCHIVE_BATCH = 2000
+# Seconds between two runs of the scheduled archive and compaction job
+ARCHIVE_INTERVAL = 24 * 3600
+# Free pages returned to the file system per transaction when compacting the active database
+COMPACT_PAGES = 2000
+
+APPOINTMENT_COLUMNS = "AppointmentID, PatientID, DoctorID, AppointmentDate, AppointmentTime, Status, Location"
+RECORD_COLUMNS = "RecordID, AppointmentID, Diagnosis, Details"
+
+# The tables of a partition file: archived rows as they were, plus the appointment and diagnosis
+# rollups of those rows in the same shape as AppointmentCube and DiagnosisCube
+def create_partition_tables(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS Appointments (
+            AppointmentID INTEGER PRIMARY KEY,
+            PatientID INTEGER,
+            DoctorID INTEGER,
+            AppointmentDate TEXT,
+            AppointmentTime TEXT,
+            Status TEXT,
+            Location TEXT
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS MedicalRecords (
+            RecordID INTEGER PRIMARY KEY,
+            AppointmentID INTEGER,
+            Diagnosis TEXT,
+            Details TEXT
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_appointments_date ON Appointments (AppointmentDate)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_appointments_patient_date ON Appointments (PatientID, AppointmentDate, AppointmentTime)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_appointments_doctor_date ON Appointments (DoctorID, AppointmentDate, AppointmentTime)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_medicalrecords_appointment ON MedicalRecords (AppointmentID)")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS AppointmentCube (
+            AppointmentDate TEXT NOT NULL,
+            DoctorID INTEGER NOT NULL,
+            Location TEXT NOT NULL,
+            Status TEXT NOT NULL,
+            Count INTEGER NOT NULL,
+            PRIMARY KEY (AppointmentDate, DoctorID, Location, Status)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS DiagnosisCube (
+            DoctorID INTEGER NOT NULL,
+            Diagnosis TEXT NOT NULL,
+            Count INTEGER NOT NULL,
+            PRIMARY KEY (DoctorID, Diagnosis)
+        ) WITHOUT ROWID
+    ''')
+
+# File of a partition: healthcare.db keeps 2023 in healthcare.archive2023.db
+def partition_file(path, partition):
+    base, extension = os.path.splitext(os.path.basename(path))
+    return f"{base}.archive{partition}{extension or '.db'}"
+
+# Directory of the file `conn` has open as main; partition files are found next to it, so a
+# replica (a copy of the database elsewhere in the same folder) reads the same partitions
+def _directory(conn):
+    for _, name, path in conn.execute("PRAGMA database_list").fetchall():
+        if name == 'main':
+            return os.path.dirname(path)
+    return ''
+
+# Partitions (rows of ArchivePartitions, see schema.py) holding appointments between `start` and
+# `end` (inclusive, either may be None), oldest first, as (partition, path) pairs
+def archive_partitions(conn, start=None, end=None):
+    conditions, params = [], []
+    if start:
+        conditions.append("LastDate >= ?")
+        params.append(str(start))
+    if end:
+        conditions.append("FirstDate <= ?")
+        params.append(str(end))
+    query = "SELECT Partition, FileName FROM ArchivePartitions"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    directory = _directory(conn)
+    return [(partition, os.path.join(directory, file_name))
+            for partition, file_name in conn.execute(query + " ORDER BY Partition", params).fetchall()]
+
+# Attach the archive partitions a date range needs to the connection behind `c` for the duration of
+# the block. Yields (cursor, schemas): `c` itself and no schemas when the range is all in the active
+# tables, otherwise the bare connection (results over attached files are not cached) and the schema
+# names to pass to union_source().
+@contextmanager
+def archives_for(c, start=None, end=None):
+    conn = getattr(c, 'connection', c)
+    partitions = archive_partitions(conn, start, end)
+    if not partitions:
+        yield c, []
+        return
+    schemas = []
+    try:
+        for partition, path in partitions:
+            schema = f"archive{partition}"
+            conn.execute("ATTACH DATABASE ? AS " + schema, (path,))
+            schemas.append(schema)
+        yield conn, schemas
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        for schema in schemas:
+            conn.execute("DETACH DATABASE " + schema)
+
+# FROM clause source for `table` across the active database and the attached partitions `schemas`
+def union_source(table, columns, schemas):
+    if not schemas:
+        return table
+    parts = [f"SELECT {columns} FROM {table}"] + [f"SELECT {columns} FROM {schema}.{table}" for schema in schemas]
+    return "(" + " UNION ALL ".join(parts) + ")"
+
+# Appointments dated between `start` and `end` (inclusive), from the active table and only the
+# partitions the range reaches, in date order. Optionally for one patient or doctor; at most `limit`.
+def appointments_between(c, start, end, patient_id=None, doctor_id=None, limit=1000):
+    with archives_for(c, start, end) as (cursor, schemas):
+        conditions, params = ["AppointmentDate >= ?", "AppointmentDate <= ?"], [str(start), str(end)]
+        if patient_id is not None:
+            conditions.append("PatientID = ?")
+            params.append(patient_id)
+        if doctor_id is not None:
+            conditions.append("DoctorID = ?")
+            params.append(doctor_id)
+        query = f'''
+            SELECT {APPOINTMENT_COLUMNS} FROM {union_source('Appointments', APPOINTMENT_COLUMNS, schemas)}
+            WHERE {' AND '.join(conditions)}
+            ORDER BY AppointmentDate, AppointmentTime, AppointmentID LIMIT ?
+        '''
+        return cursor.execute(query, params + [limit]).fetchall(), [schema[len("archive"):] for schema in schemas]
+
+class Archive:
+    # Moves closed appointments older than the horizon, with their medical records, out of the active
+    # tables into one partition file per year, and compacts what is left behind. Every batch runs on
+    # the writer connection with the partition attached: rows are copied and committed to the
+    # partition, then deleted from the active tables, whose triggers take them out of the search
+    # indexes, rollups and timeline, so those describe the active rows only. Partitions keep their
+    # own rollups, updated with each batch, for the reporting queries that reach back that far.
+    def __init__(self, database, horizon_days=ARCHIVE_AFTER_DAYS, batch=ARCHIVE_BATCH):
+        self.database = database
+        self.horizon_days = horizon_days
+        self.batch = batch
+
+    def cutoff(self):
+        return (date.today() - timedelta(days=self.horizon_days)).isoformat()
+
+    # Archive everything dated before `before` (the horizon by default); returns per partition the
+    # numbers of appointments and medical records moved
+    def run(self, before=None):
+        before = str(before or self.cutoff())
+        moved = {}
+        while True:
+            with self.database.writer() as conn:
+                rows = conn.execute(f'''
+                    SELECT AppointmentID, substr(AppointmentDate, 1, 4) FROM Appointments
+                    WHERE AppointmentDate < ? AND AppointmentDate != ''
+                    AND Status IN ({', '.join('?' for _ in ARCHIVE_STATUSES)})
+                    ORDER BY AppointmentDate LIMIT ?
+                ''', (before, *ARCHIVE_STATUSES, self.batch)).fetchall()
+            if not rows:
+                break
+            partitions = {}
+            for appointment_id, partition in rows:
+                partitions.setdefault(partition, []).append(appointment_id)
+            for partition, ids in partitions.items():
+                appointments, records = self._move(partition, ids)
+                totals = moved.setdefault(partition, [0, 0])
+                totals[0] += appointments
+                totals[1] += records
+        return {partition: tuple(totals) for partition, totals in moved.items()}
+
+    def _path(self, partition):
+        return os.path.join(os.path.dirname(self.database.path), partition_file(self.database.path, partition))
+
+    def _move(self, partition, ids):
+        path = self._path(partition)
+        # Create the partition's tables with a connection of its own, outside the batch transactions
+        target = connect(path)
+        try:
+            create_partition_tables(target)
+        finally:
+            target.close()
+        with self.database.writer() as conn:
+            conn.execute("ATTACH DATABASE ? AS archive", (path,))
+            try:
+                # The batch's ids go into a temporary table rather than a bound parameter: the
+                # statement text is traced for every trigger statement the deletes run, bound
+                # values included
+                conn.execute("CREATE TEMP TABLE IF NOT EXISTS ArchiveBatch (AppointmentID INTEGER PRIMARY KEY)")
+                conn.execute("DELETE FROM ArchiveBatch")
+                conn.executemany("INSERT INTO ArchiveBatch (AppointmentID) VALUES (?)", [(row_id,) for row_id in ids])
+                # A transaction over two files is not atomic in WAL mode, so a batch takes two: the
+                # copy into the partition commits first, together with the partition's rollups, and
+                # only then are the copied rows deleted from the active tables. A crash in between
+                # leaves the rows in both files; the next run copies them again and deletes them.
+                with self.database.transaction() as conn:
+                    # Rows of the batch the partition already holds (from a run that stopped before its
+                    # delete) are taken out of it, rollups included, and copied afresh
+                    self._count_batch(conn, -1)
+                    conn.execute("DELETE FROM archive.MedicalRecords WHERE AppointmentID IN (SELECT AppointmentID FROM ArchiveBatch)")
+                    conn.execute("DELETE FROM archive.Appointments WHERE AppointmentID IN (SELECT AppointmentID FROM ArchiveBatch)")
+                    conn.execute(f'''
+                        INSERT INTO archive.Appointments ({APPOINTMENT_COLUMNS})
+                        SELECT {APPOINTMENT_COLUMNS} FROM Appointments WHERE AppointmentID IN (SELECT AppointmentID FROM ArchiveBatch)
+                    ''')
+                    conn.execute(f'''
+                        INSERT INTO archive.MedicalRecords ({RECORD_COLUMNS})
+                        SELECT {RECORD_COLUMNS} FROM MedicalRecords WHERE AppointmentID IN (SELECT AppointmentID FROM ArchiveBatch)
+                    ''')
+                    self._count_batch(conn, 1)
+                # Only rows the partition now holds leave the active tables
+                copied = ("AppointmentID IN (SELECT AppointmentID FROM ArchiveBatch) "
+                          "AND AppointmentID IN (SELECT AppointmentID FROM archive.Appointments)")
+                copied_records = ("RecordID IN (SELECT RecordID FROM archive.MedicalRecords "
+                                  "WHERE AppointmentID IN (SELECT AppointmentID FROM ArchiveBatch))")
+                with self.database.transaction() as conn:
+                    # The partition's date span is widened in the same transaction as the delete, so
+                    # a unified query never misses rows that just left the active tables
+                    conn.execute(f'''
+                        INSERT INTO ArchivePartitions (Partition, FileName, FirstDate, LastDate, ArchivedAt)
+                        SELECT ?, ?, MIN(AppointmentDate), MAX(AppointmentDate), datetime('now') FROM Appointments
+                        WHERE {copied}
+                        ON CONFLICT (Partition) DO UPDATE SET
+                            FirstDate = MIN(FirstDate, excluded.FirstDate), LastDate = MAX(LastDate, excluded.LastDate),
+                            ArchivedAt = excluded.ArchivedAt
+                    ''', (partition, os.path.basename(path)))
+                    # The all-time diagnosis counts keep the batch's records under their partition
+                    conn.execute(f'''
+                        INSERT INTO ArchivedDiagnoses (Partition, DoctorID, Diagnosis, Count)
+                        SELECT ?, IFNULL(a.DoctorID, 0), IFNULL(r.Diagnosis, ''), COUNT(*)
+                        FROM MedicalRecords r LEFT JOIN Appointments a ON a.AppointmentID = r.AppointmentID
+                        WHERE r.{copied_records}
+                        GROUP BY 2, 3
+                        ON CONFLICT (Partition, DoctorID, Diagnosis) DO UPDATE SET Count = Count + excluded.Count
+                    ''', (partition,))
+                    logged = conn.execute("SELECT IFNULL(MAX(Sequence), 0) FROM ChangeLog").fetchone()[0]
+                    # Records first: their rollup trigger looks up the doctor on the appointment
+                    records = conn.execute(f"DELETE FROM MedicalRecords WHERE {copied_records}").rowcount
+                    appointments = conn.execute(f"DELETE FROM Appointments WHERE {copied}").rowcount
+                    conn.execute('''
+                        UPDATE ArchivePartitions SET Appointments = Appointments + ?, MedicalRecords = MedicalRecords + ?
+                        WHERE Partition = ?
+                    ''', (appointments, records, partition))
+                    # Change log consumers (changelog.py) see the rows as archived, not deleted
+                    conn.execute("UPDATE ChangeLog SET Operation = 'archive' WHERE Sequence > ? AND Operation = 'delete'", (logged,))
+            finally:
+                conn.execute("DETACH DATABASE archive")
+        return appointments, records
+
+    # Add (sign 1) or take out (sign -1) the batch's rows in the partition from the partition's rollups
+    def _count_batch(self, conn, sign):
+        conn.execute('''
+            INSERT INTO archive.AppointmentCube (AppointmentDate, DoctorID, Location, Status, Count)
+            SELECT IFNULL(AppointmentDate, ''), IFNULL(DoctorID, 0), IFNULL(Location, ''), IFNULL(Status, ''), ? * COUNT(*)
+            FROM archive.Appointments WHERE AppointmentID IN (SELECT AppointmentID FROM ArchiveBatch)
+            GROUP BY 1, 2, 3, 4
+            ON CONFLICT (AppointmentDate, DoctorID, Location, Status) DO UPDATE SET Count = Count + excluded.Count
+        ''', (sign,))
+        conn.execute('''
+            INSERT INTO archive.DiagnosisCube (DoctorID, Diagnosis, Count)
+            SELECT IFNULL(a.DoctorID, 0), IFNULL(r.Diagnosis, ''), ? * COUNT(*)
+            FROM archive.MedicalRecords r LEFT JOIN archive.Appointments a ON a.AppointmentID = r.AppointmentID
+            WHERE r.AppointmentID IN (SELECT AppointmentID FROM ArchiveBatch)
+            GROUP BY 1, 2
+            ON CONFLICT (DoctorID, Diagnosis) DO UPDATE SET Count = Count + excluded.Count
+        ''', (sign,))
+        if sign < 0:
+            conn.execute("DELETE FROM archive.AppointmentCube WHERE Count = 0")
+            conn.execute("DELETE FROM archive.DiagnosisCube WHERE Count = 0")
+
+    # Compaction: partitions archived into since they were last compacted are vacuumed and analyzed
+    # once (they do not change until the next archive run). The active database gives the pages the
+    # archived rows used back in short incremental_vacuum steps, then is re-analyzed, and its WAL is
+    # truncated. The first compaction switches it to incremental auto-vacuum, which takes one full
+    # VACUUM holding the write lock, so run it at a quiet time.
+    def compact(self):
+        compacted = []
+        with self.database.writer() as conn:
+            partitions = conn.execute('''
+                SELECT Partition FROM ArchivePartitions
+                WHERE CompactedAt IS NULL OR CompactedAt < ArchivedAt ORDER BY Partition
+            ''').fetchall()
+        for (partition,) in partitions:
+            target = connect(self._path(partition))
+            try:
+                target.execute("ANALYZE")
+                target.execute("VACUUM")
+                target.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            finally:
+                target.close()
+            with self.database.transaction() as conn:
+                conn.execute("UPDATE ArchivePartitions SET CompactedAt = datetime('now') WHERE Partition = ?", (partition,))
+            compacted.append(partition)
+
+        with self.database.writer() as conn:
+            freed = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                conn.execute("VACUUM")
+        while True:
+            with self.database.writer() as conn:
+                if conn.execute("PRAGMA freelist_count").fetchone()[0] == 0:
+                    break
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute(f"PRAGMA incremental_vacuum({COMPACT_PAGES})").fetchall()
+                conn.execute("COMMIT")
+        with self.database.writer() as conn:
+            conn.execute("ANALYZE")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return compacted, freed
+
+class ArchiveJob:
+    # Runs the archive and then the compaction every `interval` seconds on a background thread
+    def __init__(self, archive, interval=ARCHIVE_INTERVAL):
+        self.archive = archive
+        self.interval = interval
+        self.last_run = None
+        self.failures = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name='archive-job', daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.archive.run()
+                self.archive.compact()
+                self.last_run = time.time()
+            except sqlite3.Error:
+                # Batches already moved stay moved; the next run carries on from there
+                self.failures += 1
+            self._stop.wait(self.interval)
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Move old closed appointments and their records to yearly archive files, then compact")
+    parser.add_argument('--database', default=DATABASE)
+    parser.add_argument('--days', type=int, default=ARCHIVE_AFTER_DAYS, help="archive appointments older than this many days")
+    parser.add_argument('--before', help="archive appointments dated before this day (YYYY-MM-DD) instead")
+    parser.add_argument('--compact-only', action='store_true')
+    parser.add_argument('--every', type=int, help="keep running, once every this many seconds (e.g. 86400)")
+    args = parser.parse_args()
+
+    archive = Archive(get_database(args.database), args.days)
+    if args.every:
+        job = ArchiveJob(archive, args.every)
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            job.close()
+    else:
+        if not args.compact_only:
+            before = datetime.strptime(args.before, '%Y-%m-%d').date() if args.before else None
+            for partition, (appointments, records) in sorted(archive.run(before).items()):
+                print(f"{partition}: {appointments} appointments, {records} medical records archived")
+        started = time.time()
+        partitions, freed = archive.compact()
+        print(f"Compacted {len(partitions)} partitions and {freed} free pages in {time.time() - started:.1f}s")
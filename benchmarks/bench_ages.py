@@ -0,0 +1,73 @@
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from demographics import age_histogram, age_histogram_from_counts, age_histogram_sql, ages, parse_dates
+
+# The per-row path the Home page used before demographics.py
+def calculate_age(dob):
+    today = datetime.now().date()
+    dob = datetime.strptime(dob, "%Y-%m-%d").date()
+    return today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))
+
+def random_birth_dates(n, seed):
+    rng = random.Random(seed)
+    start = date.today() - timedelta(days=100 * 365)
+    return [(start + timedelta(days=rng.randrange(100 * 365))).strftime('%Y-%m-%d') for _ in range(n)]
+
+def timed(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+def run(n, repeat, seed):
+    dobs = random_birth_dates(n, seed)
+
+    def per_row():
+        dob_df = pd.DataFrame(dobs, columns=['DateOfBirth'])
+        dob_df['Age'] = dob_df['DateOfBirth'].apply(calculate_age)
+        return age_histogram(dob_df['Age'].to_numpy())[0]
+
+    def vectorized():
+        return age_histogram(ages(parse_dates(dobs)))[0]
+
+    birth_date_counts = list(pd.Series(dobs).value_counts().items())
+
+    def summary_counts():
+        return age_histogram_from_counts(birth_date_counts)[0]
+
+    conn = sqlite3.connect(':memory:')
+    conn.execute("CREATE TABLE Patients (DateOfBirth TEXT)")
+    conn.executemany("INSERT INTO Patients VALUES (?)", [(dob,) for dob in dobs])
+
+    def sql_julianday():
+        return age_histogram_sql(conn)[0]
+
+    baseline, expected = timed(per_row, repeat)
+    print(f"{n:>10} patients  per-row apply      {baseline * 1000:9.1f} ms")
+    for name, fn in [("vectorized numpy", vectorized), ("birth-date counts", summary_counts), ("SQL julianday", sql_julianday)]:
+        elapsed, counts = timed(fn, repeat)
+        # julianday uses 365.25-day years, so a few patients near a bucket edge may move
+        drift = int(abs(counts - expected).sum())
+        print(f"{'':>10}           {name:<18} {elapsed * 1000:9.1f} ms  {baseline / elapsed:6.1f}x  (bin drift {drift})")
+    conn.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark age distribution paths for the Home page")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    for n in args.sizes:
+        run(n, args.repeat, args.seed)
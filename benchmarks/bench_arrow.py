@@ -0,0 +1,80 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pandas as pd
+import pyarrow as pa
+from streamlit import type_util
+
+from columnar import ArrowPage
+from db import connect, get_database
+from executor import STREAM_BATCH
+from pagination import LISTINGS, page_query
+from reference import get_reference_snapshot
+
+# The listing pipeline before columnar.py: rows as tuples, ids swapped for names in a list of lists,
+# an object-dtype DataFrame, then Streamlit's DataFrame-to-Arrow conversion
+def rows_pipeline(conn, listing, query, args, limit, names):
+    rows = []
+    cursor = conn.execute(query, args)
+    for batch in iter(lambda: cursor.fetchmany(STREAM_BATCH), []):
+        rows += batch
+    rows = [list(row) for row in rows[:limit]]
+    for index, table in listing['names'].items():
+        for row, name in zip(rows, names(table, [row[index] for row in rows])):
+            row[index] = name
+    rows = [tuple(row[:len(listing['columns'])]) for row in rows]
+    return type_util.data_frame_to_bytes(pd.DataFrame(rows, columns=listing['columns']))
+
+# The Arrow pipeline: each cursor batch goes into typed columns, and the table is sent as it is
+def arrow_pipeline(conn, listing, query, args, limit, names):
+    page = ArrowPage(listing, limit, names)
+    cursor = conn.execute(query, args)
+    for batch in iter(lambda: cursor.fetchmany(STREAM_BATCH), []):
+        page.append(batch)
+    return type_util.pyarrow_table_to_bytes(page.table())
+
+# Median time and peak memory of one pipeline run: Python objects (tracemalloc) plus Arrow buffers,
+# which Arrow allocates from its own pool
+def measure(pipeline, conn, listing, query, args, limit, names, runs):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        pipeline(conn, listing, query, args, limit, names)
+        timings.append(time.perf_counter() - started)
+    default_pool = pa.default_memory_pool()
+    arrow_pool = pa.proxy_memory_pool(default_pool)
+    pa.set_memory_pool(arrow_pool)
+    tracemalloc.start()
+    try:
+        payload = pipeline(conn, listing, query, args, limit, names)
+        peak = tracemalloc.get_traced_memory()[1] + arrow_pool.max_memory()
+    finally:
+        tracemalloc.stop()
+        pa.set_memory_pool(default_pool)
+    return statistics.median(timings), peak, len(payload)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare the row and Arrow listing pipelines")
+    parser.add_argument('--database', default='healthcare.db')
+    parser.add_argument('--rows', type=int, nargs='+', default=[50, 500, 10000])
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    database = get_database(args.database)
+    names = get_reference_snapshot(database).names
+    conn = connect(args.database, readonly=True)
+    print(f"{'listing':<16} {'rows':>6} {'pipeline':>8} {'time':>10} {'peak memory':>12} {'payload':>10}")
+    for name in ('Appointments', 'MedicalRecords'):
+        listing = LISTINGS[name]
+        for limit in args.rows:
+            query, query_args, _ = page_query(listing['select'], listing['source'], listing['key'], (),
+                                              None, (), None, limit, False)
+            for label, pipeline in (('rows', rows_pipeline), ('arrow', arrow_pipeline)):
+                seconds, peak, size = measure(pipeline, conn, listing, query, query_args, limit, names, args.runs)
+                print(f"{name:<16} {limit:>6} {label:>8} {seconds * 1000:>8.2f}ms {peak / 1024:>9.0f}KiB {size / 1024:>7.0f}KiB")
@@ -0,0 +1,345 @@
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta
+from datetime import time as dt_time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import generate_sample_data
+from crud import add_appointment, delete_appointment, get_write_queue, update_appointment
+from db import get_database
+from history import appointment_records, timeline_page
+from metrics import load_metrics
+from pagination import LISTINGS, DEFAULT_PAGE_SIZE, count_rows, estimate_count, fetch_page
+from search import search_join
+
+# Per-case budgets in milliseconds (median of the timed runs); a case over budget fails the run.
+# Cases not listed here are only compared against the baseline.
+THRESHOLDS = {
+    'listing': 50,
+    'search': 250,
+    'search_database': 250,
+    'home': 100,
+}
+# A case regresses when its median exceeds the baseline median by this factor...
+REGRESSION_FACTOR = 1.5
+# ...and by at least this many milliseconds, so sub-millisecond noise never fails a run
+REGRESSION_FLOOR_MS = 2
+
+# Every search branch of the four management forms and of Search Database, as
+# (case, listing, kind, argument): kind 'fts' runs search_join on (key column, table, columns),
+# kinds 'like' and 'equals' filter the listing with a condition on a value taken from a sample row.
+SEARCHES = [
+    ('patients.patient_id', 'Patients', 'like', ("Patients.PatientID LIKE ?", 'patient_id')),
+    ('patients.first_name', 'Patients', 'fts', ("Patients.PatientID", "Patients", ["FirstName"], 'patient_first')),
+    ('patients.last_name', 'Patients', 'fts', ("Patients.PatientID", "Patients", ["LastName"], 'patient_last')),
+    ('patients.contact', 'Patients', 'fts', ("Patients.PatientID", "Patients", ["ContactNumber"], 'patient_contact')),
+    ('appointments.appointment_id', 'Appointments', 'like', ("Appointments.AppointmentID LIKE ?", 'appointment_id')),
+    ('appointments.patient_name', 'Appointments', 'fts', ("Appointments.PatientID", "Patients", ["FirstName", "LastName"], 'patient_name')),
+    ('appointments.doctor_name', 'Appointments', 'fts', ("Appointments.DoctorID", "Doctors", ["FirstName", "LastName"], 'doctor_name')),
+    ('appointments.date', 'Appointments', 'like', ("Appointments.AppointmentDate LIKE ?", 'appointment_date')),
+    ('medical_records.patient_name', 'MedicalRecords', 'fts', ("Appointments.PatientID", "Patients", ["FirstName", "LastName"], 'patient_name')),
+    ('medical_records.doctor_name', 'MedicalRecords', 'fts', ("Appointments.DoctorID", "Doctors", ["FirstName", "LastName"], 'doctor_name')),
+    ('medical_records.diagnosis', 'MedicalRecords', 'fts', ("MedicalRecords.RecordID", "MedicalRecords", ["Diagnosis"], 'diagnosis')),
+    ('doctors.doctor_id', 'Doctors', 'like', ("Doctors.DoctorID LIKE ?", 'doctor_id')),
+    ('doctors.first_name', 'Doctors', 'fts', ("Doctors.DoctorID", "Doctors", ["FirstName"], 'doctor_first')),
+    ('doctors.last_name', 'Doctors', 'fts', ("Doctors.DoctorID", "Doctors", ["LastName"], 'doctor_last')),
+    ('doctors.department', 'Doctors', 'fts', ("Doctors.DoctorID", "Doctors", ["Department"], 'department')),
+]
+
+SEARCH_DATABASE = [
+    ('search_database.patient_id', 'equals', ("Patients.PatientID = ?", 'patient_id')),
+    ('search_database.first_name', 'fts', ("Patients.PatientID", "Patients", ["FirstName"], 'patient_first')),
+    ('search_database.last_name', 'fts', ("Patients.PatientID", "Patients", ["LastName"], 'patient_last')),
+    ('search_database.date_of_birth', 'equals', ("Patients.DateOfBirth = ?", 'patient_dob')),
+    ('search_database.contact_number', 'fts', ("Patients.PatientID", "Patients", ["ContactNumber"], 'patient_contact')),
+]
+
+# Query values taken from a row in the middle of each table, so every search has hits
+def sample_values(c):
+    patient_id, patient_first, patient_last, patient_dob, patient_contact = c.execute('''
+        SELECT PatientID, FirstName, LastName, DateOfBirth, ContactNumber FROM Patients
+        WHERE PatientID >= (SELECT (MIN(PatientID) + MAX(PatientID)) / 2 FROM Patients) LIMIT 1
+    ''').fetchone()
+    doctor_id, doctor_first, doctor_last, department = c.execute('''
+        SELECT DoctorID, FirstName, LastName, Department FROM Doctors
+        WHERE DoctorID >= (SELECT (MIN(DoctorID) + MAX(DoctorID)) / 2 FROM Doctors) LIMIT 1
+    ''').fetchone()
+    appointment_id, appointment_date = c.execute('''
+        SELECT AppointmentID, AppointmentDate FROM Appointments
+        WHERE AppointmentID >= (SELECT (MIN(AppointmentID) + MAX(AppointmentID)) / 2 FROM Appointments) LIMIT 1
+    ''').fetchone()
+    diagnosis = c.execute("SELECT Diagnosis FROM MedicalRecords ORDER BY RecordID LIMIT 1").fetchone()[0]
+    # The patient with the longest history, for the timeline
+    frequent_patient = c.execute('''
+        SELECT PatientID FROM Appointments GROUP BY PatientID ORDER BY COUNT(*) DESC LIMIT 1
+    ''').fetchone()[0]
+    return {
+        'patient_id': patient_id, 'patient_first': patient_first, 'patient_last': patient_last,
+        'patient_dob': patient_dob, 'patient_contact': patient_contact,
+        'patient_name': f'{patient_first} {patient_last}',
+        'doctor_id': doctor_id, 'doctor_first': doctor_first, 'doctor_last': doctor_last,
+        'doctor_name': f'{doctor_first} {doctor_last}', 'department': department,
+        'appointment_id': appointment_id, 'appointment_date': appointment_date, 'diagnosis': diagnosis,
+        'frequent_patient': frequent_patient,
+    }
+
+# What show_listing runs for one page: the keyset page plus the row count (or estimate)
+def show_listing(c, name, search=None, where=None, params=(), sort_label=None, after=None):
+    listing = LISTINGS[name]
+    source = listing['source']
+    sort_options = dict(listing['sort'])
+    if search:
+        source += search[0]
+        params = tuple(search[1]) + tuple(params)
+        sort_options = {"Relevance": ("hits.key",), **sort_options}
+    sort = sort_options[sort_label or next(iter(sort_options))]
+    rows, next_cursor = fetch_page(c, listing['select'], source, listing['key'], sort, where, params,
+                                   after, DEFAULT_PAGE_SIZE)
+    if search or where:
+        count_rows(c, source, where, params)
+    else:
+        estimate_count(c, listing['table'])
+    return next_cursor
+
+# Build the benchmark cases for a database as {name: (group, fn(c))}
+def query_cases(c, values):
+    cases = {}
+    for name, listing in LISTINGS.items():
+        if name == 'PatientTimeline':
+            continue
+        for sort_label in listing['sort']:
+            label = sort_label.lower().replace(' ', '_')
+            cases[f'listing.{name}.{label}'] = ('listing', lambda c, name=name, sort_label=sort_label:
+                                               show_listing(c, name, sort_label=sort_label))
+        # Second page, reached through the cursor of the first
+        cursor = show_listing(c, name)
+        cases[f'listing.{name}.page_2'] = ('listing', lambda c, name=name, cursor=cursor:
+                                          show_listing(c, name, after=cursor))
+
+    def branch(listing, kind, argument):
+        if kind == 'fts':
+            key_column, table, columns, value = argument
+            return lambda c: show_listing(c, listing, search_join(c, key_column, table, str(values[value]), columns))
+        where, value = argument
+        param = f'%{values[value]}%' if kind == 'like' else values[value]
+        return lambda c: show_listing(c, listing, where=where, params=(param,))
+
+    for name, listing, kind, argument in SEARCHES:
+        cases['search.' + name] = ('search', branch(listing, kind, argument))
+    for name, kind, argument in SEARCH_DATABASE:
+        cases[name] = ('search_database', branch('Patients', kind, argument))
+
+    # Opening the chart of the patient with the most appointments, with the records of the first page expanded
+    def timeline(c):
+        show_listing(c, 'PatientTimeline', where="PatientTimeline.PatientID = ?", params=(values['frequent_patient'],))
+        rows, _ = timeline_page(c, values['frequent_patient'])
+        appointment_records(c, [row[0] for row in rows if row[7]])
+    cases['search_database.timeline'] = ('search_database', timeline)
+    cases['home.load_metrics'] = ('home', load_metrics)
+    return cases
+
+# Run fn `repeat` times after a warm-up run; returns timings in milliseconds and the statements it ran
+def measure(conn, fn, repeat):
+    statements = []
+    conn.set_trace_callback(statements.append)
+    fn(conn.cursor())
+    conn.set_trace_callback(None)
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(conn.cursor())
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings, statements
+
+# EXPLAIN QUERY PLAN for each traced statement (traced SQL has its parameters inlined)
+def query_plans(conn, statements):
+    plans = []
+    for statement in statements:
+        if not statement.lstrip().upper().startswith('SELECT'):
+            continue
+        try:
+            rows = conn.execute("EXPLAIN QUERY PLAN " + statement).fetchall()
+        except sqlite3.Error as e:
+            plans.append({'sql': statement, 'error': str(e)})
+            continue
+        plans.append({'sql': ' '.join(statement.split()), 'plan': [row[-1] for row in rows]})
+    return plans
+
+def summarize(timings):
+    timings = sorted(timings)
+    return {
+        'runs': len(timings),
+        'min_ms': round(timings[0], 3),
+        'median_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+        'max_ms': round(timings[-1], 3),
+    }
+
+# Appointment add/update/delete from `threads` concurrent sessions through the shared write queue.
+# Every appointment added is deleted again, so the data is unchanged afterwards.
+# Latencies are per write, from submission until its group commit is done.
+def bench_crud(database, threads, operations, values):
+    writes = get_write_queue(database)
+    latencies = []
+    latencies_lock = threading.Lock()
+    errors = []
+
+    def timed_write(helper, *args):
+        started = time.perf_counter()
+        writes.run(helper, *args)
+        with latencies_lock:
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    # Each session books its own day far in the future, one slot per operation,
+    # so it can find its appointment again through the (DoctorID, date, time) index
+    def session(index):
+        reader = database.reader()
+        day = date(2100, 1, 1) + timedelta(days=index)
+        try:
+            for i in range(operations):
+                slot = dt_time(i // 3600 % 24, i // 60 % 60, i % 60)
+                timed_write(add_appointment, values['patient_id'], values['doctor_id'], day, slot, 'Benchmark')
+                appointment_id = reader.execute('''
+                    SELECT AppointmentID FROM Appointments
+                    WHERE DoctorID = ? AND AppointmentDate = ? AND AppointmentTime = ?
+                ''', (values['doctor_id'], day.strftime('%Y-%m-%d'), slot.strftime('%H:%M:%S'))).fetchone()[0]
+                timed_write(update_appointment, appointment_id, day, slot, 'Confirmed', 'Benchmark')
+                timed_write(delete_appointment, appointment_id)
+        except Exception as e:
+            errors.append(repr(e))
+        finally:
+            database.release_reader()
+
+    workers = [threading.Thread(target=session, args=(i,)) for i in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    # Remove anything a failed session left behind
+    with database.transaction() as tx:
+        tx.execute("DELETE FROM Appointments WHERE DoctorID = ? AND AppointmentDate >= '2100-01-01'", (values['doctor_id'],))
+    result = summarize(latencies) if latencies else {}
+    result.update({'threads': threads, 'writes': len(latencies), 'writes_per_second': round(len(latencies) / elapsed, 1)})
+    if errors:
+        result['errors'] = errors[:10]
+    return result
+
+# Create (or reuse) a database with `size` appointments
+def seed(path, size, seed_value, workers):
+    if os.path.exists(path):
+        conn = sqlite3.connect(path)
+        try:
+            existing = conn.execute("SELECT COUNT(*) FROM Appointments").fetchone()[0]
+        except sqlite3.Error:
+            existing = None
+        conn.close()
+        if existing == size:
+            return False
+        os.remove(path)
+    args = argparse.Namespace(
+        database=path, doctors=max(10, size // 1000), patients=max(200, size // 2),
+        past_appointments=size * 6 // 7, future_appointments=size - size * 6 // 7,
+        seed=seed_value, workers=workers, today=date.today().strftime('%Y-%m-%d'),
+        days_back=365 * 3, days_ahead=365, date_distribution='uniform', clinics=5,
+        clinic_weights=None, past_statuses=None, future_statuses=None, append=False)
+    generate_sample_data.generate(args)
+    return True
+
+def run(path, size, args):
+    started = time.perf_counter()
+    seeded = seed(path, size, args.seed, args.workers)
+    seed_seconds = time.perf_counter() - started
+
+    database = get_database(path)
+    conn = database.reader()
+    c = conn.cursor()
+    tables = {table: c.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+              for table in ('Patients', 'Doctors', 'Appointments', 'MedicalRecords')}
+    values = sample_values(c)
+
+    cases = {}
+    for name, (group, fn) in query_cases(c, values).items():
+        if args.only and not any(name.startswith(prefix) for prefix in args.only):
+            continue
+        timings, statements = measure(conn, fn, args.repeat)
+        cases[name] = dict(summarize(timings), group=group, plans=query_plans(conn, statements))
+        print(f"{size:>10}  {name:<40} {cases[name]['median_ms']:9.2f} ms")
+    database.release_reader()
+
+    crud = []
+    if not args.only or any('crud'.startswith(prefix) for prefix in args.only):
+        for threads in args.threads:
+            result = bench_crud(database, threads, args.operations, values)
+            crud.append(result)
+            print(f"{size:>10}  crud x{threads:<35} {result['writes_per_second']:9.1f} writes/s")
+    database.close()
+    return {'tables': tables, 'seeded': seeded, 'seed_seconds': round(seed_seconds, 1), 'cases': cases, 'crud': crud}
+
+# Compare results with the budgets and with a previous run; returns a list of failures
+def check(results, baseline=None):
+    failures = []
+    for size, result in results['sizes'].items():
+        previous = (baseline or {}).get('sizes', {}).get(size, {}).get('cases', {})
+        for name, case in result['cases'].items():
+            budget = THRESHOLDS.get(case['group'])
+            if budget is not None and case['median_ms'] > budget:
+                failures.append(f"{size} {name}: {case['median_ms']} ms over the {budget} ms budget")
+            if name in previous:
+                before = previous[name]['median_ms']
+                if case['median_ms'] > before * REGRESSION_FACTOR and case['median_ms'] - before > REGRESSION_FLOOR_MS:
+                    failures.append(f"{size} {name}: {case['median_ms']} ms, was {before} ms")
+                if [plan.get('plan') for plan in case['plans']] != [plan.get('plan') for plan in previous[name]['plans']]:
+                    case['plan_changed'] = True
+    return failures
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark every query the app issues on databases of increasing size")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000],
+                        help="Appointments per database (e.g. 10000 100000 1000000 10000000)")
+    parser.add_argument('--workdir', default='bench-data', help="Where seeded databases are kept and reused")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Processes used to seed databases")
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4, 16], help="Concurrent sessions for the CRUD benchmark")
+    parser.add_argument('--operations', type=int, default=50, help="Add/update/delete cycles per CRUD session")
+    parser.add_argument('--only', nargs='+', help="Run only cases whose names start with these prefixes (e.g. search. home crud)")
+    parser.add_argument('--output', default='bench-results.json')
+    parser.add_argument('--baseline', help="Previous results to check for regressions")
+    args = parser.parse_args()
+
+    os.makedirs(args.workdir, exist_ok=True)
+    results = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'thresholds': {'budgets_ms': THRESHOLDS, 'regression_factor': REGRESSION_FACTOR,
+                       'regression_floor_ms': REGRESSION_FLOOR_MS},
+        'sizes': {},
+    }
+    for size in args.sizes:
+        results['sizes'][str(size)] = run(os.path.join(args.workdir, f'bench-{size}.db'), size, args)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    failures = check(results, baseline)
+    results['failures'] = failures
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+    for failure in failures:
+        print("FAIL " + failure)
+    sys.exit(1 if failures else 0)
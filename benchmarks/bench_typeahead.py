@@ -0,0 +1,66 @@
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from db import connect, get_database
+from pagination import LISTINGS, page_query
+from search import search_join
+from typeahead import TYPEAHEAD_MIN_LENGTH, get_typeahead, typeahead_join
+
+# What a front desk lookup costs per keystroke: the text grows one character at a time ("sm", "smi",
+# "smit", "smith", "smith j", ...) and every step reads the first page of the Patients listing for it.
+# The typeahead lookup (prefix range scan, refined from the shorter prefix when possible) is compared
+# with the search form's full-text search on the same texts.
+def typed(name):
+    return [name[:length] for length in range(TYPEAHEAD_MIN_LENGTH, len(name) + 1)]
+
+def first_page(conn, listing, search, limit):
+    source = listing['source'] + search[0]
+    query, args, _ = page_query(listing['select'], source, listing['key'], (), None, tuple(search[1]),
+                                None, limit, False)
+    return conn.execute(query, args).fetchall()
+
+def percentile(timings, quantile):
+    ordered = sorted(timings)
+    return ordered[min(len(ordered) - 1, int(quantile * len(ordered)))]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Per-keystroke latency of typeahead and full-text patient lookups")
+    parser.add_argument('--database', default='healthcare.db')
+    parser.add_argument('--names', type=int, default=200, help="patients whose names are typed")
+    parser.add_argument('--limit', type=int, default=20, help="rows on the listing page")
+    args = parser.parse_args()
+
+    database = get_database(args.database)
+    conn = connect(args.database, readonly=True)
+    listing = LISTINGS['Patients']
+    total = conn.execute("SELECT COUNT(*) FROM Patients").fetchone()[0]
+    rows = conn.execute("SELECT FirstName, LastName, ContactNumber FROM Patients ORDER BY random() LIMIT ?",
+                        (args.names,)).fetchall()
+    texts = [typed(f"{first} {last}") for first, last, _ in rows] + [typed(contact) for _, _, contact in rows]
+    random.shuffle(texts)
+
+    print(f"{total} patients, {len(texts)} lookups typed one character at a time")
+    print(f"{'lookup':<10} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    typeahead = get_typeahead(database)
+    lookups = {
+        'typeahead': lambda text: typeahead_join(conn, database, "Patients.PatientID", "Patients", text, args.limit),
+        'fulltext': lambda text: search_join(conn, "Patients.PatientID", "Patients", text, ["FirstName", "LastName", "ContactNumber"]),
+    }
+    for label, lookup in lookups.items():
+        timings = []
+        for steps in texts:
+            for text in steps:
+                started = time.perf_counter()
+                search = lookup(text)
+                if search:
+                    first_page(conn, listing, search, args.limit)
+                timings.append(time.perf_counter() - started)
+        print(f"{label:<10} " + " ".join(f"{value * 1000:>7.2f}ms" for value in
+              (statistics.median(timings), percentile(timings, 0.95), percentile(timings, 0.99), max(timings))))
+    print(f"typeahead cache: {typeahead.stats()}")
@@ -0,0 +1,94 @@
+import argparse
+import cProfile
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+PAGES = ["Home", "Manage Patients", "Manage Appointments", "Manage Medical Records", "Manage Doctors",
+         "Search Database", "Analytics", "Import / Export"]
+
+# Run the app script in Streamlit's bare mode (no server: widgets return their defaults and a dict
+# stands in for session state) with the sidebar set to `page`, in this fresh process: once cold,
+# then `reruns` more times as a session would
+def profile_page(app, page, reruns, profile_path=None):
+    started = time.perf_counter()
+    import runpy
+    import streamlit
+    from streamlit.delta_generator import DeltaGenerator
+    import_streamlit = time.perf_counter() - started
+
+    radio = DeltaGenerator.radio
+    def choose(self, label, *args, **kwargs):
+        return page if label == "Go to" else radio(self, label, *args, **kwargs)
+    DeltaGenerator.radio = choose
+    streamlit.session_state = {}
+
+    os.chdir(os.path.dirname(os.path.abspath(app)))
+    sys.path.insert(0, os.getcwd())
+    modules = set(sys.modules)
+    profiler = cProfile.Profile() if profile_path else None
+    started = time.perf_counter()
+    if profiler:
+        profiler.enable()
+    runpy.run_path(app, run_name='__main__')
+    if profiler:
+        profiler.disable()
+        profiler.dump_stats(profile_path)
+    first_run = time.perf_counter() - started
+    loaded = sorted({name.split('.')[0] for name in set(sys.modules) - modules})
+
+    timings = []
+    for _ in range(reruns):
+        started = time.perf_counter()
+        runpy.run_path(app, run_name='__main__')
+        timings.append(time.perf_counter() - started)
+    return {
+        'page': page,
+        'import_streamlit_ms': import_streamlit * 1000,
+        'first_run_ms': first_run * 1000,
+        'rerun_median_ms': statistics.median(timings) * 1000 if timings else None,
+        'rerun_max_ms': max(timings) * 1000 if timings else None,
+        'first_run_imports': loaded,
+    }
+
+# Each page is profiled in its own interpreter so every first run is a true cold start
+def run(args):
+    results = []
+    for page in args.pages:
+        command = [sys.executable, os.path.abspath(__file__), '--child', page, '--app', args.app, '--reruns', str(args.reruns)]
+        if args.profile_dir:
+            os.makedirs(args.profile_dir, exist_ok=True)
+            name = page.lower().replace(' / ', '_').replace(' ', '_')
+            command += ['--profile-path', os.path.abspath(os.path.join(args.profile_dir, name + '.prof'))]
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Profile the app's cold start and reruns for each page")
+    parser.add_argument('--app', default=os.path.join(ROOT, 'app.py'))
+    parser.add_argument('--pages', nargs='+', default=PAGES)
+    parser.add_argument('--reruns', type=int, default=20)
+    parser.add_argument('--profile-dir', help="Write a cProfile of each page's first run here (view with snakeviz or pstats)")
+    parser.add_argument('--output', help="Also save the results as JSON")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--profile-path', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(profile_page(args.app, args.child, args.reruns, args.profile_path)))
+        sys.exit()
+
+    results = run(args)
+    print(f"{'page':<24} {'streamlit':>10} {'first run':>10} {'rerun p50':>10} {'rerun max':>10}  imported on first run")
+    for result in results:
+        print(f"{result['page']:<24} {result['import_streamlit_ms']:>8.0f}ms {result['first_run_ms']:>8.0f}ms "
+              f"{result['rerun_median_ms']:>8.1f}ms {result['rerun_max_ms']:>8.1f}ms  {', '.join(result['first_run_imports'])}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,296 @@
+import argparse
+import csv
+import io
+import json
+import os
+
+import pandas as pd
+
+from db import get_database
+from scheduling import ACTIVE_STATUSES, OVERLAP, SLOT_MINUTES
+from schema import restore_suspended_objects, suspend_objects
+
+# Rows read, validated and committed per chunk (one transaction per chunk)
+CHUNK_SIZE = 100000
+# Rejected rows reported back to the caller
+MAX_ERRORS = 100
+
+FORMATS = ['csv', 'parquet', 'ndjson']
+
+APPOINTMENT_STATUSES = ["Scheduled", "Confirmed", "Cancelled", "No Show", "Completed"]
+
+# Importable columns per table; the primary key is optional so historical ids can be kept
+TABLES = {
+    'Patients': {
+        'key': 'PatientID',
+        'columns': ['PatientID', 'FirstName', 'LastName', 'DateOfBirth', 'ContactNumber'],
+        'required': ['FirstName', 'LastName'],
+        'integers': ['PatientID'],
+        'dates': ['DateOfBirth'],
+    },
+    'Doctors': {
+        'key': 'DoctorID',
+        'columns': ['DoctorID', 'FirstName', 'LastName', 'Department', 'ContactNumber'],
+        'required': ['FirstName', 'LastName'],
+        'integers': ['DoctorID'],
+    },
+    'Appointments': {
+        'key': 'AppointmentID',
+        'columns': ['AppointmentID', 'PatientID', 'DoctorID', 'AppointmentDate', 'AppointmentTime', 'Status', 'Location'],
+        'required': ['PatientID', 'DoctorID', 'AppointmentDate'],
+        'integers': ['AppointmentID', 'PatientID', 'DoctorID'],
+        'dates': ['AppointmentDate'],
+        'times': ['AppointmentTime'],
+        'choices': {'Status': APPOINTMENT_STATUSES},
+        # Active rows are held to the double-booking rule (scheduling.py)
+        'schedule': True,
+    },
+    'MedicalRecords': {
+        'key': 'RecordID',
+        'columns': ['RecordID', 'AppointmentID', 'Diagnosis', 'Details'],
+        'required': ['AppointmentID'],
+        'integers': ['RecordID', 'AppointmentID'],
+    },
+}
+
+# Guess the file format from its name
+def detect_format(name):
+    extension = os.path.splitext(name)[1].lower()
+    if extension == '.parquet':
+        return 'parquet'
+    if extension in ('.ndjson', '.jsonl', '.json'):
+        return 'ndjson'
+    return 'csv'
+
+# Yield DataFrames of at most chunk_size rows from a path or file object, all values read as text
+def read_chunks(source, fmt, chunk_size=CHUNK_SIZE):
+    if fmt == 'csv':
+        yield from pd.read_csv(source, dtype=str, keep_default_na=False, chunksize=chunk_size)
+    elif fmt == 'ndjson':
+        for chunk in pd.read_json(source, lines=True, dtype=False, chunksize=chunk_size):
+            yield chunk.astype(object).where(chunk.notna(), '').astype(str)
+    elif fmt == 'parquet':
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("Parquet support needs the pyarrow package")
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_size):
+            chunk = batch.to_pandas()
+            yield chunk.astype(object).where(chunk.notna(), '').astype(str)
+    else:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+# Validate a chunk with column-wise checks. Returns (columns, rows, errors) where rows are
+# ready for executemany and errors are (row number, message) pairs; `offset` numbers the rows.
+# `existing_keys`, when given, takes a list of primary keys and returns those already in the table,
+# and `booked` a list of (doctor, date, time) bookings and returns the positions of those clashing
+# with the appointments in the table, so rows that would fail the insert are rejected here instead.
+def validate_chunk(table, chunk, offset=0, existing_keys=None, booked=None):
+    spec = TABLES[table]
+    unknown = [col for col in chunk.columns if col not in spec['columns']]
+    missing = [col for col in spec['required'] if col not in chunk.columns]
+    if missing:
+        raise ValueError(f"{table} import is missing required columns: {', '.join(missing)}")
+    columns = [col for col in spec['columns'] if col in chunk.columns]
+    chunk = chunk[columns].apply(lambda col: col.str.strip())
+
+    invalid = pd.Series('', index=chunk.index)
+    def flag(mask, message):
+        invalid[mask & (invalid == '')] = message
+
+    for col in spec['required']:
+        flag(chunk[col] == '', f"{col} is required")
+    for col in spec.get('integers', []):
+        if col in columns:
+            flag((chunk[col] != '') & pd.to_numeric(chunk[col], errors='coerce').isna(), f"{col} must be a whole number")
+    for col in spec.get('dates', []):
+        if col in columns:
+            parsed = pd.to_datetime(chunk[col], format='%Y-%m-%d', errors='coerce')
+            flag((chunk[col] != '') & parsed.isna(), f"{col} must be a YYYY-MM-DD date")
+    for col in spec.get('times', []):
+        if col in columns:
+            parsed = pd.to_datetime(chunk[col], format='%H:%M:%S', errors='coerce')
+            flag((chunk[col] != '') & parsed.isna(), f"{col} must be a HH:MM:SS time")
+    for col, choices in spec.get('choices', {}).items():
+        if col in columns:
+            flag((chunk[col] != '') & ~chunk[col].isin(choices), f"{col} must be one of {', '.join(choices)}")
+    key = spec['key']
+    if key in columns:
+        keys = pd.to_numeric(chunk[key], errors='coerce').where(invalid == '')
+        flag(keys.notna() & keys.duplicated(), f"{key} appears more than once in the file")
+        if existing_keys is not None:
+            candidates = keys[keys.notna() & (invalid == '')]
+            taken = existing_keys([int(value) for value in candidates])
+            flag(keys.isin(taken), f"{key} already exists")
+    if spec.get('schedule') and {'Status', 'AppointmentTime'} <= set(columns):
+        active = (invalid == '') & chunk['Status'].isin(ACTIVE_STATUSES) & (chunk['AppointmentTime'] != '')
+        flag(_double_bookings(chunk, active, booked), "Doctor is already booked at that time")
+
+    bad = invalid != ''
+    errors = [(offset + position + 1, message) for position, message in enumerate(invalid) if message]
+    # Empty cells become NULL; SQLite's column affinity turns numeric text into integers
+    rows = [tuple(None if value == '' else value for value in row)
+            for row in chunk[~bad].itertuples(index=False, name=None)]
+    if unknown:
+        errors.insert(0, (0, f"Ignored unknown columns: {', '.join(unknown)}"))
+    return columns, rows, errors
+
+# Active rows of a chunk that clash, through `booked`, with the table or with an earlier row of the
+# file, as a mask over the chunk
+def _double_bookings(chunk, active, booked):
+    rows = [(index, int(float(doctor)), day, time_text) for index, doctor, day, time_text in
+            chunk.loc[active, ['DoctorID', 'AppointmentDate', 'AppointmentTime']].itertuples(name=None)]
+    clashes = set()
+    if booked is not None and rows:
+        clashes.update(rows[position][0] for position in booked([row[1:] for row in rows]))
+    taken = {}
+    for index, doctor, day, time_text in rows:
+        if index in clashes:
+            continue
+        hours, minutes = time_text.split(':')[:2]
+        start = int(hours) * 60 + int(minutes)
+        slots = taken.setdefault((doctor, day), [])
+        if any(abs(start - other) < SLOT_MINUTES for other in slots):
+            clashes.add(index)
+        else:
+            slots.append(start)
+    mask = pd.Series(False, index=chunk.index)
+    mask[list(clashes)] = True
+    return mask
+
+# Lookup of the primary keys already present in `table`, for validate_chunk
+def _existing_keys(conn, table):
+    key = TABLES[table]['key']
+    def existing(keys):
+        if not keys:
+            return set()
+        query = f"SELECT {key} FROM {table} WHERE {key} IN (SELECT value FROM json_each(?))"
+        return {row[0] for row in conn.execute(query, (json.dumps(keys),))}
+    return existing
+
+# Lookup of the bookings clashing with active appointments in the table, for validate_chunk
+def _existing_bookings(conn):
+    conflict = OVERLAP.format(doctor="json_extract(booking.value, '$[0]')", date="json_extract(booking.value, '$[1]')",
+                              time="json_extract(booking.value, '$[2]')")
+    def booked(bookings):
+        query = f"SELECT DISTINCT booking.key FROM json_each(?) AS booking JOIN Appointments ON {conflict}"
+        return [row[0] for row in conn.execute(query, (json.dumps(bookings),))]
+    return booked
+
+# Stream chunks into a table. With defer_indexes the table's secondary indexes and triggers are
+# dropped for the load and rebuilt once at the end, which is much faster than maintaining them per row.
+# Returns a summary dict with loaded/rejected counts and the first MAX_ERRORS errors.
+def load(database, table, chunks, defer_indexes=True):
+    summary = {'loaded': 0, 'rejected': 0, 'errors': []}
+    offset = 0
+    with database.writer():
+        if defer_indexes:
+            with database.transaction() as tx:
+                suspend_objects(tx.cursor(), table)
+        try:
+            for chunk in chunks:
+                # Checked in the transaction that inserts, so no other write can take a key or slot in between
+                with database.transaction() as tx:
+                    columns, rows, errors = validate_chunk(table, chunk, offset, _existing_keys(tx, table),
+                                                           _existing_bookings(tx))
+                    if rows:
+                        placeholders = ', '.join('?' for _ in columns)
+                        tx.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows)
+                offset += len(chunk)
+                summary['loaded'] += len(rows)
+                summary['rejected'] += sum(1 for row_number, _ in errors if row_number)
+                summary['errors'].extend(errors[:MAX_ERRORS - len(summary['errors'])])
+        finally:
+            if defer_indexes:
+                with database.transaction() as tx:
+                    restore_suspended_objects(tx.cursor())
+    return summary
+
+# Import a file (path or file object) into a table
+def import_file(database, table, source, fmt=None, chunk_size=CHUNK_SIZE, defer_indexes=True):
+    fmt = fmt or detect_format(getattr(source, 'name', source))
+    return load(database, table, read_chunks(source, fmt, chunk_size), defer_indexes)
+
+# Stream the result of a query (or a whole table) to `out` in chunks via fetchmany,
+# never holding more than chunk_size rows. `out` is a path or a binary file object.
+def export(database, table=None, out=None, fmt='csv', query=None, params=(), chunk_size=CHUNK_SIZE):
+    cursor = database.reader().cursor()
+    cursor.execute(query or f"SELECT * FROM {table}", params)
+    columns = [description[0] for description in cursor.description]
+    owns_file = isinstance(out, str)
+    handle = open(out, 'wb') if owns_file else out
+    exported = 0
+    try:
+        if fmt == 'parquet':
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise ValueError("Parquet support needs the pyarrow package")
+            writer = None
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                batch = pa.Table.from_pylist([dict(zip(columns, row)) for row in rows])
+                if writer is None:
+                    writer = pq.ParquetWriter(handle, batch.schema)
+                writer.write_table(batch.cast(writer.schema))
+                exported += len(rows)
+            if writer is not None:
+                writer.close()
+        else:
+            text = io.TextIOWrapper(handle, encoding='utf-8', newline='', write_through=True)
+            csv_writer = csv.writer(text) if fmt == 'csv' else None
+            if csv_writer:
+                csv_writer.writerow(columns)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                if csv_writer:
+                    csv_writer.writerows(rows)
+                else:
+                    text.writelines(json.dumps(dict(zip(columns, row))) + '\n' for row in rows)
+                exported += len(rows)
+            text.flush()
+            text.detach()
+    finally:
+        cursor.close()
+        if owns_file:
+            handle.close()
+    return exported
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import and export for the healthcare database")
+    parser.add_argument('--database', default='healthcare.db')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = commands.add_parser('import', help="Load a CSV, Parquet or NDJSON file into a table")
+    import_parser.add_argument('table', choices=list(TABLES))
+    import_parser.add_argument('path')
+    import_parser.add_argument('--format', choices=FORMATS)
+    import_parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    import_parser.add_argument('--keep-indexes', action='store_true', help="Maintain indexes row by row instead of rebuilding them")
+
+    export_parser = commands.add_parser('export', help="Write a table or query result to a file")
+    export_parser.add_argument('table', choices=list(TABLES))
+    export_parser.add_argument('path')
+    export_parser.add_argument('--format', choices=FORMATS)
+    export_parser.add_argument('--query', help="SQL to export instead of the whole table")
+    export_parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    args = parser.parse_args()
+    database = get_database(args.database)
+    fmt = args.format or detect_format(args.path)
+    if args.command == 'import':
+        summary = import_file(database, args.table, args.path, fmt, args.chunk_size, not args.keep_indexes)
+        print(f"Loaded {summary['loaded']} rows into {args.table}, rejected {summary['rejected']}")
+        for row_number, message in summary['errors']:
+            print(f"  row {row_number}: {message}" if row_number else f"  {message}")
+    else:
+        exported = export(database, args.table, args.path, fmt, args.query, chunk_size=args.chunk_size)
+        print(f"Exported {exported} rows to {args.path}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+import json
+
+# Tables whose changes are logged, and their primary key
+CHANGE_TABLES = {
+    'Patients': 'PatientID',
+    'Doctors': 'DoctorID',
+    'Appointments': 'AppointmentID',
+    'MedicalRecords': 'RecordID',
+}
+# Changes handed to a consumer per read
+CHANGE_BATCH = 500
+
+# Operations in the log. 'archive' is a delete made by archive.py (the row moved to an archive
+# partition, it was not deleted); 'reload' says a bulk load changed the table without logging its
+# rows, so consumers read the table again.
+OPERATIONS = ('insert', 'update', 'delete', 'archive', 'reload')
+
+def _row_json(c, table, prefix):
+    columns = [row[1] for row in c.execute(f"PRAGMA table_info({table})").fetchall()]
+    return "json_object(" + ", ".join(f"'{column}', {prefix}.{column}" for column in columns) + ")"
+
+# Migration 12: an append-only change log filled by triggers on the four base tables, and the
+# position each downstream consumer has acknowledged. Nothing is logged while no consumer is
+# registered. AUTOINCREMENT keeps sequence numbers increasing even after truncation has emptied
+# the log.
+def create_change_log(c):
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS ChangeLog (
+            Sequence INTEGER PRIMARY KEY AUTOINCREMENT,
+            TableName TEXT NOT NULL,
+            RowID INTEGER,
+            Operation TEXT NOT NULL,
+            Data TEXT,
+            ChangedAt TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS ChangeConsumers (
+            Name TEXT PRIMARY KEY,
+            Acknowledged INTEGER NOT NULL,
+            RegisteredAt TEXT NOT NULL DEFAULT (datetime('now')),
+            AcknowledgedAt TEXT
+        )
+    ''')
+    create_change_triggers(c)
+
+# (Re)create the logging triggers; the row images list the columns the tables have now, so run this
+# again from the migration of any later column change
+def create_change_triggers(c):
+    for table, key in CHANGE_TABLES.items():
+        new_row, old_row = _row_json(c, table, 'new'), _row_json(c, table, 'old')
+        for suffix in ('ai', 'au', 'ad'):
+            c.execute(f"DROP TRIGGER IF EXISTS {table}_changes_{suffix}")
+        c.execute(f'''
+            CREATE TRIGGER {table}_changes_ai AFTER INSERT ON {table}
+            WHEN EXISTS (SELECT 1 FROM ChangeConsumers) BEGIN
+                INSERT INTO ChangeLog (TableName, RowID, Operation, Data) VALUES ('{table}', new.{key}, 'insert', {new_row});
+            END
+        ''')
+        # A changed primary key is logged as the old row going away and the new one arriving
+        c.execute(f'''
+            CREATE TRIGGER {table}_changes_au AFTER UPDATE ON {table}
+            WHEN EXISTS (SELECT 1 FROM ChangeConsumers) BEGIN
+                INSERT INTO ChangeLog (TableName, RowID, Operation, Data)
+                SELECT '{table}', old.{key}, 'delete', {old_row} WHERE old.{key} IS NOT new.{key};
+                INSERT INTO ChangeLog (TableName, RowID, Operation, Data)
+                VALUES ('{table}', new.{key}, CASE WHEN old.{key} IS new.{key} THEN 'update' ELSE 'insert' END, {new_row});
+            END
+        ''')
+        c.execute(f'''
+            CREATE TRIGGER {table}_changes_ad AFTER DELETE ON {table}
+            WHEN EXISTS (SELECT 1 FROM ChangeConsumers) BEGIN
+                INSERT INTO ChangeLog (TableName, RowID, Operation, Data) VALUES ('{table}', old.{key}, 'delete', {old_row});
+            END
+        ''')
+
+# Log that `table` was changed without its triggers (a bulk load); consumers read it again
+def log_reload(c, table):
+    c.execute("INSERT INTO ChangeLog (TableName, Operation) SELECT ?, 'reload' WHERE EXISTS (SELECT 1 FROM ChangeConsumers)",
+              (table,))
+
+# Up to `limit` changes with a sequence number above `after`, oldest first, as dicts
+def read_changes(c, after, limit=CHANGE_BATCH, tables=None):
+    query = "SELECT Sequence, TableName, RowID, Operation, Data, ChangedAt FROM ChangeLog WHERE Sequence > ?"
+    params = [after]
+    if tables:
+        query += f" AND TableName IN ({', '.join('?' for _ in tables)})"
+        params += list(tables)
+    rows = c.execute(query + " ORDER BY Sequence LIMIT ?", params + [limit]).fetchall()
+    return [{'sequence': sequence, 'table': table, 'id': row_id, 'operation': operation,
+             'row': json.loads(data) if data is not None else None, 'changed_at': changed_at}
+            for sequence, table, row_id, operation, data, changed_at in rows]
+
+# Drop the changes every registered consumer has acknowledged, or all of them once the last
+# consumer is gone. Returns the number of changes removed.
+def truncate_changes(c):
+    return c.execute('''
+        DELETE FROM ChangeLog WHERE Sequence <= IFNULL((SELECT MIN(Acknowledged) FROM ChangeConsumers),
+                                                       (SELECT IFNULL(MAX(Sequence), 0) FROM ChangeLog))
+    ''').rowcount
+
+class ChangeConsumer:
+    # A named downstream reader of the change log (billing, reporting). Its acknowledged position is
+    # kept in ChangeConsumers, so it resumes where it stopped after a restart; the log keeps every
+    # change until all consumers have acknowledged it. A new consumer starts at the end of the log
+    # and should copy the tables once; from_start=True begins with the oldest change still logged.
+    def __init__(self, database, name, from_start=False):
+        self.database = database
+        self.name = name
+        with database.transaction() as conn:
+            conn.execute('''
+                INSERT OR IGNORE INTO ChangeConsumers (Name, Acknowledged)
+                SELECT ?, CASE WHEN ? THEN IFNULL(MIN(Sequence), 1) - 1 ELSE IFNULL(MAX(Sequence), 0) END FROM ChangeLog
+            ''', (name, from_start))
+
+    # Reads go through the writer connection: they are short, and a pooled reader may already be
+    # the current Streamlit run's
+    def acknowledged(self):
+        with self.database.writer() as conn:
+            row = conn.execute("SELECT Acknowledged FROM ChangeConsumers WHERE Name = ?", (self.name,)).fetchone()
+        if row is None:
+            raise ValueError(f"Change consumer {self.name!r} is not registered")
+        return row[0]
+
+    # The next changes after the acknowledged position; reading them does not acknowledge them
+    def poll(self, limit=CHANGE_BATCH, tables=None):
+        after = self.acknowledged()
+        with self.database.writer() as conn:
+            return read_changes(conn, after, limit, tables)
+
+    # Batches of changes from the acknowledged position to the end of the log. Each batch is
+    # acknowledged when the caller asks for the next one, so a batch whose processing raised or
+    # broke out of the loop is handed out again next time (at-least-once delivery).
+    def batches(self, limit=CHANGE_BATCH, tables=None):
+        while True:
+            changes = self.poll(limit, tables)
+            if not changes:
+                return
+            yield changes
+            self.acknowledge(changes[-1]['sequence'])
+
+    # Mark every change up to `sequence` as processed and drop what no consumer still needs
+    def acknowledge(self, sequence):
+        with self.database.transaction() as conn:
+            conn.execute('''
+                UPDATE ChangeConsumers SET Acknowledged = MAX(Acknowledged, ?), AcknowledgedAt = datetime('now')
+                WHERE Name = ?
+            ''', (sequence, self.name))
+            truncate_changes(conn)
+
+    def unregister(self):
+        with self.database.transaction() as conn:
+            conn.execute("DELETE FROM ChangeConsumers WHERE Name = ?", (self.name,))
+            truncate_changes(conn)
+
+# Per consumer: acknowledged position, changes waiting and when it last acknowledged
+def consumer_lag(c):
+    return c.execute('''
+        SELECT Name, Acknowledged, (SELECT COUNT(*) FROM ChangeLog WHERE Sequence > Acknowledged), AcknowledgedAt
+        FROM ChangeConsumers ORDER BY Name
+    ''').fetchall()
@@ -0,0 +1,125 @@
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# Threads rendering figures; each draws its own Figure, so renders run side by side
+CHART_WORKERS = 4
+# Rendered images kept in memory, by count and by total size
+CHART_CACHE_ENTRIES = 256
+CHART_CACHE_BYTES = 32 * 1024 * 1024
+
+FORMATS = ('png', 'svg')
+
+# Chart drawers: each fills a fresh Figure from plain data (lists and numbers, never database rows)
+def draw_age_histogram(fig, data):
+    edges, counts = data['edges'], data['counts']
+    ax = fig.subplots()
+    ax.hist(edges[:-1], bins=edges, weights=counts, edgecolor='black')
+    ax.set_title('Age Distribution of Patients')
+    ax.set_xlabel('Age')
+    ax.set_ylabel('Number of Patients')
+
+CHARTS = {
+    'age_histogram': draw_age_histogram,
+}
+
+# Plain, hashable form of chart data; arrays become tuples of Python numbers
+def _freeze(value):
+    if hasattr(value, 'tolist'):
+        value = value.tolist()
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+# Draw and encode one chart. Uses matplotlib's object-oriented API only: no pyplot, no global
+# figure state and no GUI backend, so renders in different threads do not share anything.
+def render_chart(chart, data, fmt='png', figsize=(4, 1), dpi=200):
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=figsize, dpi=dpi)
+    CHARTS[chart](fig, data)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=fmt, bbox_inches='tight')
+    return buffer.getvalue()
+
+class ChartService:
+    # Renders charts on a thread pool and keeps the encoded images in an LRU cache keyed by the
+    # chart, its options and a digest of the data drawn. Unchanged data is never drawn twice, and
+    # sessions asking for the same chart while it is being drawn share a single render.
+    def __init__(self, workers=CHART_WORKERS, max_entries=CHART_CACHE_ENTRIES, max_bytes=CHART_CACHE_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='chart')
+        self._images = OrderedDict()
+        self._pending = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.renders = 0
+
+    @staticmethod
+    def key(chart, data, fmt='png', figsize=(4, 1), dpi=200):
+        digest = hashlib.sha1(repr(_freeze(data)).encode()).hexdigest()
+        return (chart, fmt, tuple(figsize), dpi, digest)
+
+    # Future resolving to the image bytes; already done when the image is cached.
+    # Callers can start other work and call result() once they need the image.
+    def submit(self, chart, data, fmt='png', figsize=(4, 1), dpi=200):
+        if chart not in CHARTS:
+            raise ValueError(f"Unknown chart: {chart}")
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported chart format: {fmt}")
+        key = self.key(chart, data, fmt, figsize, dpi)
+        with self._lock:
+            image = self._images.get(key)
+            if image is not None:
+                self._images.move_to_end(key)
+                self.hits += 1
+                future = Future()
+                future.set_result(image)
+                return future
+            future = self._pending.get(key)
+            if future is not None:
+                return future
+            self.renders += 1
+            future = self._pool.submit(render_chart, chart, data, fmt, figsize, dpi)
+            self._pending[key] = future
+        # Outside the lock: a render that already finished runs the callback right here
+        future.add_done_callback(lambda done: self._store(key, done))
+        return future
+
+    # Rendered image bytes, waiting for the render if needed
+    def render(self, chart, data, fmt='png', figsize=(4, 1), dpi=200):
+        return self.submit(chart, data, fmt, figsize, dpi).result()
+
+    def _store(self, key, future):
+        with self._lock:
+            self._pending.pop(key, None)
+            if future.cancelled() or future.exception() is not None:
+                return
+            image = future.result()
+            if len(image) > self.max_bytes:
+                return
+            self._images[key] = image
+            self._bytes += len(image)
+            while len(self._images) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._images.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._images), 'bytes': self._bytes, 'hits': self.hits, 'renders': self.renders}
+
+_service = None
+_service_lock = threading.Lock()
+
+# Process-wide chart service shared by all sessions
+def get_chart_service():
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = ChartService()
+        return _service
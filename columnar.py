@@ -0,0 +1,47 @@
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Listing pages built as Arrow record batches straight from cursor batches. Each batch is split into
+# columns once and every column becomes one typed Arrow array (int64 ids, date32 dates, strings), so
+# a page never exists as a list of rows, a list of lists or an object-dtype DataFrame, and
+# st.dataframe sends the table as it is instead of converting a DataFrame to Arrow first.
+
+def _array(values, arrow_type):
+    if pa.types.is_date32(arrow_type):
+        # Dates are stored as YYYY-MM-DD text; anything else becomes null rather than failing the page
+        timestamps = pc.strptime(pa.array(values, pa.string()), format='%Y-%m-%d', unit='s', error_is_null=True)
+        return timestamps.cast(pa.date32())
+    return pa.array(values, arrow_type)
+
+class ArrowPage:
+    # The first `limit` rows of a listing, appended batch by batch as the cursor yields them. Rows may
+    # carry extra trailing columns (the keyset cursor), which are left out. `names(table, ids)` turns
+    # the id columns listed under the listing's 'names' into patient and doctor names; that happens
+    # once per table() call over the whole column, as each lookup has a fixed cost.
+    def __init__(self, listing, limit, names=None):
+        self.schema = pa.schema([(column, pa.type_for_alias(arrow_type))
+                                 for column, arrow_type in zip(listing['columns'], listing['types'])])
+        self.name_columns = listing.get('names', {})
+        # Batches keep the ids until then
+        self._batch_schema = pa.schema([pa.field(field.name, pa.int64()) if index in self.name_columns else field
+                                        for index, field in enumerate(self.schema)])
+        self.limit = limit
+        self.names = names
+        self.batches = []
+        self.rows = 0
+
+    def append(self, rows):
+        rows = rows[:self.limit - self.rows]
+        if not rows:
+            return
+        columns = list(zip(*rows))
+        arrays = [_array(columns[index], field.type) for index, field in enumerate(self._batch_schema)]
+        self.batches.append(pa.RecordBatch.from_arrays(arrays, schema=self._batch_schema))
+        self.rows += len(rows)
+
+    def table(self):
+        table = pa.Table.from_batches(self.batches, schema=self._batch_schema)
+        for index, name_table in self.name_columns.items():
+            names = self.names(name_table, table.column(index).to_pylist())
+            table = table.set_column(index, self.schema.field(index), pa.array(names, pa.string()))
+        return table
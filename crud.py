@@ -0,0 +1,231 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+# Every helper takes the Database first and writes through database.transaction(), which joins an
+# enclosing transaction when there is one. The plural variants take an iterable of argument tuples
+# and run a single executemany; the singular helpers are one-row calls of them.
+
+def _date(value):
+    return value.strftime("%Y-%m-%d")
+
+def _time(value):
+    return value.strftime("%H:%M:%S")
+
+# Group several helper calls into one transaction: one commit for all of them, and nothing is
+# written if any of them fails.
+#     with unit_of_work(database):
+#         add_patient(database, ...)
+#         add_appointment(database, ...)
+@contextmanager
+def unit_of_work(database):
+    with database.transaction() as tx:
+        yield tx
+
+# Functions for managing appointments
+def add_appointments(database, rows):
+    with database.transaction() as tx:
+        tx.executemany('''
+            INSERT INTO Appointments (PatientID, DoctorID, AppointmentDate, AppointmentTime, Status, Location)
+            VALUES (?, ?, ?, ?, 'Scheduled', ?)
+        ''', [(patient_id, doctor_id, _date(date), _time(time), location)
+              for patient_id, doctor_id, date, time, location in rows])
+
+def update_appointments(database, rows):
+    with database.transaction() as tx:
+        tx.executemany('''
+            UPDATE Appointments
+            SET AppointmentDate = ?, AppointmentTime = ?, Status = ?, Location = ?
+            WHERE AppointmentID = ?
+        ''', [(_date(new_date), _time(new_time), new_status, new_location, appointment_id)
+              for appointment_id, new_date, new_time, new_status, new_location in rows])
+
+def delete_appointments(database, appointment_ids):
+    with database.transaction() as tx:
+        tx.executemany('''
+            DELETE FROM Appointments WHERE AppointmentID = ?
+        ''', [(appointment_id,) for appointment_id in appointment_ids])
+
+def add_appointment(database, patient_id, doctor_id, date, time, location):
+    add_appointments(database, [(patient_id, doctor_id, date, time, location)])
+
+def update_appointment(database, appointment_id, new_date, new_time, new_status, new_location):
+    update_appointments(database, [(appointment_id, new_date, new_time, new_status, new_location)])
+
+def delete_appointment(database, appointment_id):
+    delete_appointments(database, [appointment_id])
+
+# Functions for managing medical records
+def add_medical_records(database, rows):
+    with database.transaction() as tx:
+        tx.executemany('''
+            INSERT INTO MedicalRecords (AppointmentID, Diagnosis, Details)
+            VALUES (?, ?, ?)
+        ''', list(rows))
+
+def update_medical_records(database, rows):
+    with database.transaction() as tx:
+        tx.executemany('''
+            UPDATE MedicalRecords
+            SET Diagnosis = ?, Details = ?
+            WHERE RecordID = ?
+        ''', [(new_diagnosis, new_details, record_id) for record_id, new_diagnosis, new_details in rows])
+
+def delete_medical_records(database, record_ids):
+    with database.transaction() as tx:
+        tx.executemany('''
+            DELETE FROM MedicalRecords WHERE RecordID = ?
+        ''', [(record_id,) for record_id in record_ids])
+
+def add_medical_record(database, appointment_id, diagnosis, details):
+    add_medical_records(database, [(appointment_id, diagnosis, details)])
+
+def update_medical_record(database, record_id, new_diagnosis, new_details):
+    update_medical_records(database, [(record_id, new_diagnosis, new_details)])
+
+def delete_medical_record(database, record_id):
+    delete_medical_records(database, [record_id])
+
+# Functions for managing patients
+def add_patients(database, rows):
+    with database.transaction() as tx:
+        tx.executemany('''
+            INSERT INTO Patients (FirstName, LastName, DateOfBirth, ContactNumber)
+            VALUES (?, ?, ?, ?)
+        ''', [(first_name, last_name, _date(dob), contact) for first_name, last_name, dob, contact in rows])
+
+def update_patients(database, rows):
+    with database.transaction() as tx:
+        tx.executemany('''
+            UPDATE Patients
+            SET FirstName = ?, LastName = ?, DateOfBirth = ?, ContactNumber = ?
+            WHERE PatientID = ?
+        ''', [(first_name, last_name, _date(dob), contact, patient_id)
+              for patient_id, first_name, last_name, dob, contact in rows])
+
+def delete_patients(database, patient_ids):
+    with database.transaction() as tx:
+        tx.executemany('''
+            DELETE FROM Patients WHERE PatientID = ?
+        ''', [(patient_id,) for patient_id in patient_ids])
+
+def add_patient(database, first_name, last_name, dob, contact):
+    add_patients(database, [(first_name, last_name, dob, contact)])
+
+def update_patient(database, patient_id, first_name, last_name, dob, contact):
+    update_patients(database, [(patient_id, first_name, last_name, dob, contact)])
+
+def delete_patient(database, patient_id):
+    delete_patients(database, [patient_id])
+
+# Functions for managing doctors
+def add_doctors(database, rows):
+    with database.transaction() as tx:
+        tx.executemany('''
+            INSERT INTO Doctors (FirstName, LastName, Department, ContactNumber)
+            VALUES (?, ?, ?, ?)
+        ''', list(rows))
+
+def update_doctors(database, rows):
+    with database.transaction() as tx:
+        tx.executemany('''
+            UPDATE Doctors
+            SET FirstName = ?, LastName = ?, Department = ?, ContactNumber = ?
+            WHERE DoctorID = ?
+        ''', [(first_name, last_name, department, contact, doctor_id)
+              for doctor_id, first_name, last_name, department, contact in rows])
+
+def delete_doctors(database, doctor_ids):
+    with database.transaction() as tx:
+        tx.executemany('''
+            DELETE FROM Doctors WHERE DoctorID = ?
+        ''', [(doctor_id,) for doctor_id in doctor_ids])
+
+def add_doctor(database, first_name, last_name, department, contact):
+    add_doctors(database, [(first_name, last_name, department, contact)])
+
+def update_doctor(database, doctor_id, first_name, last_name, department, contact):
+    update_doctors(database, [(doctor_id, first_name, last_name, department, contact)])
+
+def delete_doctor(database, doctor_id):
+    delete_doctors(database, [doctor_id])
+
+# Most writes grouped into one commit, and how long the writer waits for more to arrive.
+# With no delay a batch is whatever queued up while the previous commit was running.
+MAX_BATCH = 256
+MAX_DELAY = 0
+
+class WriteQueue:
+    # Single background writer that coalesces small writes from many sessions into group commits.
+    # Each write runs under its own savepoint, so a failing write is rolled back and reported
+    # to its caller without affecting the others in the same commit.
+    def __init__(self, database, max_batch=MAX_BATCH, max_delay=MAX_DELAY):
+        self.database = database
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="write-queue", daemon=True)
+        self._thread.start()
+
+    # Queue helper(database, *args) and return a Future resolved once its commit is durable
+    def submit(self, helper, *args):
+        future = Future()
+        self._queue.put((helper, args, future))
+        return future
+
+    # Queue a write and wait for it, re-raising its error
+    def run(self, helper, *args):
+        return self.submit(helper, *args).result()
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            outcomes = []
+            try:
+                with self.database.transaction() as tx:
+                    for helper, args, future in batch:
+                        tx.execute("SAVEPOINT queued_write")
+                        try:
+                            result = helper(self.database, *args)
+                        except Exception as e:
+                            tx.execute("ROLLBACK TO queued_write")
+                            outcomes.append((future, None, e))
+                        else:
+                            outcomes.append((future, result, None))
+                        tx.execute("RELEASE queued_write")
+            except Exception as e:
+                # The commit itself failed: nothing in the batch was written
+                for helper, args, future in batch:
+                    future.set_exception(e)
+                continue
+            for future, result, error in outcomes:
+                if error is None:
+                    future.set_result(result)
+                else:
+                    future.set_exception(error)
+
+_write_queues = {}
+_write_queues_lock = threading.Lock()
+
+# Process-wide write queue for a database
+def get_write_queue(database):
+    with _write_queues_lock:
+        if database.path not in _write_queues:
+            _write_queues[database.path] = WriteQueue(database)
+        return _write_queues[database.path]
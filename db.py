@@ -0,0 +1,180 @@
+import atexit
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from queue import Empty, LifoQueue
+
+from instrumentation import InstrumentedConnection
+from schema import migrate, optimize
+
+DATABASE = 'healthcare.db'
+
+# Maximum number of pooled reader connections per database
+POOL_SIZE = 8
+# Seconds a session waits for a free reader connection
+POOL_TIMEOUT = 30
+
+# Connection settings: WAL lets readers run while a write is in progress,
+# busy_timeout retries instead of failing with "database is locked"
+PRAGMAS = [
+    "PRAGMA busy_timeout = 5000",       # first, so the switch to WAL waits for other processes too
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -65536",       # 64 MiB page cache per connection
+    "PRAGMA mmap_size = 268435456",     # 256 MiB memory-mapped reads
+    "PRAGMA temp_store = MEMORY",
+]
+
+# Table written by an INSERT/REPLACE/UPDATE/DELETE statement
+WRITE_STATEMENT = re.compile(r'^\s*(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)\s+["`\[]?(\w+)', re.I)
+
+# Open a connection with the tuned settings; transactions are managed explicitly and every
+# statement is timed (instrumentation.py)
+def connect(path=DATABASE, readonly=False):
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, factory=InstrumentedConnection)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    if readonly:
+        conn.execute("PRAGMA query_only = ON")
+    return conn
+
+class Database:
+    # Pool of reader connections handed out per thread plus one serialized writer connection.
+    # A read-only Database (a replica) is never migrated or written through writer().
+    def __init__(self, path=DATABASE, pool_size=POOL_SIZE, readonly=False):
+        self.path = path
+        self.readonly = readonly
+        self.pool_size = pool_size
+        self._idle = LifoQueue()
+        self._owners = {}
+        self._created = 0
+        self._pool_lock = threading.Lock()
+        self._write_lock = threading.RLock()
+        self._writer = None
+        self._written = set()
+        self._write_hooks = []
+
+        # Upgrade the schema once per process before any reader is handed out
+        if not readonly:
+            with self.writer() as conn:
+                migrate(conn)
+
+    # Put connections held by finished threads back into the pool
+    # (a Streamlit run that stops early never reaches release_reader)
+    def _reclaim(self):
+        for thread, conn in list(self._owners.items()):
+            if not thread.is_alive():
+                del self._owners[thread]
+                self._idle.put(conn)
+
+    # Check out a read-only connection for the current thread; repeated calls return the same one
+    def reader(self):
+        thread = threading.current_thread()
+        with self._pool_lock:
+            conn = self._owners.get(thread)
+            if conn is not None:
+                return conn
+            self._reclaim()
+            try:
+                conn = self._idle.get_nowait()
+            except Empty:
+                if self._created < self.pool_size:
+                    self._created += 1
+                    conn = connect(self.path, readonly=True)
+        if conn is None:
+            try:
+                conn = self._idle.get(timeout=POOL_TIMEOUT)
+            except Empty:
+                raise RuntimeError("No database connection available, try again")
+        with self._pool_lock:
+            self._owners[thread] = conn
+        return conn
+
+    # Return the current thread's reader connection to the pool
+    def release_reader(self):
+        with self._pool_lock:
+            conn = self._owners.pop(threading.current_thread(), None)
+        if conn is not None:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+
+    # Exclusive access to the single writer connection
+    @contextmanager
+    def writer(self):
+        if self.readonly:
+            raise RuntimeError(f"{self.path} is read-only")
+        with self._write_lock:
+            if self._writer is None:
+                self._writer = connect(self.path)
+                self._writer.set_trace_callback(self._trace_write)
+            yield self._writer
+
+    # Record which tables the writer connection modifies
+    def _trace_write(self, statement):
+        match = WRITE_STATEMENT.match(statement)
+        if match:
+            self._written.add(match.group(1))
+
+    # Register a callback run after every committed transaction with the set of tables it wrote
+    def add_write_hook(self, hook):
+        if hook not in self._write_hooks:
+            self._write_hooks.append(hook)
+
+    # Run the block in one write transaction, committed on success and rolled back on error
+    @contextmanager
+    def transaction(self):
+        with self.writer() as conn:
+            if conn.in_transaction:
+                # Nested use joins the enclosing transaction
+                yield conn
+                return
+            conn.execute("BEGIN IMMEDIATE")
+            self._written.clear()
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                self._written.clear()
+                raise
+            tables = set(self._written)
+            self._written.clear()
+            self.notify_writes(tables)
+
+    # Run the write hooks for tables changed outside transaction(); None stands for every table
+    def notify_writes(self, tables=None):
+        for hook in self._write_hooks:
+            hook(tables)
+
+    # Close every connection, refreshing planner statistics on the way out
+    def close(self):
+        if not self.readonly:
+            with self.writer() as conn:
+                try:
+                    optimize(conn)
+                except sqlite3.OperationalError:
+                    # Another process kept the file busy; its own close refreshes the statistics
+                    pass
+                conn.close()
+                self._writer = None
+        with self._pool_lock:
+            self._reclaim()
+            while True:
+                try:
+                    self._idle.get_nowait().close()
+                except Empty:
+                    break
+            self._created = len(self._owners)
+
+_databases = {}
+_databases_lock = threading.Lock()
+
+# Process-wide Database for a path, shared by every Streamlit session
+def get_database(path=DATABASE):
+    with _databases_lock:
+        if path not in _databases:
+            _databases[path] = Database(path)
+            atexit.register(_databases[path].close)
+        return _databases[path]
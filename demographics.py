@@ -0,0 +1,72 @@
+from datetime import date
+
+import numpy as np
+
+# Fixed age buckets: 20 bins of 5 years, ages above the last edge fall in the last bin
+AGE_BIN_EDGES = np.arange(0, 105, 5)
+
+# Parse YYYY-MM-DD strings into a datetime64[D] array in one pass; unparseable values become NaT
+def parse_dates(values):
+    values = ['' if value is None else value for value in values]
+    try:
+        return np.array(values, dtype='datetime64[D]')
+    except ValueError:
+        parsed = np.empty(len(values), dtype='datetime64[D]')
+        for i, value in enumerate(values):
+            try:
+                parsed[i] = np.datetime64(value, 'D')
+            except ValueError:
+                parsed[i] = np.datetime64('NaT')
+        return parsed
+
+# Age in whole years on `today` for every birth date, with array arithmetic instead of a per-row call.
+# Returns a float array with NaN for missing dates.
+def ages(birth_dates, today=None):
+    today = today or date.today()
+    birth_dates = np.asarray(birth_dates, dtype='datetime64[D]')
+    years = birth_dates.astype('datetime64[Y]')
+    months = birth_dates.astype('datetime64[M]')
+    birth_year = years.astype(np.int64) + 1970
+    birth_month = (months - years).astype(np.int64) + 1
+    birth_day = (birth_dates - months).astype(np.int64) + 1
+
+    # One year less when the birthday has not come round yet this year
+    before_birthday = (birth_month > today.month) | ((birth_month == today.month) & (birth_day > today.day))
+    result = (today.year - birth_year - before_birthday).astype(float)
+    result[np.isnat(birth_dates)] = np.nan
+    return result
+
+# Bin counts over AGE_BIN_EDGES, optionally weighted (e.g. by the number of patients per birth date).
+# Returns (counts, edges); plot with plt.hist(edges[:-1], bins=edges, weights=counts).
+def age_histogram(age_values, weights=None, edges=AGE_BIN_EDGES):
+    age_values = np.asarray(age_values, dtype=float)
+    valid = ~np.isnan(age_values)
+    if weights is not None:
+        weights = np.asarray(weights)[valid]
+    clipped = np.clip(age_values[valid], edges[0], edges[-1])
+    counts, edges = np.histogram(clipped, bins=edges, weights=weights)
+    return counts.astype(np.int64), edges
+
+# Age histogram from (DateOfBirth, Count) rows such as PatientBirthDateCounts
+def age_histogram_from_counts(rows, today=None, edges=AGE_BIN_EDGES):
+    if not rows:
+        return np.zeros(len(edges) - 1, dtype=np.int64), edges
+    birth_dates, counts = zip(*rows)
+    return age_histogram(ages(parse_dates(birth_dates), today), counts, edges)
+
+# Same histogram computed inside SQLite with julianday, for callers without the summary table.
+# Uses 365.25-day years, so ages can be a day early around birthdays.
+def age_histogram_sql(c, table='Patients', edges=AGE_BIN_EDGES):
+    width = int(edges[1] - edges[0])
+    last = len(edges) - 2
+    rows = c.execute(f'''
+        SELECT MIN(MAX(CAST((julianday('now', 'localtime') - julianday(DateOfBirth)) / 365.25 / ? AS INTEGER), 0), ?) AS Bucket,
+               COUNT(*)
+        FROM {table}
+        WHERE julianday(DateOfBirth) IS NOT NULL
+        GROUP BY Bucket
+    ''', (width, last)).fetchall()
+    counts = np.zeros(len(edges) - 1, dtype=np.int64)
+    for bucket, count in rows:
+        counts[bucket] += count
+    return counts, edges
@@ -0,0 +1,167 @@
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from db import connect
+
+# Threads running queries off the Streamlit script threads, each with its own read-only connection
+QUERY_WORKERS = 4
+# Seconds a query may run before it is interrupted
+QUERY_TIME_BUDGET = 10
+# SQLite virtual machine steps between two budget checks
+PROGRESS_STEPS = 1000
+# Rows handed to the caller at a time while streaming
+STREAM_BATCH = 100
+
+_DONE = object()
+
+# A query interrupted because a newer query of the same session replaced it
+class QueryCancelled(RuntimeError):
+    pass
+
+# A query interrupted because it ran past its time budget
+class QueryTimeout(RuntimeError):
+    pass
+
+class RunningQuery:
+    # A query submitted to the executor. Streamed rows arrive through batches(); the final value
+    # (the helper's return value, or the number of rows streamed) through result().
+    def __init__(self, session, budget):
+        self.session = session
+        self.budget = budget
+        self.deadline = None
+        self.cancelled = False
+        self.timed_out = False
+        self._batches = queue.Queue()
+        self._future = None
+
+    # Stop the query at its next budget check; its result() then raises QueryCancelled
+    def cancel(self):
+        self.cancelled = True
+
+    # Progress handler: a non-zero return makes SQLite abort the running statement
+    def _interrupt(self):
+        if self.cancelled:
+            return 1
+        if time.monotonic() > self.deadline:
+            self.timed_out = True
+            return 1
+        return 0
+
+    # Lists of rows as the worker reads them, ending when the query does; raises its error at the end
+    def batches(self):
+        while True:
+            batch = self._batches.get()
+            if batch is _DONE:
+                break
+            yield batch
+        self.result()
+
+    def result(self, timeout=None):
+        return self._future.result(timeout)
+
+    def done(self):
+        return self._future.done()
+
+class QueryExecutor:
+    # Runs read queries on a thread pool so a slow search never holds a script thread or a pooled
+    # connection. Every query gets a time budget enforced by a progress handler, and a query submitted
+    # under a session key cancels that key's previous query, so resubmitting a search stops the old one.
+    # Reads go through the query cache when one is given.
+    def __init__(self, database, query_cache=None, workers=QUERY_WORKERS):
+        self.database = database
+        self.query_cache = query_cache
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='query')
+        self._local = threading.local()
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self.cancelled = 0
+        self.timeouts = 0
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = connect(self.database.path, readonly=True)
+        return conn
+
+    def _submit(self, session, budget, work):
+        query = RunningQuery(session, budget)
+        with self._lock:
+            if session is not None:
+                previous = self._sessions.get(session)
+                if previous is not None:
+                    previous.cancel()
+                self._sessions[session] = query
+        query._future = self._pool.submit(self._run, query, work)
+        return query
+
+    def _run(self, query, work):
+        conn = self._connection()
+        query.deadline = time.monotonic() + query.budget
+        conn.set_progress_handler(query._interrupt, PROGRESS_STEPS)
+        try:
+            try:
+                if query.cancelled:
+                    raise QueryCancelled("Replaced by a newer query")
+                c = self.query_cache.cursor(conn) if self.query_cache else conn
+                return work(conn, c, query)
+            except sqlite3.OperationalError as e:
+                if query.timed_out:
+                    raise QueryTimeout(f"Query ran longer than {query.budget:g} seconds") from e
+                if query.cancelled:
+                    raise QueryCancelled("Replaced by a newer query") from e
+                raise
+        # Counted here whichever check stopped the query: before it ran, between batches or inside SQLite
+        except QueryTimeout:
+            with self._lock:
+                self.timeouts += 1
+            raise
+        except QueryCancelled:
+            with self._lock:
+                self.cancelled += 1
+            raise
+        finally:
+            conn.set_progress_handler(None, 0)
+            if conn.in_transaction:
+                conn.rollback()
+            query._batches.put(_DONE)
+            with self._lock:
+                if query.session is not None and self._sessions.get(query.session) is query:
+                    del self._sessions[query.session]
+
+    # Run `helper(c, *args)` on a worker, e.g. count_rows or search_join; result() returns its value
+    def call(self, session, helper, *args, budget=QUERY_TIME_BUDGET):
+        return self._submit(session, budget, lambda conn, c, query: helper(c, *args))
+
+    # Run a SELECT on a worker, handing rows over in batches as they are read
+    def stream(self, session, sql, params=(), budget=QUERY_TIME_BUDGET, batch_size=STREAM_BATCH):
+        def work(conn, c, query):
+            if self.query_cache:
+                batches = self.query_cache.stream(conn, sql, params, batch_size)
+            else:
+                cursor = conn.execute(sql, params)
+                batches = iter(lambda: cursor.fetchmany(batch_size), [])
+            count = 0
+            for batch in batches:
+                if query.cancelled:
+                    raise QueryCancelled("Replaced by a newer query")
+                query._batches.put(batch)
+                count += len(batch)
+            return count
+        return self._submit(session, budget, work)
+
+    def stats(self):
+        with self._lock:
+            return {'running': len(self._sessions), 'cancelled': self.cancelled, 'timeouts': self.timeouts}
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+# Process-wide query executor for a database, shared by every Streamlit session
+def get_query_executor(database, query_cache=None):
+    with _executors_lock:
+        if database.path not in _executors:
+            _executors[database.path] = QueryExecutor(database, query_cache)
+        return _executors[database.path]
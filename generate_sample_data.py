@@ -1,22 +1,15 @@
-import sqlite3
-from faker import Faker
+import argparse
+import os
 import random
+import sqlite3
+import tempfile
 from datetime import datetime, timedelta
+from multiprocessing import Pool
 
-# Initialize Faker
-fake = Faker()
-
-# Connect to the database
-conn = sqlite3.connect('healthcare.db')
-c = conn.cursor()
+from faker import Faker
 
-# Clear existing data
-def clear_data():
-    c.execute('DELETE FROM Patients')
-    c.execute('DELETE FROM Doctors')
-    c.execute('DELETE FROM Appointments')
-    c.execute('DELETE FROM MedicalRecords')
-    conn.commit()
+from scheduling import ACTIVE_STATUSES, OVERLAP, SLOTS_PER_DAY, slot_time
+from schema import create_base_tables, migrate, restore_suspended_objects, suspend_objects
 
 # Diagnoses and symptoms by department
 department_details = {
@@ -47,73 +40,282 @@ department_details = {
     }
 }
 
-# List of clinics
-clinics = ['Clinic 01', 'Clinic 02', 'Clinic 03', 'Clinic 04', 'Clinic 05']
-
-# Generate Doctors
-def generate_doctors(n):
-    for dept, diagnoses in department_details.items():
-        for _ in range(n // len(department_details)):
-            c.execute('''
-                INSERT INTO Doctors (FirstName, LastName, Department, ContactNumber) 
-                VALUES (?, ?, ?, ?)
-            ''', (fake.first_name(), fake.last_name(), dept, fake.phone_number()))
-
-# Generate Patients
-def generate_patients(n):
-    for _ in range(n):
-        dob = fake.date_of_birth(minimum_age=0, maximum_age=100).strftime('%Y-%m-%d')
-        c.execute('''
-            INSERT INTO Patients (FirstName, LastName, DateOfBirth, ContactNumber) 
-            VALUES (?, ?, ?, ?)
-        ''', (fake.first_name(), fake.last_name(), dob, fake.phone_number()))
-
-# Generate Appointments and Medical Records
-def generate_appointments(past_n, future_n):
-    statuses_past = ['Completed', 'Cancelled', 'No Show']
-    statuses_future = ['Scheduled', 'Cancelled']
-    today = datetime(2024, 1, 1)
-
-    for _ in range(past_n):
-        date = today - timedelta(days=random.randint(1, 365))
-        doctor_id = random.randint(1, 10)
-        doctor_dept = c.execute('SELECT Department FROM Doctors WHERE DoctorID = ?', (doctor_id,)).fetchone()[0]
-        diagnosis = random.choice(list(department_details[doctor_dept].keys()))
-        symptoms = random.choice(department_details[doctor_dept][diagnosis])
-        location = random.choice(clinics)
-        status = random.choice(statuses_past)
-        c.execute('''
-            INSERT INTO Appointments (PatientID, DoctorID, AppointmentDate, AppointmentTime, Status, Location)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (random.randint(1, 30), doctor_id, date.strftime('%Y-%m-%d'), fake.time(), status, location))
-        
-        # Create a medical record only for 'Completed' appointments
-        if status == 'Completed':
-            appointment_id = c.lastrowid
-            c.execute('''
-                INSERT INTO MedicalRecords (AppointmentID, Diagnosis, Details)
-                VALUES (?, ?, ?)
-            ''', (appointment_id, diagnosis, symptoms))
-
-    for _ in range(future_n):
-        date = today + timedelta(days=random.randint(1, 365))
-        location = random.choice(clinics)
-        status = random.choice(statuses_future)
-        c.execute('''
-            INSERT INTO Appointments (PatientID, DoctorID, AppointmentDate, AppointmentTime, Status, Location)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (random.randint(1, 30), random.randint(1, 10), date.strftime('%Y-%m-%d'), fake.time(), status, location))
-
-# Clear existing data
-clear_data()
-
-# Generate new data
-generate_doctors(10)
-generate_patients(200)
-generate_appointments(300, 50)
-
-# Commit changes and close connection
-conn.commit()
-conn.close()
-
-print("Data generation complete.")
+# Default status distributions for past and future appointments
+PAST_STATUSES = {'Completed': 1, 'Cancelled': 1, 'No Show': 1}
+FUTURE_STATUSES = {'Scheduled': 1, 'Cancelled': 1}
+
+# Rows per shard handed to one worker process, and rows per executemany call
+SHARD_SIZE = 250000
+BATCH_SIZE = 10000
+
+# Names drawn from Faker once, then sampled, so generating a row costs a few random() calls
+NAME_POOL_SIZE = 2000
+
+# Parse "Completed=6,Cancelled=3,No Show=1" into {'Completed': 6.0, ...}
+def parse_weights(text):
+    weights = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+def clinic_names(n):
+    return [f'Clinic {i:02d}' for i in range(1, n + 1)]
+
+def name_pools(seed):
+    fake = Faker()
+    fake.seed_instance(seed)
+    return ([fake.first_name() for _ in range(NAME_POOL_SIZE)],
+            [fake.last_name() for _ in range(NAME_POOL_SIZE)])
+
+def phone_number(rng):
+    return f'{rng.randint(200, 999)}-{rng.randint(200, 999)}-{rng.randint(0, 9999):04d}'
+
+# Appointment times on the quarter hour within clinic hours (08:00 to 17:45)
+def appointment_time(rng):
+    return f'{rng.randint(8, 17):02d}:{rng.choice((0, 15, 30, 45)):02d}:00'
+
+# Redraws of the date of an active appointment whose doctor has no free slot left that day
+DATE_ATTEMPTS = 20
+
+# A free slot on the grid for an active appointment of `doctor_id` on `date`, marked as taken, or None
+# when the doctor's day is full. Shards run in parallel, so each owns a share of the (day, slot) grid
+# (`part` is (shard index, shards)) and two shards never hand out the same slot.
+def free_slot_time(rng, taken, doctor_id, date, part):
+    index, parts = part
+    day = date.toordinal() * SLOTS_PER_DAY
+    used = taken.setdefault((doctor_id, date), set())
+    free = [slot for slot in range(SLOTS_PER_DAY) if (day + slot) % parts == index and slot not in used]
+    if not free:
+        return None
+    slot = rng.choice(free)
+    used.add(slot)
+    return slot_time(slot)
+
+# Day offset in [1, days]; 'recent' puts more appointments close to the reference date
+def day_offset(rng, days, distribution):
+    if distribution == 'recent':
+        return max(1, min(days, int(rng.triangular(1, days + 1, 1))))
+    return rng.randint(1, days)
+
+def open_shard(path):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    create_base_tables(conn.cursor())
+    return conn
+
+def insert_batches(conn, sql, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            conn.executemany(sql, batch)
+            batch = []
+    if batch:
+        conn.executemany(sql, batch)
+
+# Worker: write one shard of patients or appointments (with their records) into its own file.
+# Every shard has its own seed derived from the run seed, so output does not depend on scheduling.
+def generate_shard(task):
+    rng = random.Random(task['seed'])
+    conn = open_shard(task['path'])
+    if task['kind'] == 'patients':
+        first_names, last_names = name_pools(task['seed'])
+        today = task['today']
+
+        def patients():
+            for patient_id in range(task['start'], task['start'] + task['count']):
+                dob = today - timedelta(days=rng.randint(0, 100 * 365))
+                yield (patient_id, rng.choice(first_names), rng.choice(last_names),
+                       dob.strftime('%Y-%m-%d'), phone_number(rng))
+
+        insert_batches(conn, "INSERT INTO Patients VALUES (?, ?, ?, ?, ?)", patients())
+    else:
+        generate_appointments(conn, rng, task)
+    conn.commit()
+    conn.close()
+    return task['path']
+
+def generate_appointments(conn, rng, task):
+    today = task['today']
+    departments = task['departments']
+    clinics, clinic_weights = zip(*task['clinics'].items())
+    past_statuses, past_weights = zip(*task['past_statuses'].items())
+    future_statuses, future_weights = zip(*task['future_statuses'].items())
+    records = []
+
+    taken = {}
+
+    def appointments():
+        for appointment_id in range(task['start'], task['start'] + task['count']):
+            doctor_id, department = rng.choice(departments)
+            patient_id = rng.randint(*task['patients'])
+            location = rng.choices(clinics, clinic_weights)[0]
+            past = appointment_id - task['start'] < task['past']
+            if past:
+                status = rng.choices(past_statuses, past_weights)[0]
+            else:
+                status = rng.choices(future_statuses, future_weights)[0]
+            # Scheduled and confirmed appointments hold their slot, so they go where the doctor is free
+            time_text = None
+            for _ in range(DATE_ATTEMPTS if status in ACTIVE_STATUSES else 1):
+                if past:
+                    date = today - timedelta(days=day_offset(rng, task['days_back'], task['date_distribution']))
+                else:
+                    date = today + timedelta(days=day_offset(rng, task['days_ahead'], task['date_distribution']))
+                if status not in ACTIVE_STATUSES:
+                    time_text = appointment_time(rng)
+                    break
+                time_text = free_slot_time(rng, taken, doctor_id, date, task['part'])
+                if time_text:
+                    break
+            if time_text is None:
+                # The doctor is booked out; the appointment was turned away
+                status, time_text = 'Cancelled', appointment_time(rng)
+
+            # Create a medical record only for 'Completed' appointments
+            if status == 'Completed':
+                diagnoses = department_details[department]
+                diagnosis = rng.choice(list(diagnoses))
+                records.append((appointment_id, diagnosis, rng.choice(diagnoses[diagnosis])))
+            yield (appointment_id, patient_id, doctor_id, date.strftime('%Y-%m-%d'),
+                   time_text, status, location)
+
+    insert_batches(conn, "INSERT INTO Appointments VALUES (?, ?, ?, ?, ?, ?, ?)", appointments())
+    insert_batches(conn, "INSERT INTO MedicalRecords (AppointmentID, Diagnosis, Details) VALUES (?, ?, ?)", records)
+
+# Generate doctors in the parent process, spread evenly over the departments
+def generate_doctors(conn, n, seed):
+    rng = random.Random(seed)
+    first_names, last_names = name_pools(seed)
+    departments = []
+    for dept in department_details:
+        departments += [dept] * (n // len(department_details))
+    departments += list(department_details)[:n - len(departments)]
+    conn.executemany('''
+        INSERT INTO Doctors (FirstName, LastName, Department, ContactNumber)
+        VALUES (?, ?, ?, ?)
+    ''', [(rng.choice(first_names), rng.choice(last_names), dept, phone_number(rng)) for dept in departments])
+
+# Every doctor with a department we have diagnoses for, read once and handed to the appointment shards
+def doctor_departments(conn):
+    return conn.execute(f'''
+        SELECT DoctorID, Department FROM Doctors
+        WHERE Department IN ({', '.join('?' for _ in department_details)})
+        ORDER BY DoctorID
+    ''', list(department_details)).fetchall()
+
+def next_id(conn, table, key):
+    return conn.execute(f"SELECT IFNULL(MAX({key}), 0) + 1 FROM {table}").fetchone()[0]
+
+# Split `total` rows starting at id `first` into shard tasks
+def shard_tasks(kind, first, total, seed, workdir, **extra):
+    tasks = []
+    parts = -(-total // SHARD_SIZE)
+    for index, offset in enumerate(range(0, total, SHARD_SIZE)):
+        task = dict(extra, kind=kind, start=first + offset, count=min(SHARD_SIZE, total - offset),
+                    seed=f'{seed}-{kind}-{index}', path=os.path.join(workdir, f'{kind}-{index}.db'),
+                    part=(index, parts))
+        tasks.append(task)
+    return tasks
+
+# Copy a shard into the main database and remove it. Active appointments clashing with ones already
+# in the database (when appending) are left out; returns how many were.
+def merge_shard(conn, path):
+    conn.execute("ATTACH DATABASE ? AS shard", (path,))
+    conn.execute("INSERT INTO main.Patients SELECT * FROM shard.Patients")
+    conflict = OVERLAP.format(doctor='shard_row.DoctorID', date='shard_row.AppointmentDate', time='shard_row.AppointmentTime')
+    active = ', '.join(f"'{status}'" for status in ACTIVE_STATUSES)
+    skipped = conn.execute("SELECT COUNT(*) FROM shard.Appointments").fetchone()[0]
+    skipped -= conn.execute(f'''
+        INSERT INTO main.Appointments SELECT * FROM shard.Appointments AS shard_row
+        WHERE shard_row.Status NOT IN ({active}) OR NOT EXISTS (SELECT 1 FROM main.Appointments WHERE {conflict})
+    ''').rowcount
+    conn.execute('''
+        INSERT INTO main.MedicalRecords (AppointmentID, Diagnosis, Details)
+        SELECT AppointmentID, Diagnosis, Details FROM shard.MedicalRecords ORDER BY RecordID
+    ''')
+    conn.commit()
+    conn.execute("DETACH DATABASE shard")
+    os.remove(path)
+    return skipped
+
+def generate(args):
+    conn = sqlite3.connect(args.database)
+    migrate(conn)
+
+    # Triggers and secondary indexes are rebuilt once at the end instead of per row
+    for table in ('Patients', 'Doctors', 'Appointments', 'MedicalRecords'):
+        suspend_objects(conn.cursor(), table)
+    conn.commit()
+
+    # Clear existing data
+    if not args.append:
+        for table in ('Patients', 'Doctors', 'Appointments', 'MedicalRecords'):
+            conn.execute(f'DELETE FROM {table}')
+        conn.commit()
+
+    today = datetime.strptime(args.today, '%Y-%m-%d')
+    generate_doctors(conn, args.doctors, args.seed)
+    conn.commit()
+    departments = doctor_departments(conn)
+
+    # Appointments pick from the actual id range of the patients, including ones already there
+    first_patient = next_id(conn, 'Patients', 'PatientID')
+    lowest_patient = conn.execute("SELECT IFNULL(MIN(PatientID), ?) FROM Patients", (first_patient,)).fetchone()[0]
+    patients = (lowest_patient, first_patient + args.patients - 1)
+    if not departments or patients[1] < patients[0]:
+        raise SystemExit("Appointments need at least one doctor and one patient")
+
+    clinics = parse_weights(args.clinic_weights) if args.clinic_weights else dict.fromkeys(clinic_names(args.clinics), 1)
+    common = dict(today=today, patients=patients, departments=departments, clinics=clinics,
+                  past_statuses=parse_weights(args.past_statuses) if args.past_statuses else PAST_STATUSES,
+                  future_statuses=parse_weights(args.future_statuses) if args.future_statuses else FUTURE_STATUSES,
+                  days_back=args.days_back, days_ahead=args.days_ahead, date_distribution=args.date_distribution)
+
+    workdir = tempfile.mkdtemp(prefix='healthcare-shards-', dir=os.path.dirname(os.path.abspath(args.database)))
+    tasks = shard_tasks('patients', first_patient, args.patients, args.seed, workdir, today=today)
+    first_appointment = next_id(conn, 'Appointments', 'AppointmentID')
+    appointments = args.past_appointments + args.future_appointments
+    for task in shard_tasks('appointments', first_appointment, appointments, args.seed, workdir, **common):
+        # Past appointments take the first ids, future ones the rest
+        task['past'] = max(0, min(task['count'], first_appointment + args.past_appointments - task['start']))
+        tasks.append(task)
+
+    with Pool(args.workers) as pool:
+        for path in pool.imap(generate_shard, tasks):
+            skipped = merge_shard(conn, path)
+            print(f"Merged {os.path.basename(path)}" + (f", left out {skipped} double bookings" if skipped else ""))
+    os.rmdir(workdir)
+
+    restore_suspended_objects(conn.cursor())
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate synthetic healthcare data")
+    parser.add_argument('--database', default='healthcare.db')
+    parser.add_argument('--doctors', type=int, default=10)
+    parser.add_argument('--patients', type=int, default=200)
+    parser.add_argument('--past-appointments', type=int, default=300)
+    parser.add_argument('--future-appointments', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=None, help="Seed for reproducible output")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--today', default='2024-01-01', help="Reference date splitting past and future appointments")
+    parser.add_argument('--days-back', type=int, default=365)
+    parser.add_argument('--days-ahead', type=int, default=365)
+    parser.add_argument('--date-distribution', choices=['uniform', 'recent'], default='uniform')
+    parser.add_argument('--clinics', type=int, default=5)
+    parser.add_argument('--clinic-weights', help='e.g. "Clinic 01=3,Clinic 02=1"')
+    parser.add_argument('--past-statuses', help='e.g. "Completed=6,Cancelled=3,No Show=1"')
+    parser.add_argument('--future-statuses', help='e.g. "Scheduled=9,Cancelled=1"')
+    parser.add_argument('--append', action='store_true', help="Keep existing rows (ids continue after them)")
+    args = parser.parse_args()
+    if args.seed is None:
+        args.seed = random.randrange(2 ** 32)
+
+    generate(args)
+
+    print("Data generation complete.")
@@ -0,0 +1,125 @@
+from pagination import LISTINGS, DEFAULT_PAGE_SIZE, fetch_page
+
+# Tables whose writes change the timeline
+HISTORY_TABLES = {'Appointments', 'MedicalRecords', 'Doctors'}
+
+# One timeline row for each appointment matching `condition`: the appointment with its doctor's
+# name and department copied in, and the number of medical records and their diagnoses
+TIMELINE_ROW = '''
+    INSERT INTO PatientTimeline (PatientID, AppointmentDate, AppointmentTime, AppointmentID, DoctorID,
+                                 DoctorName, Department, Status, Location, Records, Diagnoses)
+    SELECT IFNULL(a.PatientID, 0), IFNULL(a.AppointmentDate, ''), IFNULL(a.AppointmentTime, ''), a.AppointmentID,
+           a.DoctorID, d.FirstName || ' ' || d.LastName, d.Department, a.Status, a.Location,
+           (SELECT COUNT(*) FROM MedicalRecords r WHERE r.AppointmentID = a.AppointmentID),
+           (SELECT group_concat(r.Diagnosis, '; ') FROM MedicalRecords r WHERE r.AppointmentID = a.AppointmentID)
+    FROM Appointments a LEFT JOIN Doctors d ON d.DoctorID = a.DoctorID
+    WHERE {condition}'''
+
+# Recount the medical records of the appointment `appointment_id`
+REFRESH_RECORDS = '''
+    UPDATE PatientTimeline
+    SET Records = (SELECT COUNT(*) FROM MedicalRecords r WHERE r.AppointmentID = {appointment_id}),
+        Diagnoses = (SELECT group_concat(r.Diagnosis, '; ') FROM MedicalRecords r WHERE r.AppointmentID = {appointment_id})
+    WHERE AppointmentID = {appointment_id}'''
+
+# Migration: a denormalized, per-patient history ordered by date. The primary key clusters each
+# patient's appointments together in date order, so a chart page is one range scan of this table
+# instead of the four-table LEFT JOIN repeating the patient on every row.
+def create_history_table(c):
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS PatientTimeline (
+            PatientID INTEGER NOT NULL,
+            AppointmentDate TEXT NOT NULL,
+            AppointmentTime TEXT NOT NULL,
+            AppointmentID INTEGER NOT NULL,
+            DoctorID INTEGER,
+            DoctorName TEXT,
+            Department TEXT,
+            Status TEXT,
+            Location TEXT,
+            Records INTEGER NOT NULL,
+            Diagnoses TEXT,
+            PRIMARY KEY (PatientID, AppointmentDate, AppointmentTime, AppointmentID)
+        ) WITHOUT ROWID
+    ''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_timeline_appointment ON PatientTimeline (AppointmentID)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_timeline_doctor ON PatientTimeline (DoctorID)")
+
+    c.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS Appointments_timeline_ai AFTER INSERT ON Appointments BEGIN
+            {TIMELINE_ROW.format(condition='a.AppointmentID = new.AppointmentID')};
+        END
+    ''')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS Appointments_timeline_ad AFTER DELETE ON Appointments BEGIN
+            DELETE FROM PatientTimeline WHERE AppointmentID = old.AppointmentID;
+        END
+    ''')
+    # The date or patient may change, which moves the row within the primary key
+    c.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS Appointments_timeline_au AFTER UPDATE ON Appointments BEGIN
+            DELETE FROM PatientTimeline WHERE AppointmentID = old.AppointmentID;
+            {TIMELINE_ROW.format(condition='a.AppointmentID = new.AppointmentID')};
+        END
+    ''')
+
+    c.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS MedicalRecords_timeline_ai AFTER INSERT ON MedicalRecords BEGIN
+            {REFRESH_RECORDS.format(appointment_id='new.AppointmentID')};
+        END
+    ''')
+    c.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS MedicalRecords_timeline_ad AFTER DELETE ON MedicalRecords BEGIN
+            {REFRESH_RECORDS.format(appointment_id='old.AppointmentID')};
+        END
+    ''')
+    c.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS MedicalRecords_timeline_au AFTER UPDATE ON MedicalRecords BEGIN
+            {REFRESH_RECORDS.format(appointment_id='old.AppointmentID')};
+            {REFRESH_RECORDS.format(appointment_id='new.AppointmentID')};
+        END
+    ''')
+
+    # Doctor details are copied into every row, so renames and removals are copied too
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS Doctors_timeline_ai AFTER INSERT ON Doctors BEGIN
+            UPDATE PatientTimeline SET DoctorName = new.FirstName || ' ' || new.LastName, Department = new.Department
+            WHERE DoctorID = new.DoctorID;
+        END
+    ''')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS Doctors_timeline_au AFTER UPDATE OF DoctorID, FirstName, LastName, Department ON Doctors BEGIN
+            UPDATE PatientTimeline SET DoctorName = NULL, Department = NULL WHERE DoctorID = old.DoctorID;
+            UPDATE PatientTimeline SET DoctorName = new.FirstName || ' ' || new.LastName, Department = new.Department
+            WHERE DoctorID = new.DoctorID;
+        END
+    ''')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS Doctors_timeline_ad AFTER DELETE ON Doctors BEGIN
+            UPDATE PatientTimeline SET DoctorName = NULL, Department = NULL WHERE DoctorID = old.DoctorID;
+        END
+    ''')
+
+    rebuild_history(c)
+
+# Recompute the timeline from the base tables
+def rebuild_history(c):
+    c.execute("DELETE FROM PatientTimeline")
+    c.execute(TIMELINE_ROW.format(condition='1'))
+
+# One page of a patient's timeline in date order (latest first by default), as (rows, next_cursor)
+def timeline_page(c, patient_id, after=None, page_size=DEFAULT_PAGE_SIZE, descending=True):
+    listing = LISTINGS['PatientTimeline']
+    return fetch_page(c, listing['select'], listing['source'], listing['key'], listing['sort']["Date"],
+                      "PatientTimeline.PatientID = ?", (patient_id,), after, page_size, descending)
+
+# Medical records of the given appointments, loaded only when a timeline entry is expanded
+def appointment_records(c, appointment_ids):
+    appointment_ids = list(appointment_ids)
+    if not appointment_ids:
+        return []
+    return c.execute(f'''
+        SELECT RecordID, AppointmentID, Diagnosis, Details FROM MedicalRecords
+        WHERE AppointmentID IN ({', '.join('?' for _ in appointment_ids)})
+        ORDER BY AppointmentID, RecordID
+    ''', appointment_ids).fetchall()
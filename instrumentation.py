@@ -0,0 +1,322 @@
+import bisect
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import lru_cache
+
+from query_cache import normalize_sql
+
+# Histogram bucket bounds in seconds, as exported to Prometheus
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Most recent timings kept per query or span for the p50/p95/p99 shown on the diagnostics page
+SAMPLES = 1000
+# Distinct statements tracked; further ones are counted under OTHER_QUERIES
+MAX_QUERIES = 500
+OTHER_QUERIES = "(other statements)"
+# A statement taking this many seconds (execute plus fetch) is logged with its query plan
+SLOW_QUERY_SECONDS = 0.2
+# Slow statements kept for the diagnostics page
+SLOW_QUERY_LOG = 50
+# Prometheus text file, rewritten every EXPORT_INTERVAL seconds (node_exporter's textfile collector reads it)
+PROMETHEUS_FILE = 'healthcare_metrics.prom'
+EXPORT_INTERVAL = 15
+
+logger = logging.getLogger(__name__)
+
+class Histogram:
+    # Timings of one query or span: cumulative bucket counts for export, recent samples for percentiles
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.samples = deque(maxlen=SAMPLES)
+        self.rows = 0
+        self.execute_seconds = 0.0
+        self.fetch_seconds = 0.0
+
+    def observe(self, seconds):
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.samples.append(seconds)
+
+    def percentiles(self, *quantiles):
+        ordered = sorted(self.samples)
+        if not ordered:
+            return [None] * len(quantiles)
+        return [ordered[min(len(ordered) - 1, int(quantile * len(ordered)))] for quantile in quantiles]
+
+class Timings:
+    # Process-wide timings: one histogram per SQL statement (execute and fetch time, rows returned)
+    # and per span (a page run or a section of it), plus a log of recent slow statements
+    def __init__(self):
+        self.queries = {}
+        self.spans = {}
+        self.slow_queries = deque(maxlen=SLOW_QUERY_LOG)
+        self.slow_total = 0
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._exporter = None
+
+    def observe_query(self, name, execute_seconds, fetch_seconds, rows):
+        with self._lock:
+            histogram = self.queries.get(name)
+            if histogram is None:
+                if len(self.queries) >= MAX_QUERIES:
+                    name = OTHER_QUERIES
+                histogram = self.queries.setdefault(name, Histogram())
+            histogram.observe(execute_seconds + fetch_seconds)
+            histogram.execute_seconds += execute_seconds
+            histogram.fetch_seconds += fetch_seconds
+            histogram.rows += rows
+
+    def observe_span(self, kind, name, seconds):
+        with self._lock:
+            histogram = self.spans.get((kind, name))
+            if histogram is None:
+                histogram = self.spans[(kind, name)] = Histogram()
+            histogram.observe(seconds)
+
+    def log_slow_query(self, entry):
+        with self._lock:
+            self.slow_queries.appendleft(entry)
+            self.slow_total += 1
+        logger.warning("Slow query (%.0f ms, %s rows): %s\n%s", entry['seconds'] * 1000, entry['rows'],
+                       entry['statement'], "\n".join(entry['plan']))
+
+    # Per query and per span: count, p50/p95/p99 and totals, slowest p95 first
+    def report(self):
+        with self._lock:
+            queries = [(name, histogram.count, *histogram.percentiles(0.5, 0.95, 0.99), histogram.total,
+                        histogram.execute_seconds, histogram.fetch_seconds, histogram.rows)
+                       for name, histogram in self.queries.items()]
+            spans = [(kind, name, histogram.count, *histogram.percentiles(0.5, 0.95, 0.99), histogram.total)
+                     for (kind, name), histogram in self.spans.items()]
+            slow = list(self.slow_queries)
+        queries.sort(key=lambda row: row[3], reverse=True)
+        spans.sort(key=lambda row: row[4], reverse=True)
+        return queries, spans, slow
+
+    def reset(self):
+        with self._lock:
+            self.queries.clear()
+            self.spans.clear()
+            self.slow_queries.clear()
+            self.slow_total = 0
+            self.started = time.time()
+
+    # The timings in Prometheus text exposition format
+    def prometheus(self):
+        lines = []
+        def histogram_lines(metric, labels, histogram):
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ('+Inf',), histogram.buckets):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_sum{{{labels}}} {histogram.total}')
+            lines.append(f'{metric}_count{{{labels}}} {histogram.count}')
+        with self._lock:
+            lines.append("# HELP healthcare_query_seconds SQL statement latency, execute plus fetch")
+            lines.append("# TYPE healthcare_query_seconds histogram")
+            for name, histogram in self.queries.items():
+                histogram_lines('healthcare_query_seconds', f'query="{_label(name)}"', histogram)
+            lines.append("# HELP healthcare_query_rows_total Rows returned by SQL statements")
+            lines.append("# TYPE healthcare_query_rows_total counter")
+            for name, histogram in self.queries.items():
+                lines.append(f'healthcare_query_rows_total{{query="{_label(name)}"}} {histogram.rows}')
+            lines.append("# HELP healthcare_span_seconds Time spent in page runs and page sections")
+            lines.append("# TYPE healthcare_span_seconds histogram")
+            for (kind, name), histogram in self.spans.items():
+                histogram_lines('healthcare_span_seconds', f'span="{_label(kind)}",name="{_label(name)}"', histogram)
+            lines.append("# HELP healthcare_slow_queries_total Statements slower than the slow query threshold")
+            lines.append("# TYPE healthcare_slow_queries_total counter")
+            lines.append(f"healthcare_slow_queries_total {self.slow_total}")
+        return "\n".join(lines) + "\n"
+
+    # Write the Prometheus text to `path` atomically, so a scrape never reads half a file
+    def export(self, path=PROMETHEUS_FILE):
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, 'w') as f:
+            f.write(self.prometheus())
+        os.replace(temporary, path)
+
+    # Keep `path` up to date from a background thread; later calls change nothing
+    def start_export(self, path=PROMETHEUS_FILE, interval=EXPORT_INTERVAL):
+        with self._lock:
+            if self._exporter is not None:
+                return
+            self._exporter = threading.Thread(target=self._export_loop, args=(path, interval),
+                                              name='metrics-export', daemon=True)
+        self._exporter.start()
+
+    def _export_loop(self, path, interval):
+        while True:
+            try:
+                self.export(path)
+            except OSError as e:
+                logger.warning("Could not write %s: %s", path, e)
+            time.sleep(interval)
+
+# Escape a Prometheus label value
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+# Statements are tracked by their normalized text; parameters are not part of the name
+@lru_cache(maxsize=4096)
+def _query_name(sql):
+    return normalize_sql(sql)
+
+class InstrumentedCursor(sqlite3.Cursor):
+    # Times execute() (preparing the statement and computing the first row) apart from the fetch
+    # calls (the remaining rows, turned into Python tuples). A statement is recorded once its rows
+    # have been fetched, right away when it returns none, or when the cursor moves on to the next
+    # statement. Rows read by iterating over the cursor are not counted, only the time to the first.
+    _sql = None
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._start(sql, parameters, time.perf_counter() - started)
+            # Statements returning no rows (writes, most PRAGMAs) are complete already
+            if self.description is None:
+                self._finish()
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._start(sql, None, time.perf_counter() - started)
+            self._rows = max(self.rowcount, 0)
+            self._finish()
+
+    def _start(self, sql, parameters, seconds):
+        self._sql = sql
+        self._parameters = parameters
+        self._statement = self.connection.last_statement
+        self._execute_seconds = seconds
+        self._fetch_seconds = 0.0
+        self._rows = 0
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(started, 0 if row is None else 1, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(started, len(rows), len(rows) < (self.arraysize if size is None else size))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(started, len(rows), True)
+        return rows
+
+    def _fetched(self, started, rows, exhausted):
+        if self._sql is None:
+            return
+        self._fetch_seconds += time.perf_counter() - started
+        self._rows += rows
+        if exhausted:
+            self._finish()
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def _finish(self):
+        sql = self._sql
+        if sql is None:
+            return
+        self._sql = None
+        timings = get_timings()
+        seconds = self._execute_seconds + self._fetch_seconds
+        timings.observe_query(_query_name(sql), self._execute_seconds, self._fetch_seconds, self._rows)
+        if seconds >= SLOW_QUERY_SECONDS:
+            timings.log_slow_query({
+                'statement': self._statement or sql,
+                'seconds': seconds,
+                'execute_seconds': self._execute_seconds,
+                'fetch_seconds': self._fetch_seconds,
+                'rows': self._rows,
+                'plan': self.connection.query_plan(sql, self._parameters),
+                'at': time.time(),
+            })
+
+class InstrumentedConnection(sqlite3.Connection):
+    # Connection whose cursors time every statement. A trace callback records the statement text
+    # SQLite actually runs, with the bound values filled in, for the slow query log; a trace callback
+    # set by the application (the writer's) still receives every statement.
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.last_statement = None
+        self._trace = None
+        super().set_trace_callback(self._traced)
+
+    def _traced(self, statement):
+        # Statements run by triggers come as "-- TRIGGER name" lines; keep the one that fired them
+        if not statement.startswith('--'):
+            self.last_statement = statement
+        if self._trace is not None:
+            self._trace(statement)
+
+    def set_trace_callback(self, trace_callback):
+        self._trace = trace_callback
+
+    def cursor(self, factory=None):
+        return super().cursor(factory or InstrumentedCursor)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    # EXPLAIN QUERY PLAN lines of a statement, read with a plain cursor so it is not measured itself
+    def query_plan(self, sql, parameters):
+        if parameters is None:
+            return []
+        try:
+            rows = super().cursor().execute("EXPLAIN QUERY PLAN " + sql, parameters).fetchall()
+        except sqlite3.Error as e:
+            return [f"(no plan: {e})"]
+        depth = {0: 0}
+        plan = []
+        for node, parent, _, detail in rows:
+            depth[node] = depth.get(parent, 0) + 1
+            plan.append("  " * (depth[node] - 1) + detail)
+        return plan
+
+_timings = None
+_timings_lock = threading.Lock()
+
+# Process-wide timings shared by all sessions
+def get_timings():
+    global _timings
+    if _timings is not None:
+        return _timings
+    with _timings_lock:
+        if _timings is None:
+            _timings = Timings()
+        return _timings
+
+# Time a block as a span, e.g. span("page", "Home") or span("listing.dataframe", "Patients")
+@contextmanager
+def span(kind, name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        get_timings().observe_span(kind, name, time.perf_counter() - started)
@@ -0,0 +1,135 @@
+import threading
+import time
+
+from demographics import age_histogram_from_counts
+
+# Seconds a cached dashboard snapshot stays valid (also bounds staleness of the date-based counts)
+CACHE_TTL = 60
+
+# Tables whose writes change the dashboard
+METRIC_TABLES = {'Patients', 'Doctors', 'Appointments', 'MedicalRecords'}
+
+# Migration: summary tables kept current by triggers, so the dashboard never scans the base tables.
+# SummaryCounts holds the row count of each table, AppointmentDateCounts and PatientBirthDateCounts
+# hold one counter per distinct date (bounded by the calendar, not by the number of rows).
+def create_metrics_tables(c):
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS SummaryCounts (
+            Name TEXT PRIMARY KEY,
+            Value INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS AppointmentDateCounts (
+            AppointmentDate TEXT PRIMARY KEY,
+            Count INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS PatientBirthDateCounts (
+            DateOfBirth TEXT PRIMARY KEY,
+            Count INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+
+    for table in sorted(METRIC_TABLES):
+        c.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_metrics_ai AFTER INSERT ON {table} BEGIN
+                UPDATE SummaryCounts SET Value = Value + 1 WHERE Name = '{table}';
+            END
+        ''')
+        c.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_metrics_ad AFTER DELETE ON {table} BEGIN
+                UPDATE SummaryCounts SET Value = Value - 1 WHERE Name = '{table}';
+            END
+        ''')
+
+    # Per-date counters, moved between dates when a row's date changes
+    for table, column, counts in [('Appointments', 'AppointmentDate', 'AppointmentDateCounts'),
+                                  ('Patients', 'DateOfBirth', 'PatientBirthDateCounts')]:
+        increment = f'''
+                INSERT INTO {counts} ({column}, Count) VALUES (IFNULL(new.{column}, ''), 1)
+                ON CONFLICT ({column}) DO UPDATE SET Count = Count + 1;'''
+        decrement = f'''
+                UPDATE {counts} SET Count = Count - 1 WHERE {column} = IFNULL(old.{column}, '');
+                DELETE FROM {counts} WHERE {column} = IFNULL(old.{column}, '') AND Count <= 0;'''
+        c.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_{column}_counts_ai AFTER INSERT ON {table} BEGIN{increment}
+            END
+        ''')
+        c.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_{column}_counts_ad AFTER DELETE ON {table} BEGIN{decrement}
+            END
+        ''')
+        c.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_{column}_counts_au AFTER UPDATE OF {column} ON {table}
+            WHEN IFNULL(old.{column}, '') != IFNULL(new.{column}, '') BEGIN{decrement}{increment}
+            END
+        ''')
+
+    rebuild_metrics(c)
+
+# Recompute the summary tables from the base tables
+def rebuild_metrics(c):
+    c.execute("DELETE FROM SummaryCounts")
+    for table in sorted(METRIC_TABLES):
+        c.execute(f"INSERT INTO SummaryCounts (Name, Value) SELECT '{table}', COUNT(*) FROM {table}")
+    c.execute("DELETE FROM AppointmentDateCounts")
+    c.execute('''
+        INSERT INTO AppointmentDateCounts (AppointmentDate, Count)
+        SELECT IFNULL(AppointmentDate, ''), COUNT(*) FROM Appointments GROUP BY 1
+    ''')
+    c.execute("DELETE FROM PatientBirthDateCounts")
+    c.execute('''
+        INSERT INTO PatientBirthDateCounts (DateOfBirth, Count)
+        SELECT IFNULL(DateOfBirth, ''), COUNT(*) FROM Patients GROUP BY 1
+    ''')
+
+# Read the dashboard figures from the summary tables
+def load_metrics(c):
+    totals = dict(c.execute("SELECT Name, Value FROM SummaryCounts").fetchall())
+    upcoming = c.execute('''
+        SELECT IFNULL(SUM(Count), 0) FROM AppointmentDateCounts WHERE AppointmentDate >= DATE('now')
+    ''').fetchone()[0]
+    # Vectorized ages over the distinct birth dates, weighted by the number of patients born that day
+    birth_dates = c.execute("SELECT DateOfBirth, Count FROM PatientBirthDateCounts WHERE Count > 0").fetchall()
+    age_counts, age_edges = age_histogram_from_counts(birth_dates)
+    return {
+        'total_patients': totals.get('Patients', 0),
+        'total_doctors': totals.get('Doctors', 0),
+        'total_appointments': totals.get('Appointments', 0),
+        'total_medical_records': totals.get('MedicalRecords', 0),
+        'upcoming_appointments': upcoming,
+        'age_counts': age_counts,
+        'age_edges': age_edges,
+    }
+
+_cache = {}
+_generations = {}
+_cache_lock = threading.Lock()
+
+# Dashboard figures for a database, shared by all sessions for CACHE_TTL seconds
+# and dropped as soon as a committed write touches one of the counted tables
+def get_metrics(database):
+    with _cache_lock:
+        if database.path not in _generations:
+            _generations[database.path] = 0
+            database.add_write_hook(lambda tables: invalidate_metrics(database.path, tables))
+        cached = _cache.get(database.path)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+        generation = _generations[database.path]
+
+    metrics = load_metrics(database.reader())
+
+    # Do not cache figures that a write invalidated while they were being read
+    with _cache_lock:
+        if _generations[database.path] == generation:
+            _cache[database.path] = (time.monotonic() + CACHE_TTL, metrics)
+    return metrics
+
+def invalidate_metrics(path, tables=None):
+    if tables is None or tables & METRIC_TABLES:
+        with _cache_lock:
+            _generations[path] = _generations.get(path, 0) + 1
+            _cache.pop(path, None)
@@ -0,0 +1,152 @@
+PAGE_SIZES = [25, 50, 100, 250, 500]
+DEFAULT_PAGE_SIZE = 50
+
+# Tables below this size are counted exactly, larger ones are estimated
+EXACT_COUNT_LIMIT = 100000
+
+# Listing definitions: selected columns, FROM clause, unique key, display headers and sort options.
+# Patients and Doctors pages without a filter are served from the reference snapshot (reference.py).
+# Every sort option is backed by an index whose trailing column is the key (see schema.py).
+LISTINGS = {
+    'Patients': {
+        'select': "Patients.PatientID, Patients.FirstName, Patients.LastName, Patients.DateOfBirth, Patients.ContactNumber",
+        'source': "Patients",
+        'key': "Patients.PatientID",
+        'table': "Patients",
+        'columns': ["Patient ID", "First Name", "Last Name", "DOB", "Contact"],
+        'sort': {
+            "Patient ID": (),
+            "Last Name": ("Patients.LastName",),
+            "Date of Birth": ("Patients.DateOfBirth",),
+        },
+    },
+    'Doctors': {
+        'select': "Doctors.DoctorID, Doctors.FirstName, Doctors.LastName, Doctors.Department, Doctors.ContactNumber",
+        'source': "Doctors",
+        'key': "Doctors.DoctorID",
+        'table': "Doctors",
+        'columns': ["Doctor ID", "First Name", "Last Name", "Department", "Contact"],
+        'sort': {
+            "Doctor ID": (),
+            "Department": ("Doctors.Department",),
+        },
+    },
+    'Appointments': {
+        'select': """Appointments.AppointmentID, Appointments.PatientID, Appointments.DoctorID, Appointments.AppointmentDate,
+            Appointments.AppointmentTime, Appointments.Status, Appointments.Location""",
+        'source': "Appointments",
+        'key': "Appointments.AppointmentID",
+        'table': "Appointments",
+        'columns': ["Appointment ID", "Patient Name", "Doctor Name", "Date", "Time", "Status", "Location"],
+        # Arrow type of each column: the page is built as typed columns (columnar.py), not as rows
+        'types': ["int64", "string", "string", "date32", "string", "string", "string"],
+        # Selected ids shown as the name of the patient or doctor, from the reference snapshot
+        # (listings with names are typed)
+        'names': {1: 'Patients', 2: 'Doctors'},
+        'sort': {
+            "Appointment ID": (),
+            "Date": ("Appointments.AppointmentDate",),
+            "Status": ("Appointments.Status", "Appointments.AppointmentDate"),
+        },
+    },
+    'MedicalRecords': {
+        'select': """MedicalRecords.RecordID, Appointments.AppointmentID, Appointments.PatientID,
+            Appointments.DoctorID, MedicalRecords.Diagnosis, MedicalRecords.Details""",
+        'source': """MedicalRecords
+            JOIN Appointments ON MedicalRecords.AppointmentID = Appointments.AppointmentID""",
+        'key': "MedicalRecords.RecordID",
+        'table': "MedicalRecords",
+        'columns': ["Record ID", "Appointment ID", "Patient Name", "Doctor Name", "Diagnosis", "Details"],
+        'types': ["int64", "int64", "string", "string", "string", "string"],
+        'names': {2: 'Patients', 3: 'Doctors'},
+        'sort': {
+            "Record ID": (),
+            "Appointment ID": ("MedicalRecords.AppointmentID",),
+            "Diagnosis": ("MedicalRecords.Diagnosis",),
+        },
+    },
+    'PatientTimeline': {
+        'select': """PatientTimeline.AppointmentID, PatientTimeline.AppointmentDate, PatientTimeline.AppointmentTime,
+            PatientTimeline.Status, PatientTimeline.Location, PatientTimeline.DoctorName, PatientTimeline.Department,
+            PatientTimeline.Records, PatientTimeline.Diagnoses""",
+        'source': "PatientTimeline",
+        'key': "PatientTimeline.AppointmentID",
+        'table': "PatientTimeline",
+        'columns': ["Appointment ID", "Date", "Time", "Status", "Location", "Doctor", "Department", "Records", "Diagnoses"],
+        # Listed with a PatientID filter, so the primary key (PatientID, date, time, id) serves every page
+        'sort': {
+            "Date": ("PatientTimeline.AppointmentDate", "PatientTimeline.AppointmentTime"),
+        },
+    },
+}
+
+# Sort columns that may hold NULL (the base tables have no NOT NULL constraints and bulk imports
+# accept empty cells). They are sorted and compared as IFNULL(column, ''), so a row-value cursor
+# never meets a NULL; expression indexes on the same IFNULL back them (schema.py, migration 13).
+NULLABLE_SORT_COLUMNS = {
+    "Patients.LastName", "Patients.DateOfBirth", "Doctors.Department",
+    "Appointments.AppointmentDate", "Appointments.Status",
+    "MedicalRecords.AppointmentID", "MedicalRecords.Diagnosis",
+}
+
+def _expressions(value):
+    return [value] if isinstance(value, str) else list(value)
+
+def _sort_expression(expression):
+    return f"IFNULL({expression}, '')" if expression in NULLABLE_SORT_COLUMNS else expression
+
+# Fetch one page of `SELECT select FROM source [WHERE where]` with keyset (seek) pagination.
+# The page is ordered by the sort expressions followed by the unique key; `after` is the cursor
+# returned for the previous page, so each page is an index seek instead of an OFFSET scan.
+# Returns (rows, next_cursor) where next_cursor is None on the last page.
+def fetch_page(c, select, source, key, sort=(), where=None, params=(), after=None,
+               page_size=DEFAULT_PAGE_SIZE, descending=False):
+    query, args, width = page_query(select, source, key, sort, where, params, after, page_size, descending)
+    return split_page(c.execute(query, args).fetchall(), page_size, width)
+
+# The SQL behind fetch_page, for callers running it themselves (e.g. streamed on a worker).
+# Returns (query, args, width): rows carry `width` trailing sort columns for split_page.
+def page_query(select, source, key, sort=(), where=None, params=(), after=None,
+               page_size=DEFAULT_PAGE_SIZE, descending=False):
+    order_by = [_sort_expression(expression) for expression in _expressions(sort)] + _expressions(key)
+    conditions = [where] if where else []
+    args = list(params)
+    if after is not None:
+        op = '<' if descending else '>'
+        # The bound on the leading expression alone lets SQLite seek an expression index, which it
+        # does not do for the row-value comparison
+        conditions.append(f"{order_by[0]} {op}= ?")
+        conditions.append(f"({', '.join(order_by)}) {op} ({', '.join('?' for _ in order_by)})")
+        args += [after[0]] + list(after)
+
+    direction = ' DESC' if descending else ''
+    query = f"SELECT {select}, {', '.join(order_by)} FROM {source}"
+    if conditions:
+        query += " WHERE " + " AND ".join(f"({condition})" for condition in conditions)
+    query += " ORDER BY " + ", ".join(expr + direction for expr in order_by) + " LIMIT ?"
+    return query, args + [page_size + 1], len(order_by)
+
+# Split the rows of page_query into (page rows, next_cursor)
+def split_page(rows, page_size, width):
+    next_cursor = tuple(rows[page_size - 1][-width:]) if len(rows) > page_size else None
+    return [row[:-width] for row in rows[:page_size]], next_cursor
+
+# Estimate the number of rows in a table in O(log n) from the rowid range,
+# counting exactly when the table is small. Returns (count, exact).
+def estimate_count(c, table):
+    # Separate subqueries so each one is a single b-tree seek
+    low, high = c.execute(f"SELECT (SELECT MIN(rowid) FROM {table}), (SELECT MAX(rowid) FROM {table})").fetchone()
+    if low is None:
+        return 0, True
+    if high - low + 1 < EXACT_COUNT_LIMIT:
+        return c.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0], True
+    return high - low + 1, False
+
+# Count the rows of a filtered listing, stopping at `cap`. Returns (count, exact).
+def count_rows(c, source, where=None, params=(), cap=EXACT_COUNT_LIMIT):
+    query = f"SELECT COUNT(*) FROM (SELECT 1 FROM {source}"
+    if where:
+        query += f" WHERE {where}"
+    query += " LIMIT ?)"
+    count = c.execute(query, list(params) + [cap + 1]).fetchone()[0]
+    return min(count, cap), count <= cap
@@ -0,0 +1,231 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# Most cached results, most rows held over all of them, and seconds a result stays valid.
+# The TTL bounds staleness for writes this process does not see (other processes, the sqlite3 shell).
+QUERY_CACHE_ENTRIES = 1024
+QUERY_CACHE_ROWS = 250000
+QUERY_CACHE_TTL = 300
+
+# Statements that read and can be cached
+CACHEABLE = re.compile(r'^\s*(?:SELECT|WITH)\b', re.I)
+# Tables written inside a trigger body
+TRIGGER_WRITE = re.compile(r'(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)\s+["`\[]?(\w+)', re.I)
+# Whitespace outside string literals
+_WHITESPACE = re.compile(r"('(?:[^']|'')*')|\s+")
+
+# Collapse whitespace so the same query written on one line or several shares an entry
+def normalize_sql(sql):
+    return _WHITESPACE.sub(lambda m: m.group(1) or ' ', sql).strip()
+
+# Hashable form of the query parameters
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+class QueryCache:
+    # LRU cache of query results shared by every session of a database. Each entry remembers the
+    # tables its query reads; a committed write drops only the entries that read a table it changed,
+    # including tables changed by its triggers (search indexes, summary counts).
+    def __init__(self, database, max_entries=QUERY_CACHE_ENTRIES, max_rows=QUERY_CACHE_ROWS, ttl=QUERY_CACHE_TTL):
+        self.database = database
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._dependents = {}
+        self._rows = 0
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._schema_version = None
+        self._tables = set()
+        self._triggers = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        database.add_write_hook(self.invalidate)
+
+    # Table names (lowercase) and, per table, the tables its triggers write; reloaded after schema changes
+    def _load_schema(self, conn):
+        version = conn.execute("PRAGMA schema_version").fetchone()[0]
+        if version == self._schema_version:
+            return
+        tables, triggers = set(), {}
+        for object_type, name, table, sql in conn.execute("SELECT type, name, tbl_name, sql FROM sqlite_master").fetchall():
+            if object_type == 'table':
+                tables.add(name.lower())
+            elif object_type == 'trigger' and sql:
+                body = sql[sql.upper().index('BEGIN'):]
+                triggers.setdefault(table.lower(), set()).update(m.lower() for m in TRIGGER_WRITE.findall(body))
+        self._tables, self._triggers, self._schema_version = tables, triggers, version
+
+    def _dependencies(self, sql):
+        return {word for word in re.findall(r'\w+', sql.lower()) if word in self._tables}
+
+    # Every table changed by writing `tables`, following triggers that write other tables
+    def _affected(self, tables):
+        affected = set()
+        pending = [table.lower() for table in tables]
+        while pending:
+            table = pending.pop()
+            if table not in affected:
+                affected.add(table)
+                pending.extend(self._triggers.get(table, ()))
+        return affected
+
+    # Rows of a read query, from the cache when possible. Other statements run uncached.
+    def fetchall(self, conn, sql, params=()):
+        if not CACHEABLE.match(sql):
+            return conn.execute(sql, params).fetchall()
+        key, rows, pending = self._lookup(conn, sql, params)
+        if rows is None:
+            rows = conn.execute(key[0], params).fetchall()
+            self._store(key, rows, pending)
+        return rows
+
+    # Rows of a read query in batches of `batch_size`: a cached result comes back as one batch,
+    # otherwise rows are yielded as SQLite produces them and cached once the query has finished.
+    # A stream closed or interrupted early caches nothing.
+    def stream(self, conn, sql, params=(), batch_size=100):
+        cacheable = CACHEABLE.match(sql)
+        if cacheable:
+            key, rows, pending = self._lookup(conn, sql, params)
+            if rows is not None:
+                yield rows
+                return
+            sql = key[0]
+        cursor = conn.execute(sql, params)
+        rows = []
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            rows += batch
+            yield batch
+        if cacheable:
+            self._store(key, rows, pending)
+
+    # (key, cached rows or None, state needed to store the rows of a miss)
+    def _lookup(self, conn, sql, params):
+        sql = normalize_sql(sql)
+        key = (sql, _freeze(params))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return key, entry[1], None
+            self.misses += 1
+            self._load_schema(conn)
+            return key, None, (now, self._generation, self._dependencies(sql))
+
+    def _store(self, key, rows, pending):
+        now, generation, tables = pending
+        with self._lock:
+            # A write committed while the query ran may not be in these rows
+            if generation == self._generation and len(rows) <= self.max_rows:
+                self._remove(key)
+                self._entries[key] = (now + self.ttl, rows, tables)
+                self._rows += len(rows)
+                for table in tables:
+                    self._dependents.setdefault(table, set()).add(key)
+                while len(self._entries) > self.max_entries or self._rows > self.max_rows:
+                    self._remove(next(iter(self._entries)))
+                    self.evictions += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._rows -= len(entry[1])
+        for table in entry[2]:
+            keys = self._dependents.get(table)
+            if keys:
+                keys.discard(key)
+
+    # Drop the entries reading any of `tables` (everything when tables is None).
+    # Registered as a write hook, so it runs after every committed transaction.
+    def invalidate(self, tables=None):
+        if tables is not None:
+            # Pick up triggers created since the last lookup (e.g. restored after a bulk load)
+            with self.database.writer() as conn:
+                self._load_schema(conn)
+        with self._lock:
+            self._generation += 1
+            if tables is None:
+                self.invalidations += len(self._entries)
+                self._entries.clear()
+                self._dependents.clear()
+                self._rows = 0
+                return
+            for table in self._affected(tables):
+                for key in list(self._dependents.pop(table, ())):
+                    if key in self._entries:
+                        self._remove(key)
+                        self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'rows': self._rows,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+    # Cursor-like wrapper over a connection whose reads go through the cache
+    def cursor(self, conn):
+        return CachedCursor(self, conn)
+
+class CachedCursor:
+    # Enough of the sqlite3.Cursor interface for the listing, count and search helpers
+    def __init__(self, cache, conn):
+        self.cache = cache
+        self.connection = conn
+        self._rows = []
+        self._position = 0
+
+    def execute(self, sql, params=()):
+        self._rows = self.cache.fetchall(self.connection, sql, params)
+        self._position = 0
+        return self
+
+    def fetchone(self):
+        if self._position >= len(self._rows):
+            return None
+        self._position += 1
+        return self._rows[self._position - 1]
+
+    def fetchmany(self, size=1):
+        rows = self._rows[self._position:self._position + size]
+        self._position += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._rows[self._position:]
+        self._position = len(self._rows)
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+# Process-wide query cache for a database, shared by every Streamlit session
+def get_query_cache(database):
+    with _caches_lock:
+        if database.path not in _caches:
+            _caches[database.path] = QueryCache(database)
+        return _caches[database.path]
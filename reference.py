@@ -0,0 +1,389 @@
+import sys
+import threading
+import time
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+import pandas as pd
+
+from db import connect
+
+# Reference tables held in memory: key column and the text columns kept for each row
+REFERENCE_TABLES = {
+    'Patients': ('PatientID', ['FirstName', 'LastName', 'DateOfBirth', 'ContactNumber']),
+    'Doctors': ('DoctorID', ['FirstName', 'LastName', 'Department', 'ContactNumber']),
+}
+
+# Past this many changed rows in one commit (or this share of a table) the table is reloaded
+# instead of patched row by row
+PATCH_LIMIT = 1000
+PATCH_SHARE = 0.1
+
+# Ids of the reference rows each write touched, recorded by temporary triggers on the writer
+# connection only; the temp schema takes part in the transaction, so rolled back writes leave nothing.
+# Rows is 1 for each row written (0 for the old image of an update), matching the bumps of the
+# table's TableVersions row (schema.py).
+CHANGES_TABLE = "temp.ReferenceChanges"
+
+# Seconds between two checks for commits made by other connections (another process or worker)
+REFERENCE_CHECK_INTERVAL = 1.0
+
+# Columns with more distinct values than this share of their rows are stored as fixed-width bytes
+DICTIONARY_SHARE = 0.5
+
+def _sort_key(value):
+    # NULL sorts as '', like the IFNULL(column, '') the SQL listings order by (pagination.py)
+    return '' if value is None else value
+
+class DictionaryColumn:
+    # Text as an int32 code per row into the list of distinct values (code 0 is NULL).
+    # Names, departments and birth dates repeat a lot, so each distinct string is stored once.
+    def __init__(self, series):
+        codes, uniques = pd.factorize(series, use_na_sentinel=True)
+        self.codes = (codes + 1).astype(np.int32)
+        self.values = [None] + list(uniques)
+        self._lookup = {value: code for code, value in enumerate(self.values)}
+
+    def resize(self, capacity):
+        self.codes = np.resize(self.codes, capacity)
+
+    def set(self, position, value):
+        code = self._lookup.get(value)
+        if code is None:
+            code = self._lookup[value] = len(self.values)
+            self.values.append(value)
+        self.codes[position] = code
+
+    def take(self, positions):
+        values = self.values
+        return [values[code] for code in self.codes[positions].tolist()]
+
+    # lexsort keys, least significant first; ranks follow SQLite's BINARY order of the values, and
+    # values sorting alike (NULL and '') share a rank so their rows stay in id order
+    def sort_keys(self, positions):
+        ranks = np.empty(len(self.values), dtype=np.int32)
+        rank, previous = -1, None
+        for code in sorted(range(len(self.values)), key=lambda code: _sort_key(self.values[code])):
+            key = _sort_key(self.values[code])
+            if rank < 0 or key != previous:
+                rank, previous = rank + 1, key
+            ranks[code] = rank
+        return [ranks[self.codes[positions]]]
+
+    def nbytes(self):
+        return (self.codes.nbytes + sum(sys.getsizeof(value) for value in self.values)
+                + sys.getsizeof(self.values) + sys.getsizeof(self._lookup))
+
+class BytesColumn:
+    # Nearly unique text (contact numbers) as one fixed-width UTF-8 array plus a NULL mask,
+    # instead of a Python string per row. The width grows when a longer value is written.
+    def __init__(self, series):
+        self.nulls = series.isna().to_numpy()
+        self.data = np.array([b'' if value is None else str(value).encode() for value in series.where(~self.nulls, None)], dtype=bytes)
+        if self.data.dtype.itemsize == 0:
+            self.data = self.data.astype('S1')
+
+    def resize(self, capacity):
+        self.data = np.resize(self.data, capacity)
+        self.nulls = np.resize(self.nulls, capacity)
+
+    def set(self, position, value):
+        encoded = b'' if value is None else str(value).encode()
+        if len(encoded) > self.data.dtype.itemsize:
+            self.data = self.data.astype(f'S{len(encoded)}')
+        self.data[position] = encoded
+        self.nulls[position] = value is None
+
+    def take(self, positions):
+        return [None if null else value.decode() for value, null in zip(self.data[positions].tolist(), self.nulls[positions].tolist())]
+
+    # UTF-8 byte order is SQLite's BINARY order; NULL is stored as b'' and sorts as ''
+    def sort_keys(self, positions):
+        return [self.data[positions]]
+
+    def nbytes(self):
+        return self.data.nbytes + self.nulls.nbytes
+
+class ColumnTable:
+    # One reference table as columns: int64 ids, a live-row mask, and one encoded array per text
+    # column. Rows are found by binary search over the ids, which stay sorted as long as new rows
+    # get new, higher ids; deleted rows keep their slot until the next reload.
+    def __init__(self, name, key, columns):
+        self.name = name
+        self.key = key
+        self.column_names = columns
+        self.load([])
+
+    # Fill from (id, *columns) rows, replacing the contents
+    def load(self, rows):
+        frame = pd.DataFrame(rows, columns=[self.key] + self.column_names)
+        frame = frame.sort_values(self.key, kind='stable')
+        self.size = self.live = len(frame)
+        self.ids = frame[self.key].to_numpy(dtype=np.int64)
+        self.alive = np.ones(self.size, dtype=bool)
+        self.columns = {}
+        for name in self.column_names:
+            series = frame[name].astype(object)
+            kind = DictionaryColumn if series.nunique() <= max(1, len(series) * DICTIONARY_SHARE) else BytesColumn
+            self.columns[name] = kind(series)
+        self._id_order = self._sorted_ids = None
+        self._orders = {}
+
+    def _grow(self):
+        capacity = max(16, len(self.ids) * 2)
+        self.ids = np.resize(self.ids, capacity)
+        self.alive = np.resize(self.alive, capacity)
+        for column in self.columns.values():
+            column.resize(capacity)
+
+    # Positions of the given ids in the arrays (alive or deleted), -1 where unknown
+    def _positions(self, row_ids):
+        wanted = np.array([-1 if row_id is None else row_id for row_id in row_ids], dtype=np.int64)
+        if not self.size:
+            return np.full(len(wanted), -1, dtype=np.int64)
+        sorted_ids = self.ids[:self.size] if self._id_order is None else self._sorted_ids
+        found = np.minimum(np.searchsorted(sorted_ids, wanted), self.size - 1)
+        positions = found if self._id_order is None else self._id_order[found]
+        return np.where(self.ids[positions] == wanted, positions, -1)
+
+    def upsert(self, row_id, values):
+        position = int(self._positions([row_id])[0])
+        if position < 0:
+            if self.size == len(self.ids):
+                self._grow()
+            position = self.size
+            unordered = self._id_order is not None or (self.size and row_id < self.ids[self.size - 1])
+            self.ids[position] = row_id
+            self.alive[position] = False
+            self.size += 1
+            # A new id below the highest one (an explicit id) breaks the sorted order:
+            # look rows up through a sorted permutation from then on
+            if unordered:
+                self._id_order = np.argsort(self.ids[:self.size], kind='stable')
+                self._sorted_ids = self.ids[self._id_order]
+        if not self.alive[position]:
+            self.alive[position] = True
+            self.live += 1
+        for name, value in zip(self.column_names, values):
+            self.columns[name].set(position, value)
+        self._orders = {}
+
+    def delete(self, row_id):
+        position = int(self._positions([row_id])[0])
+        if position >= 0 and self.alive[position]:
+            self.alive[position] = False
+            self.live -= 1
+            self._orders = {}
+
+    # Rows at the given positions as (id, *columns) tuples
+    def take(self, positions, columns=None):
+        positions = np.asarray(positions, dtype=np.int64)
+        columns = columns or self.column_names
+        return list(zip(self.ids[positions].tolist(), *(self.columns[name].take(positions) for name in columns)))
+
+    # Rows for the given ids, None where an id is unknown
+    def rows(self, row_ids, columns=None):
+        positions = self._positions(row_ids)
+        known = (positions >= 0) & self.alive[np.maximum(positions, 0)]
+        found = iter(self.take(positions[known], columns))
+        return [next(found) if ok else None for ok in known.tolist()]
+
+    # Live positions ordered by the `sort` columns then id; cached until the next change
+    def _order(self, sort):
+        order = self._orders.get(sort)
+        if order is None:
+            live = np.flatnonzero(self.alive[:self.size])
+            keys = [self.ids[live]]
+            for name in reversed(sort):
+                keys += self.columns[name].sort_keys(live)
+            order = self._orders[sort] = live[np.lexsort(keys)]
+        return order
+
+    # Keyset page over the live rows, like pagination.fetch_page: `after` is the (sort values..., id)
+    # cursor of the previous page. Returns (rows, next_cursor).
+    def page(self, sort=(), after=None, page_size=50, descending=False):
+        sort = tuple(sort)
+        order = self._order(sort)
+        if after is not None:
+            key = lambda position: tuple(_sort_key(values[0]) for values in
+                                         (self.columns[name].take([position]) for name in sort)) + (int(self.ids[position]),)
+            target = tuple(_sort_key(value) for value in after[:-1]) + (after[-1],)
+        if descending:
+            end = len(order) if after is None else bisect_left(order, target, key=key)
+            positions = order[max(0, end - page_size - 1):end][::-1]
+        else:
+            start = 0 if after is None else bisect_right(order, target, key=key)
+            positions = order[start:start + page_size + 1]
+        rows = self.take(positions[:page_size])
+        next_cursor = None
+        if len(positions) > page_size:
+            last = positions[page_size - 1:page_size]
+            next_cursor = tuple(self.columns[name].take(last)[0] for name in sort) + (int(self.ids[last[0]]),)
+        return rows, next_cursor
+
+    # Bytes held, per column and for the id index and cached sort orders
+    def memory(self):
+        report = {'ids': self.ids.nbytes + self.alive.nbytes}
+        if self._id_order is not None:
+            report['ids'] += self._id_order.nbytes + self._sorted_ids.nbytes
+        for name, column in self.columns.items():
+            report[name] = column.nbytes()
+        report['sort orders'] = sum(order.nbytes for order in self._orders.values())
+        return report
+
+class ReferenceSnapshot:
+    # Process-wide copy of Patients and Doctors for listings and name lookups without SQLite.
+    # Committed writes made through this process's writer are patched in row by row; `version` goes
+    # up with every change, so results derived from the snapshot can be cached against it.
+    # Commits by any other connection (the bulk_io CLI, the generator, another server worker) change
+    # PRAGMA data_version, which reads check at most every REFERENCE_CHECK_INTERVAL seconds; the
+    # tables whose TableVersions row moved past the version held here are then read again in full.
+    def __init__(self, database):
+        self.database = database
+        self.version = 0
+        self.tables = {name: ColumnTable(name, key, columns) for name, (key, columns) in REFERENCE_TABLES.items()}
+        self._lock = threading.RLock()
+        self._loaded = False
+        # TableVersions row of each table as of the data held
+        self._versions = {}
+        # data_version of a connection of our own changes with every commit by any connection,
+        # so TableVersions is only read after something was committed
+        self._monitor = connect(database.path, readonly=True)
+        self._monitor_version = None
+        self._checked = 0
+        with database.writer() as conn:
+            self._create_change_triggers(conn)
+        database.add_write_hook(self._apply_changes)
+        self.reload()
+
+    def _data_version(self, conn):
+        return conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _table_versions(self, conn):
+        return dict(conn.execute("SELECT TableName, Version FROM TableVersions").fetchall())
+
+    # Reload the tables another connection changed since the last look
+    def _check_external_writes(self):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked < REFERENCE_CHECK_INTERVAL:
+                return
+            self._checked = now
+            data_version = self._data_version(self._monitor)
+            if data_version == self._monitor_version:
+                return
+            self._monitor_version = data_version
+            versions = self._table_versions(self._monitor)
+            stale = [name for name in self.tables if versions.get(name) != self._versions.get(name)]
+        if stale:
+            self.reload(stale)
+
+    def _create_change_triggers(self, conn):
+        conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS {CHANGES_TABLE.split('.')[1]} (TableName TEXT, ID INTEGER, Rows INTEGER)")
+        for name, (key, _) in REFERENCE_TABLES.items():
+            for event, rows in (('INSERT', [('new', 1)]), ('UPDATE', [('old', 0), ('new', 1)]), ('DELETE', [('old', 1)])):
+                inserts = ' '.join(f"INSERT INTO ReferenceChanges VALUES ('{name}', {row}.{key}, {count});"
+                                   for row, count in rows)
+                conn.execute(f"CREATE TEMP TRIGGER IF NOT EXISTS {name}_reference_{event.lower()} "
+                             f"AFTER {event} ON main.{name} BEGIN {inserts} END")
+
+    def _select(self, name):
+        key, columns = REFERENCE_TABLES[name]
+        return f"SELECT {key}, {', '.join(columns)} FROM {name}"
+
+    # Read the given tables (all of them by default) again in full
+    def reload(self, names=None):
+        names = list(self.tables) if names is None else names
+        conn = self.database.reader()
+        with self._lock:
+            # Taken first, so a commit made while the tables are read is picked up by the next check
+            self._monitor_version = self._data_version(self._monitor)
+            versions = self._table_versions(conn)
+            for name in names:
+                self.tables[name].load(conn.execute(self._select(name)).fetchall())
+                self._versions[name] = versions.get(name)
+            self.version += 1
+            self._loaded = True
+        # Writes committed while the tables were being read
+        self._apply_changes(set(names))
+
+    # Write hook: read the changed rows back through the writer and patch them in
+    def _apply_changes(self, tables):
+        with self.database.writer() as conn:
+            if not self._loaded:
+                return
+            if tables is not None and not tables & set(REFERENCE_TABLES):
+                return
+            changes = conn.execute(f"SELECT DISTINCT TableName, ID FROM {CHANGES_TABLE}").fetchall()
+            written = dict(conn.execute(f"SELECT TableName, SUM(Rows) FROM {CHANGES_TABLE} GROUP BY TableName").fetchall())
+            conn.execute(f"DELETE FROM {CHANGES_TABLE}")
+            versions = self._table_versions(conn)
+            changed = {}
+            for name, row_id in changes:
+                changed.setdefault(name, []).append(row_id)
+            with self._lock:
+                # The rows written here account for the whole move of a table's version unless another
+                # connection wrote the table too; its version is then left behind, so the next check
+                # reads that table again
+                for name, rows in written.items():
+                    if self._versions.get(name) is not None and versions.get(name) == self._versions[name] + rows:
+                        self._versions[name] = versions[name]
+                for name, ids in changed.items():
+                    table = self.tables[name]
+                    if len(ids) > max(PATCH_LIMIT, table.live * PATCH_SHARE):
+                        table.load(conn.execute(self._select(name)).fetchall())
+                        continue
+                    current = {}
+                    for chunk in range(0, len(ids), 500):
+                        batch = ids[chunk:chunk + 500]
+                        current.update((row[0], row[1:]) for row in conn.execute(
+                            f"{self._select(name)} WHERE {table.key} IN ({', '.join('?' for _ in batch)})", batch))
+                    for row_id in ids:
+                        if row_id in current:
+                            table.upsert(row_id, current[row_id])
+                        else:
+                            table.delete(row_id)
+                if changed:
+                    self.version += 1
+
+    # Rows of `table` for the given ids, None for unknown ids
+    def rows(self, table, ids):
+        self._check_external_writes()
+        with self._lock:
+            return self.tables[table].rows(ids)
+
+    # "First Last" for each id, None for unknown ids
+    def names(self, table, ids):
+        self._check_external_writes()
+        with self._lock:
+            rows = self.tables[table].rows(ids, ['FirstName', 'LastName'])
+        return [f"{row[1]} {row[2]}" if row else None for row in rows]
+
+    def page(self, table, sort=(), after=None, page_size=50, descending=False):
+        self._check_external_writes()
+        with self._lock:
+            return self.tables[table].page(sort, after, page_size, descending)
+
+    def count(self, table):
+        self._check_external_writes()
+        with self._lock:
+            return self.tables[table].live
+
+    # Rows and bytes per table, with the bytes split by column
+    def memory_report(self):
+        with self._lock:
+            return {name: {'rows': table.live, 'bytes': sum(memory.values()), 'columns': memory}
+                    for name, table in self.tables.items() for memory in [table.memory()]}
+
+_snapshots = {}
+_snapshots_lock = threading.Lock()
+
+# Process-wide reference snapshot for a database, loaded on first use
+# (or None when it has not been loaded yet and `load` is false)
+def get_reference_snapshot(database, load=True):
+    with _snapshots_lock:
+        if database.path not in _snapshots:
+            if not load:
+                return None
+            _snapshots[database.path] = ReferenceSnapshot(database)
+        return _snapshots[database.path]
@@ -0,0 +1,128 @@
+import atexit
+import itertools
+import os
+import sqlite3
+import threading
+import time
+
+from db import Database, connect
+
+# Read-only copies of the database serving the reporting pages
+REPLICAS = 1
+# Seconds between two refreshes of every replica
+REFRESH_INTERVAL = 30
+# Age, in seconds, of the oldest replica data a reporting read accepts; past it reads go to the primary
+MAX_STALENESS = 120
+
+class Replica:
+    # One replica file refreshed from the primary with SQLite's online backup API. The copy runs in a
+    # single step, i.e. inside one read transaction on the primary, so it is a consistent snapshot and
+    # never blocks the primary's writer (WAL). On the replica it is one write transaction: its readers
+    # keep the previous snapshot until the copy commits, then the next query sees the new one.
+    def __init__(self, primary, path):
+        self.primary = primary
+        self.path = path
+        self.database = None
+        self.snapshot_at = None
+        self.refreshes = 0
+        self.failures = 0
+        self.last_refresh_seconds = None
+        self._target = None
+
+    def refresh(self):
+        started = time.time()
+        source = connect(self.primary.path, readonly=True)
+        try:
+            if self._target is None:
+                self._target = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+                self._target.execute("PRAGMA busy_timeout = 5000")
+            source.backup(self._target)
+        finally:
+            source.close()
+        # The copy went through the replica's WAL; move it into the file once readers allow
+        self._target.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        if self.database is None:
+            self.database = Database(self.path, readonly=True)
+        self.snapshot_at = started
+        self.refreshes += 1
+        self.last_refresh_seconds = time.time() - started
+        # Results cached from the previous snapshot are out of date
+        self.database.notify_writes()
+
+    # Seconds since the snapshot the replica holds was taken, None before the first refresh
+    def staleness(self):
+        return None if self.snapshot_at is None else time.time() - self.snapshot_at
+
+    def close(self):
+        if self.database is not None:
+            self.database.close()
+        if self._target is not None:
+            self._target.close()
+            self._target = None
+
+class ReplicaSet:
+    # Replicas of a primary database, refreshed on a schedule by a background thread. route() hands
+    # reporting reads a replica whose data is at most max_staleness seconds old, spreading them over
+    # the fresh replicas, and falls back to the primary when none is fresh enough. Writes always go
+    # to the primary.
+    def __init__(self, primary, count=REPLICAS, interval=REFRESH_INTERVAL, max_staleness=MAX_STALENESS):
+        self.primary = primary
+        self.interval = interval
+        self.max_staleness = max_staleness
+        base, extension = os.path.splitext(primary.path)
+        self.replicas = [Replica(primary, f"{base}.replica{number}{extension or '.db'}") for number in range(1, count + 1)]
+        self._turn = itertools.count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._refresh_loop, name='replica-refresh', daemon=True)
+        self._thread.start()
+
+    # Refresh the replicas one after another, so that with several of them one is always serving
+    def _refresh_loop(self):
+        while not self._stop.is_set():
+            for replica in self.replicas:
+                if self._stop.is_set():
+                    break
+                try:
+                    replica.refresh()
+                except sqlite3.Error:
+                    # Keep serving the previous snapshot; route() stops using it once it is too old
+                    replica.failures += 1
+            self._stop.wait(self.interval)
+
+    # Database to read from: a replica no older than max_staleness seconds, otherwise the primary
+    def route(self, max_staleness=None):
+        bound = self.max_staleness if max_staleness is None else max_staleness
+        fresh = [replica for replica in self.replicas
+                 if replica.database is not None and replica.staleness() <= bound]
+        if not fresh:
+            return self.primary
+        return fresh[next(self._turn) % len(fresh)].database
+
+    # The replica serving `database`, or None for the primary
+    def replica_of(self, database):
+        for replica in self.replicas:
+            if replica.database is database:
+                return replica
+        return None
+
+    def stats(self):
+        return [{'path': replica.path, 'staleness': replica.staleness(), 'refreshes': replica.refreshes,
+                 'failures': replica.failures, 'refresh_seconds': replica.last_refresh_seconds}
+                for replica in self.replicas]
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        for replica in self.replicas:
+            replica.close()
+
+_replica_sets = {}
+_replica_sets_lock = threading.Lock()
+
+# Process-wide replicas of a database, refreshed from the first call on
+def get_replicas(database):
+    with _replica_sets_lock:
+        if database.path not in _replica_sets:
+            _replica_sets[database.path] = ReplicaSet(database)
+            atexit.register(_replica_sets[database.path].close)
+        return _replica_sets[database.path]
@@ -0,0 +1,265 @@
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+# Appointments last one slot; bookable slots run from DAY_START to DAY_END
+SLOT_MINUTES = 15
+DAY_START = 8 * 60
+DAY_END = 18 * 60
+SLOTS_PER_DAY = (DAY_END - DAY_START) // SLOT_MINUTES
+
+# Appointments that hold their slot; cancelled, missed and past ones never block a booking
+ACTIVE_STATUSES = ('Scheduled', 'Confirmed')
+
+# Days searched for free slots, and (doctor, day) bitmaps kept in memory
+SEARCH_DAYS = 60
+SLOT_CACHE_SIZE = 20000
+
+_ACTIVE = ', '.join(f"'{status}'" for status in ACTIVE_STATUSES)
+
+# Minutes since midnight of an HH:MM[:SS] time; NULL for a NULL time
+_MINUTES = "(CAST(substr({time}, 1, 2) AS INTEGER) * 60 + CAST(substr({time}, 4, 2) AS INTEGER))"
+
+# Active appointments of a doctor within one slot length of `time` on `date`, as a condition on the
+# schedule index (DoctorID, AppointmentDate, AppointmentTime): a seek on the doctor's day. Times are
+# compared in minutes, so a booking near midnight still meets its neighbours.
+OVERLAP = f'''
+    DoctorID = {{doctor}} AND AppointmentDate = {{date}}
+    AND abs({_MINUTES.format(time='AppointmentTime')} - {_MINUTES.format(time='{time}')}) < {SLOT_MINUTES}
+    AND Status IN ({_ACTIVE})'''
+
+# Objects enforcing the schedule; bulk loads keep them in place (see schema.suspend_objects)
+SCHEDULE_OBJECTS = ('idx_appointments_schedule', 'Appointments_schedule_bi', 'Appointments_schedule_bu')
+
+# Migration: schedule indexes and triggers rejecting double bookings for every writer
+def create_schedule_indexes(c):
+    # Covers conflict checks and day bitmaps without touching the table
+    c.execute('''
+        CREATE INDEX IF NOT EXISTS idx_appointments_schedule
+        ON Appointments (DoctorID, AppointmentDate, AppointmentTime, Status, Location)
+    ''')
+    # Doctors working at a clinic
+    c.execute("CREATE INDEX IF NOT EXISTS idx_appointments_location_doctor ON Appointments (Location, DoctorID)")
+    _create_schedule_triggers(c)
+
+# Migration: the double-booking triggers again, comparing times in minutes and letting the
+# appointments of one reschedule() pass each other
+def update_schedule_triggers(c):
+    c.execute("DROP TRIGGER IF EXISTS Appointments_schedule_bi")
+    c.execute("DROP TRIGGER IF EXISTS Appointments_schedule_bu")
+    _create_schedule_triggers(c)
+
+def _create_schedule_triggers(c):
+    # Appointments being moved together by reschedule(), for the length of its transaction only;
+    # they were checked against each other and the rest before the move
+    c.execute("CREATE TABLE IF NOT EXISTS ScheduleMoves (AppointmentID INTEGER PRIMARY KEY)")
+    conflict = OVERLAP.format(doctor='new.DoctorID', date='new.AppointmentDate', time='new.AppointmentTime')
+    c.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS Appointments_schedule_bi BEFORE INSERT ON Appointments
+        WHEN new.Status IN ({_ACTIVE}) BEGIN
+            SELECT RAISE(ABORT, 'Doctor is already booked at that time')
+            WHERE EXISTS (SELECT 1 FROM Appointments WHERE {conflict});
+        END
+    ''')
+    c.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS Appointments_schedule_bu
+        BEFORE UPDATE OF DoctorID, AppointmentDate, AppointmentTime, Status ON Appointments
+        WHEN new.Status IN ({_ACTIVE}) BEGIN
+            SELECT RAISE(ABORT, 'Doctor is already booked at that time')
+            WHERE EXISTS (SELECT 1 FROM Appointments WHERE {conflict} AND AppointmentID != new.AppointmentID
+                          AND AppointmentID NOT IN (SELECT AppointmentID FROM ScheduleMoves));
+        END
+    ''')
+
+def _date(value):
+    return value if isinstance(value, str) else value.strftime('%Y-%m-%d')
+
+def _time(value):
+    return value if isinstance(value, str) else value.strftime('%H:%M:%S')
+
+def _minutes(time_text):
+    hours, minutes = time_text.split(':')[:2]
+    return int(hours) * 60 + int(minutes)
+
+def slot_time(slot):
+    minutes = DAY_START + slot * SLOT_MINUTES
+    return f'{minutes // 60:02d}:{minutes % 60:02d}:00'
+
+# Bitmap of the slots an appointment starting at `time_text` overlaps (one, or two when off the grid)
+def _slot_bits(time_text):
+    offset = _minutes(time_text) - DAY_START
+    first, misaligned = divmod(offset, SLOT_MINUTES)
+    bits = 0
+    for slot in (first, first + 1) if misaligned else (first,):
+        if 0 <= slot < SLOTS_PER_DAY:
+            bits |= 1 << slot
+    return bits
+
+# Active appointments clashing with a booking, excluding `exclude` (ids being moved)
+def find_conflicts(c, doctor_id, appointment_date, appointment_time, exclude=()):
+    rows = c.execute(f"SELECT AppointmentID FROM Appointments WHERE {OVERLAP.format(doctor=':doctor', date=':date', time=':time')}",
+                     {'doctor': doctor_id, 'date': _date(appointment_date), 'time': _time(appointment_time)}).fetchall()
+    return [row[0] for row in rows if row[0] not in exclude]
+
+class SlotCache:
+    # Occupied slots per (doctor, day) as integer bitmaps, filled a doctor and date range per query.
+    # Writes only say which tables they changed, so any committed change to Appointments drops them all.
+    def __init__(self, database, max_days=SLOT_CACHE_SIZE):
+        self.max_days = max_days
+        self._days = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+        database.add_write_hook(self.invalidate)
+
+    def invalidate(self, tables=None):
+        if tables is None or 'Appointments' in tables:
+            with self._lock:
+                self._generation += 1
+                self._days.clear()
+
+    # Bitmaps for each doctor and each day from `start` for `days` days, as {doctor: {date: bits}}.
+    # Doctors not fully cached are read together, 500 per query.
+    def days(self, c, doctors, start, days):
+        dates = [(start + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(days)]
+        result, missing = {}, []
+        with self._lock:
+            generation = self._generation
+            for doctor in doctors:
+                cached = [self._days.get((doctor, day)) for day in dates]
+                if None in cached:
+                    missing.append(doctor)
+                else:
+                    result[doctor] = dict(zip(dates, cached))
+
+        for chunk in range(0, len(missing), 500):
+            batch = missing[chunk:chunk + 500]
+            loaded = {doctor: dict.fromkeys(dates, 0) for doctor in batch}
+            rows = c.execute(f'''
+                SELECT DoctorID, AppointmentDate, AppointmentTime FROM Appointments
+                WHERE DoctorID IN ({', '.join('?' for _ in batch)})
+                AND AppointmentDate BETWEEN ? AND ? AND Status IN ({_ACTIVE})
+            ''', batch + [dates[0], dates[-1]]).fetchall()
+            for doctor, day, time_text in rows:
+                if time_text:
+                    loaded[doctor][day] |= _slot_bits(time_text)
+            result.update(loaded)
+            with self._lock:
+                if generation == self._generation:
+                    for doctor, bitmaps in loaded.items():
+                        for day, bits in bitmaps.items():
+                            self._days[(doctor, day)] = bits
+                            self._days.move_to_end((doctor, day))
+                    while len(self._days) > self.max_days:
+                        self._days.popitem(last=False)
+        return result
+
+_slot_caches = {}
+_slot_caches_lock = threading.Lock()
+
+# Process-wide slot cache for a database
+def get_slot_cache(database):
+    with _slot_caches_lock:
+        if database.path not in _slot_caches:
+            _slot_caches[database.path] = SlotCache(database)
+        return _slot_caches[database.path]
+
+# Doctors considered for a free-slot search
+def _candidate_doctors(c, doctor_id=None, department=None, location=None):
+    if doctor_id is not None:
+        return [doctor_id]
+    if department:
+        return [row[0] for row in c.execute("SELECT DoctorID FROM Doctors WHERE Department = ? ORDER BY DoctorID", (department,))]
+    if location:
+        return [row[0] for row in c.execute(
+            "SELECT DISTINCT DoctorID FROM Appointments WHERE Location = ? AND DoctorID IS NOT NULL ORDER BY DoctorID", (location,))]
+    return [row[0] for row in c.execute("SELECT DoctorID FROM Doctors ORDER BY DoctorID")]
+
+# The next `n` free slots as (date, time, doctor_id), earliest first, for one doctor, a department
+# or the doctors working at a clinic. Slots before `now` are skipped.
+def next_free_slots(c, slot_cache, n, doctor_id=None, department=None, location=None, now=None, days=SEARCH_DAYS):
+    now = now or datetime.now()
+    doctors = _candidate_doctors(c, doctor_id, department, location)
+    found = []
+    start = now.date()
+    # A week at a time, so a nearby answer reads little and a sparse one still finishes
+    for week_start in range(0, days, 7):
+        first = start + timedelta(days=week_start)
+        length = min(7, days - week_start)
+        bitmaps = slot_cache.days(c, doctors, first, length)
+        for offset in range(length):
+            day = (first + timedelta(days=offset)).strftime('%Y-%m-%d')
+            skip = 0
+            if offset == 0 and week_start == 0:
+                # Slots already started today are gone
+                elapsed = now.hour * 60 + now.minute - DAY_START
+                skip = max(0, min(SLOTS_PER_DAY, -(-elapsed // SLOT_MINUTES)))
+            for slot in range(skip, SLOTS_PER_DAY):
+                for doctor in doctors:
+                    if not bitmaps[doctor][day] >> slot & 1:
+                        found.append((day, slot_time(slot), doctor))
+                        if len(found) == n:
+                            return found
+    return found
+
+# Book an appointment after checking the doctor is free; raises ValueError naming the clash
+def book(database, patient_id, doctor_id, appointment_date, appointment_time, location):
+    with database.transaction() as tx:
+        conflicts = find_conflicts(tx, doctor_id, appointment_date, appointment_time)
+        if conflicts:
+            raise ValueError(f"Doctor {doctor_id} is already booked then (appointment {conflicts[0]})")
+        tx.execute('''
+            INSERT INTO Appointments (PatientID, DoctorID, AppointmentDate, AppointmentTime, Status, Location)
+            VALUES (?, ?, ?, ?, 'Scheduled', ?)
+        ''', (patient_id, doctor_id, _date(appointment_date), _time(appointment_time), location))
+
+# Move many appointments at once, all or nothing. `moves` holds (appointment_id, new_date, new_time)
+# or (appointment_id, new_date, new_time, new_doctor_id). Appointments may swap or shift into each
+# other's slots; clashes with appointments not being moved, or between two moves, raise ValueError.
+def reschedule(database, moves):
+    moves = [tuple(move) + (None,) * (4 - len(move)) for move in moves]
+    if not moves:
+        return 0
+    ids = {move[0] for move in moves}
+    with database.transaction() as tx:
+        current = {}
+        for chunk in range(0, len(moves), 500):
+            batch = [move[0] for move in moves[chunk:chunk + 500]]
+            current.update((row[0], row[1:]) for row in tx.execute(f'''
+                SELECT AppointmentID, DoctorID, Status FROM Appointments
+                WHERE AppointmentID IN ({', '.join('?' for _ in batch)})
+            ''', batch))
+        missing = ids - set(current)
+        if missing:
+            raise ValueError(f"Unknown appointments: {', '.join(map(str, sorted(missing)))}")
+
+        # Check every active move against the appointments that stay put and against each other
+        placed = {}
+        for appointment_id, new_date, new_time, new_doctor in moves:
+            doctor_id, status = current[appointment_id]
+            doctor_id = new_doctor if new_doctor is not None else doctor_id
+            if status not in ACTIVE_STATUSES:
+                continue
+            day, time_text = _date(new_date), _time(new_time)
+            conflicts = find_conflicts(tx, doctor_id, day, time_text, exclude=ids)
+            if conflicts:
+                raise ValueError(f"Appointment {appointment_id} clashes with appointment {conflicts[0]}")
+            start = _minutes(time_text)
+            for other_time, other_id in placed.get((doctor_id, day), ()):
+                if abs(start - other_time) < SLOT_MINUTES:
+                    raise ValueError(f"Appointments {other_id} and {appointment_id} would overlap")
+            placed.setdefault((doctor_id, day), []).append((start, appointment_id))
+
+        # One UPDATE moves them all; while it runs the triggers let the moved appointments pass each
+        # other's old slots, which were checked above
+        tx.executemany("INSERT OR IGNORE INTO ScheduleMoves (AppointmentID) VALUES (?)", [(move[0],) for move in moves])
+        tx.execute('''
+            UPDATE Appointments
+            SET AppointmentDate = json_extract(move.value, '$[1]'), AppointmentTime = json_extract(move.value, '$[2]'),
+                DoctorID = IFNULL(json_extract(move.value, '$[3]'), DoctorID)
+            FROM json_each(?) AS move
+            WHERE Appointments.AppointmentID = json_extract(move.value, '$[0]')
+        ''', (json.dumps([[appointment_id, _date(new_date), _time(new_time), new_doctor]
+                          for appointment_id, new_date, new_time, new_doctor in moves]),))
+        tx.execute("DELETE FROM ScheduleMoves")
+    return len(moves)
@@ -0,0 +1,271 @@
+import os
+import sqlite3
+
+from analytics import ANALYTICS_TABLES, create_analytics_tables, rebuild_analytics
+from changelog import CHANGE_TABLES, create_change_log, log_reload
+from history import HISTORY_TABLES, create_history_table, rebuild_history
+from metrics import create_metrics_tables, rebuild_metrics
+from scheduling import SCHEDULE_OBJECTS, create_schedule_indexes, update_schedule_triggers
+from search import SEARCH_INDEXES, create_search_index, rebuild_search_index
+from typeahead import TYPEAHEAD_TABLES, create_typeahead_keys, rebuild_typeahead_keys
+
+# Migration 1: the original tables
+def create_base_tables(c):
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS Patients (
+            PatientID INTEGER PRIMARY KEY,
+            FirstName TEXT,
+            LastName TEXT,
+            DateOfBirth TEXT,
+            ContactNumber TEXT
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS Doctors (
+            DoctorID INTEGER PRIMARY KEY,
+            FirstName TEXT,
+            LastName TEXT,
+            Department TEXT,
+            ContactNumber TEXT
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS Appointments (
+            AppointmentID INTEGER PRIMARY KEY,
+            PatientID INTEGER,
+            DoctorID INTEGER,
+            AppointmentDate TEXT,
+            AppointmentTime TEXT,
+            Status TEXT,
+            Location TEXT,
+            FOREIGN KEY (PatientID) REFERENCES Patients (PatientID),
+            FOREIGN KEY (DoctorID) REFERENCES Doctors (DoctorID)
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS MedicalRecords (
+            RecordID INTEGER PRIMARY KEY,
+            AppointmentID INTEGER,
+            Diagnosis TEXT,
+            Details TEXT,
+            FOREIGN KEY (AppointmentID) REFERENCES Appointments (AppointmentID)
+        )
+    ''')
+
+# Migration 2: indexes for the joins and filters the pages run
+def create_join_indexes(c):
+    # Patient history and "Patient Name" searches: join on PatientID, ordered by date
+    c.execute("CREATE INDEX IF NOT EXISTS idx_appointments_patient_date ON Appointments (PatientID, AppointmentDate, AppointmentTime)")
+    # "Doctor Name" searches and doctor schedules
+    c.execute("CREATE INDEX IF NOT EXISTS idx_appointments_doctor_date ON Appointments (DoctorID, AppointmentDate, AppointmentTime)")
+    # Home page upcoming count and date searches (covering for COUNT(*) over a date range)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_appointments_date ON Appointments (AppointmentDate)")
+    # Status filters within a date range
+    c.execute("CREATE INDEX IF NOT EXISTS idx_appointments_status_date ON Appointments (Status, AppointmentDate)")
+    # Appointment -> medical record joins
+    c.execute("CREATE INDEX IF NOT EXISTS idx_medicalrecords_appointment ON MedicalRecords (AppointmentID)")
+    # Department lookups and filters
+    c.execute("CREATE INDEX IF NOT EXISTS idx_doctors_department ON Doctors (Department)")
+    # Covering index for the age distribution (reads DateOfBirth without touching the table)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_patients_dob ON Patients (DateOfBirth)")
+
+# Migration 4: indexes backing the sort options of the paginated listings
+def create_sort_indexes(c):
+    c.execute("CREATE INDEX IF NOT EXISTS idx_patients_lastname ON Patients (LastName)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_medicalrecords_diagnosis ON MedicalRecords (Diagnosis)")
+
+# Migration 6: indexes and triggers set aside by a bulk load, kept so an interrupted load can be repaired
+def create_suspended_objects_table(c):
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS SuspendedObjects (
+            Name TEXT PRIMARY KEY,
+            Type TEXT NOT NULL,
+            TableName TEXT NOT NULL,
+            Sql TEXT NOT NULL
+        )
+    ''')
+
+# Migration 11: one row per archive partition (a year of archived appointments in its own file next
+# to the database, see archive.py) with the dates it covers, so a query only opens the partitions
+# its date range overlaps
+def create_archive_partitions_table(c):
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS ArchivePartitions (
+            Partition TEXT PRIMARY KEY,
+            FileName TEXT NOT NULL,
+            FirstDate TEXT NOT NULL,
+            LastDate TEXT NOT NULL,
+            Appointments INTEGER NOT NULL DEFAULT 0,
+            MedicalRecords INTEGER NOT NULL DEFAULT 0,
+            ArchivedAt TEXT,
+            CompactedAt TEXT
+        )
+    ''')
+
+# Migration 13: the listing sorts on nullable columns order by IFNULL(column, '') (see pagination.py);
+# these expression indexes replace the plain sort-only indexes of migration 4
+def create_null_safe_sort_indexes(c):
+    c.execute("DROP INDEX IF EXISTS idx_patients_lastname")
+    c.execute("DROP INDEX IF EXISTS idx_medicalrecords_diagnosis")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_patients_lastname_sort ON Patients (IFNULL(LastName, ''))")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_patients_dob_sort ON Patients (IFNULL(DateOfBirth, ''))")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_doctors_department_sort ON Doctors (IFNULL(Department, ''))")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_appointments_date_sort ON Appointments (IFNULL(AppointmentDate, ''))")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_appointments_status_sort ON Appointments (IFNULL(Status, ''), IFNULL(AppointmentDate, ''))")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_medicalrecords_appointment_sort ON MedicalRecords (IFNULL(AppointmentID, ''))")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_medicalrecords_diagnosis_sort ON MedicalRecords (IFNULL(Diagnosis, ''))")
+
+# Migration 15: diagnosis counts of the archive partitions kept in the active database, so the
+# all-time diagnosis figures do not attach every partition. Existing partitions are counted from
+# their own DiagnosisCube.
+def create_archived_diagnoses_table(c):
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS ArchivedDiagnoses (
+            Partition TEXT NOT NULL,
+            DoctorID INTEGER NOT NULL,
+            Diagnosis TEXT NOT NULL,
+            Count INTEGER NOT NULL,
+            PRIMARY KEY (Partition, DoctorID, Diagnosis)
+        ) WITHOUT ROWID
+    ''')
+    directory = next((os.path.dirname(path) for _, name, path in c.execute("PRAGMA database_list").fetchall()
+                      if name == 'main'), '')
+    for partition, file_name in c.execute("SELECT Partition, FileName FROM ArchivePartitions").fetchall():
+        path = os.path.join(directory, file_name)
+        if not os.path.exists(path):
+            continue
+        # Read with a connection of its own: ATTACH is not allowed inside the migration's transaction
+        source = sqlite3.connect(path)
+        try:
+            rows = source.execute("SELECT DoctorID, Diagnosis, Count FROM DiagnosisCube").fetchall()
+        finally:
+            source.close()
+        c.executemany("INSERT OR REPLACE INTO ArchivedDiagnoses (Partition, DoctorID, Diagnosis, Count) VALUES (?, ?, ?, ?)",
+                      [(partition,) + tuple(row) for row in rows])
+
+# Tables whose writes bump their row in TableVersions
+VERSIONED_TABLES = ('Patients', 'Doctors')
+
+# Migration 16: a version per reference table, bumped by every row written to it, so a process
+# holding the table in memory (reference.py) reloads only the tables another connection changed
+def create_table_versions(c):
+    c.execute("CREATE TABLE IF NOT EXISTS TableVersions (TableName TEXT PRIMARY KEY, Version INTEGER NOT NULL) WITHOUT ROWID")
+    for table in VERSIONED_TABLES:
+        c.execute("INSERT OR IGNORE INTO TableVersions (TableName, Version) VALUES (?, 0)", (table,))
+        for suffix, event in (('ai', 'INSERT'), ('au', 'UPDATE'), ('ad', 'DELETE')):
+            c.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_version_{suffix} AFTER {event} ON {table} BEGIN
+                    UPDATE TableVersions SET Version = Version + 1 WHERE TableName = '{table}';
+                END
+            ''')
+
+# Mark `table` changed without its triggers (a bulk load)
+def bump_table_version(c, table):
+    c.execute("UPDATE TableVersions SET Version = Version + 1 WHERE TableName = ?", (table,))
+
+# Migrations in the order they are applied; PRAGMA user_version holds the last applied version.
+# Never edit or reorder an existing entry, append a new one instead.
+MIGRATIONS = [
+    (1, "Base tables", create_base_tables),
+    (2, "Join and filter indexes", create_join_indexes),
+    (3, "Full-text search index", create_search_index),
+    (4, "Listing sort indexes", create_sort_indexes),
+    (5, "Dashboard summary tables", create_metrics_tables),
+    (6, "Bulk load bookkeeping", create_suspended_objects_table),
+    (7, "Patient timeline", create_history_table),
+    (8, "Schedule indexes and double-booking checks", create_schedule_indexes),
+    (9, "Analytics rollups", create_analytics_tables),
+    (10, "Typeahead keys", create_typeahead_keys),
+    (11, "Archive partitions", create_archive_partitions_table),
+    (12, "Change log", create_change_log),
+    (13, "NULL-safe listing sort indexes", create_null_safe_sort_indexes),
+    (14, "Double-booking checks in minutes", update_schedule_triggers),
+    (15, "Archived diagnosis counts", create_archived_diagnoses_table),
+    (16, "Reference table versions", create_table_versions),
+]
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+# Bring the database up to the latest schema version in place.
+# Each migration runs in its own transaction together with the version bump.
+def migrate(conn):
+    current = schema_version(conn)
+    applied = []
+    for version, description, step in MIGRATIONS:
+        if version <= current:
+            continue
+        try:
+            # Take the write lock before checking again: another process opening the same new file
+            # (e.g. a second server worker starting on a new database) may have applied this migration meanwhile
+            conn.execute("BEGIN IMMEDIATE")
+            if schema_version(conn) >= version:
+                conn.rollback()
+                continue
+            step(conn.cursor())
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(description)
+
+    # Finish any bulk load that stopped before putting its indexes and triggers back
+    if conn.execute("SELECT 1 FROM SuspendedObjects LIMIT 1").fetchone():
+        conn.execute("BEGIN")
+        restore_suspended_objects(conn.cursor())
+        conn.commit()
+        applied.append("Restored indexes suspended by a bulk load")
+
+    # Refresh planner statistics once the new indexes exist
+    if applied:
+        conn.execute("ANALYZE")
+        conn.commit()
+    optimize(conn)
+    return applied
+
+# Let SQLite re-analyze tables whose statistics went stale
+def optimize(conn):
+    conn.execute("PRAGMA optimize")
+
+# Drop the secondary indexes and triggers of a table before a bulk load, remembering their definitions.
+# The double-booking checks (scheduling.SCHEDULE_OBJECTS) stay, so loaded rows are held to them too.
+def suspend_objects(c, table):
+    objects = c.execute(f'''
+        SELECT name, type, tbl_name, sql FROM sqlite_master
+        WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL
+        AND name NOT IN ({', '.join('?' for _ in SCHEDULE_OBJECTS)})
+    ''', (table,) + SCHEDULE_OBJECTS).fetchall()
+    for name, object_type, table_name, sql in objects:
+        c.execute("INSERT OR REPLACE INTO SuspendedObjects (Name, Type, TableName, Sql) VALUES (?, ?, ?, ?)",
+                  (name, object_type, table_name, sql))
+        c.execute(f"DROP {object_type.upper()} IF EXISTS {name}")
+    return len(objects)
+
+# Recreate suspended indexes and triggers, then rebuild what the triggers would have maintained
+def restore_suspended_objects(c):
+    objects = c.execute("SELECT Name, Type, TableName, Sql FROM SuspendedObjects ORDER BY Type, Name").fetchall()
+    tables = set()
+    for name, object_type, table_name, sql in objects:
+        exists = c.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,)).fetchone()
+        if not exists:
+            c.execute(sql)
+        c.execute("DELETE FROM SuspendedObjects WHERE Name = ?", (name,))
+        tables.add(table_name)
+
+    for table in tables:
+        if table in SEARCH_INDEXES:
+            rebuild_search_index(c, table)
+        if table in TYPEAHEAD_TABLES:
+            rebuild_typeahead_keys(c, table)
+        if table in CHANGE_TABLES:
+            log_reload(c, table)
+        if table in VERSIONED_TABLES:
+            bump_table_version(c, table)
+    if tables:
+        rebuild_metrics(c)
+    if tables & HISTORY_TABLES:
+        rebuild_history(c)
+    if tables & ANALYTICS_TABLES:
+        rebuild_analytics(c)
+    return tables
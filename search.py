@@ -0,0 +1,137 @@
+import json
+import re
+import sqlite3
+
+# Maximum number of ranked hits returned by a search
+SEARCH_LIMIT = 500
+
+# Tables covered by the full-text index: primary key and indexed columns
+SEARCH_INDEXES = {
+    'Patients': ('PatientID', ['FirstName', 'LastName', 'ContactNumber']),
+    'Doctors': ('DoctorID', ['FirstName', 'LastName', 'Department', 'ContactNumber']),
+    'MedicalRecords': ('RecordID', ['Diagnosis', 'Details']),
+}
+
+_trigram = None
+
+# Check whether this SQLite build ships the trigram tokenizer (3.34+),
+# probing a private in-memory database so read-only connections can call it too
+def has_trigram():
+    global _trigram
+    if _trigram is None:
+        probe = sqlite3.connect(':memory:')
+        try:
+            probe.execute("CREATE VIRTUAL TABLE TrigramProbe USING fts5(x, tokenize='trigram')")
+            _trigram = True
+        except sqlite3.OperationalError:
+            _trigram = False
+        finally:
+            probe.close()
+    return _trigram
+
+def _index_names(table, trigram):
+    names = [table + 'Search']
+    if trigram:
+        names.append(table + 'Trigram')
+    return names
+
+# Create the FTS5 indexes and the triggers that keep them in sync with the base tables
+def create_search_index(c):
+    trigram = has_trigram()
+    for table, (key, columns) in SEARCH_INDEXES.items():
+        cols = ', '.join(columns)
+        new_values = ', '.join('new.' + col for col in columns)
+        old_values = ', '.join('old.' + col for col in columns)
+
+        # Word index for token and prefix matching, trigram index for substrings
+        c.execute(f'''
+            CREATE VIRTUAL TABLE IF NOT EXISTS {table}Search USING fts5(
+                {cols}, content='{table}', content_rowid='{key}',
+                tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+            )
+        ''')
+        if trigram:
+            c.execute(f'''
+                CREATE VIRTUAL TABLE IF NOT EXISTS {table}Trigram USING fts5(
+                    {cols}, content='{table}', content_rowid='{key}', tokenize='trigram'
+                )
+            ''')
+
+        inserts = ''.join(f'''
+                INSERT INTO {index} (rowid, {cols}) VALUES (new.{key}, {new_values});''' for index in _index_names(table, trigram))
+        deletes = ''.join(f'''
+                INSERT INTO {index} ({index}, rowid, {cols}) VALUES ('delete', old.{key}, {old_values});''' for index in _index_names(table, trigram))
+
+        c.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_search_ai AFTER INSERT ON {table} BEGIN{inserts}
+            END
+        ''')
+        c.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_search_ad AFTER DELETE ON {table} BEGIN{deletes}
+            END
+        ''')
+        c.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_search_au AFTER UPDATE ON {table} BEGIN{deletes}{inserts}
+            END
+        ''')
+
+        # Backfill rows that existed before the index was created
+        indexed = c.execute(f"SELECT COUNT(*) FROM {table}Search_docsize").fetchone()[0]
+        if indexed == 0:
+            rebuild_search_index(c, table)
+
+# Rebuild the FTS5 indexes from the base tables (all tables when none is given)
+def rebuild_search_index(c, table=None):
+    trigram = has_trigram()
+    for name in ([table] if table else SEARCH_INDEXES):
+        for index in _index_names(name, trigram):
+            c.execute(f"INSERT INTO {index} ({index}) VALUES ('rebuild')")
+
+# Split a user query into search terms
+def _terms(query):
+    return [term for term in re.split(r'\s+', str(query).strip()) if term]
+
+# Build an FTS5 MATCH expression: every term must match, the last token of each term as a prefix
+def match_expression(terms, columns, prefix=True):
+    star = '*' if prefix else ''
+    phrases = ' AND '.join('"' + term.replace('"', '""') + '"' + star for term in terms)
+    return '{' + ' '.join(columns) + '} : (' + phrases + ')'
+
+def _match(c, index, expression, limit):
+    rows = c.execute(f"SELECT rowid FROM {index} WHERE {index} MATCH ? ORDER BY rank LIMIT ?", (expression, limit)).fetchall()
+    return [row[0] for row in rows]
+
+# Return ranked primary keys of rows in `table` matching `query`, or None for an empty query.
+# Token/prefix hits come first; substring hits (trigram index, or LIKE for short terms) fill the rest.
+def search_ids(c, table, query, columns=None, limit=SEARCH_LIMIT):
+    key, all_columns = SEARCH_INDEXES[table]
+    columns = columns or all_columns
+    terms = _terms(query)
+    if not terms:
+        return None
+
+    ids = _match(c, table + 'Search', match_expression(terms, columns), limit)
+    if len(ids) >= limit:
+        return ids
+
+    seen = set(ids)
+    if all(len(term) >= 3 for term in terms) and has_trigram():
+        extra = _match(c, table + 'Trigram', match_expression(terms, columns, prefix=False), limit)
+    else:
+        where = ' AND '.join('(' + ' OR '.join(f"{col} LIKE ?" for col in columns) + ')' for _ in terms)
+        params = [f"%{term}%" for term in terms for _ in columns]
+        extra = [row[0] for row in c.execute(f"SELECT {key} FROM {table} WHERE {where} LIMIT ?", params + [limit]).fetchall()]
+
+    for row_id in extra:
+        if row_id not in seen and len(ids) < limit:
+            ids.append(row_id)
+            seen.add(row_id)
+    return ids
+
+# Build a JOIN clause restricting a listing to the ranked hits of a search on `table`.
+# Returns (join_sql, params), or None for an empty query. Order by `hits.key` to keep the ranking.
+def search_join(c, key_column, table, query, columns=None, limit=SEARCH_LIMIT):
+    ids = search_ids(c, table, query, columns, limit)
+    if ids is None:
+        return None
+    return f" JOIN json_each(?) AS hits ON hits.value = {key_column}", (json.dumps(ids),)
@@ -0,0 +1,211 @@
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# Distinct rows a lookup returns
+TYPEAHEAD_LIMIT = 20
+# Keys read by one prefix query. A prefix matching fewer keys has all its matches cached, and longer
+# prefixes typed after it are filtered from that cache instead of being queried.
+TYPEAHEAD_FETCH = 500
+# Prefix results remembered per database, and seconds one stays valid. The TTL bounds staleness
+# for writes this process does not see (other processes, the bulk_io CLI).
+TYPEAHEAD_CACHE_ENTRIES = 4096
+TYPEAHEAD_CACHE_TTL = 60
+# Shortest text looked up; one character matches too much to be useful
+TYPEAHEAD_MIN_LENGTH = 2
+
+# Tables with lookup keys, and their primary key
+TYPEAHEAD_TABLES = {
+    'Patients': 'PatientID',
+    'Doctors': 'DoctorID',
+}
+
+# Characters dropped from contact numbers, so "555-0100", "(555) 0100" and "5550100" match alike
+CONTACT_PUNCTUATION = "-() .+"
+# Text made only of these is looked up as a contact number
+_CONTACT_QUERY = re.compile(r'[\d\-() .+xX]+')
+# SQLite's lower() only folds ASCII; queries are folded the same way
+_ASCII_LOWER = str.maketrans('ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz')
+# Above every character, closing the key range of a prefix
+_HIGHEST = '\U0010ffff'
+
+def _name_key(column):
+    return f"lower(trim({column}))"
+
+def _contact_key(column):
+    key = f"lower(trim({column}))"
+    for character in CONTACT_PUNCTUATION:
+        key = f"replace({key}, '{character}', '')"
+    return key
+
+# Lookup keys of a row: first name, last name, both in either order, and the contact number
+def _key_expressions(prefix):
+    first, last = _name_key(f"{prefix}FirstName"), _name_key(f"{prefix}LastName")
+    return [first, last, f"{first} || ' ' || {last}", f"{last} || ' ' || {first}", _contact_key(f"{prefix}ContactNumber")]
+
+def _keys_select(table, key, prefix):
+    keys = ' UNION '.join(f"SELECT {expression} AS Key" for expression in _key_expressions(prefix))
+    return f"SELECT '{table}', Key, {prefix}{key} FROM ({keys}) WHERE Key IS NOT NULL AND Key != ''"
+
+# Migration 10: normalized name and contact keys of patients and doctors in one index ordered by key,
+# kept in sync by triggers, so a prefix lookup is a single range scan whatever the table size
+def create_typeahead_keys(c):
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS TypeaheadKeys (
+            TableName TEXT NOT NULL,
+            Key TEXT NOT NULL,
+            ID INTEGER NOT NULL,
+            PRIMARY KEY (TableName, Key, ID)
+        ) WITHOUT ROWID
+    ''')
+    for table, key in TYPEAHEAD_TABLES.items():
+        old_keys = ', '.join(_key_expressions('old.'))
+        delete = f"DELETE FROM TypeaheadKeys WHERE TableName = '{table}' AND Key IN ({old_keys}) AND ID = old.{key};"
+        insert = f"INSERT OR IGNORE INTO TypeaheadKeys (TableName, Key, ID) {_keys_select(table, key, 'new.')};"
+        c.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_typeahead_ai AFTER INSERT ON {table} BEGIN
+                {insert}
+            END
+        ''')
+        c.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_typeahead_ad AFTER DELETE ON {table} BEGIN
+                {delete}
+            END
+        ''')
+        c.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_typeahead_au AFTER UPDATE OF {key}, FirstName, LastName, ContactNumber ON {table} BEGIN
+                {delete}
+                {insert}
+            END
+        ''')
+        rebuild_typeahead_keys(c, table)
+
+# Recompute the lookup keys of a table from its rows (all tables when none is given)
+def rebuild_typeahead_keys(c, table=None):
+    for name in ([table] if table else TYPEAHEAD_TABLES):
+        key = TYPEAHEAD_TABLES[name]
+        c.execute("DELETE FROM TypeaheadKeys WHERE TableName = ?", (name,))
+        for expression in _key_expressions(''):
+            c.execute(f'''
+                INSERT OR IGNORE INTO TypeaheadKeys (TableName, Key, ID)
+                SELECT '{name}', {expression}, {key} FROM {name} WHERE {expression} != ''
+            ''')
+
+# Fold typed text the way the keys are folded: ASCII lowercase, single spaces ("Leon, Angela" as
+# "leon angela"), and for text that looks like a phone number, no punctuation
+def normalize_query(text):
+    text = ' '.join(str(text).replace(',', ' ').split()).translate(_ASCII_LOWER)
+    if _CONTACT_QUERY.fullmatch(text):
+        for character in CONTACT_PUNCTUATION:
+            text = text.replace(character, '')
+    return text
+
+class Typeahead:
+    # Prefix lookups over TypeaheadKeys with their results cached per (table, prefix). A result that
+    # holds every key of its prefix (fewer than TYPEAHEAD_FETCH) answers any longer prefix too, so as
+    # the user types "jo", "joh", "john" only the first one reaches SQLite. Writes to the base tables
+    # drop the cached results of that table.
+    def __init__(self, database, max_entries=TYPEAHEAD_CACHE_ENTRIES, fetch=TYPEAHEAD_FETCH, ttl=TYPEAHEAD_CACHE_TTL):
+        self.database = database
+        self.max_entries = max_entries
+        self.fetch = fetch
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.refinements = 0
+        self.queries = 0
+        database.add_write_hook(self.invalidate)
+
+    def invalidate(self, tables=None):
+        written = None if tables is None else {table.lower() for table in tables}
+        with self._lock:
+            self._generation += 1
+            if written is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[0].lower() in written]:
+                del self._entries[key]
+
+    # (key, id) pairs of `table` whose key starts with `prefix`, in key order
+    def matches(self, c, table, prefix):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get((table, prefix))
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end((table, prefix))
+                self.hits += 1
+                return entry[1]
+            # The longest shorter prefix whose cached result holds all of its keys; the refined
+            # result expires with it
+            for length in range(len(prefix) - 1, 0, -1):
+                shorter = self._entries.get((table, prefix[:length]))
+                if shorter is not None and shorter[0] > now and shorter[2]:
+                    pairs = [pair for pair in shorter[1] if pair[0].startswith(prefix)]
+                    self._store((table, prefix), shorter[0], pairs, True)
+                    self.refinements += 1
+                    return pairs
+            generation = self._generation
+        pairs = c.execute('''
+            SELECT Key, ID FROM TypeaheadKeys
+            WHERE TableName = ? AND Key >= ? AND Key < ?
+            ORDER BY Key LIMIT ?
+        ''', (table, prefix, prefix + _HIGHEST, self.fetch)).fetchall()
+        with self._lock:
+            # A write committed while the query ran may not be in these keys
+            if generation == self._generation:
+                self._store((table, prefix), now + self.ttl, pairs, len(pairs) < self.fetch)
+            self.queries += 1
+        return pairs
+
+    def _store(self, key, expires, pairs, complete):
+        self._entries[key] = (expires, pairs, complete)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    # Ids of up to `limit` rows of `table` with a name or contact number starting with `text`, closest
+    # key first, or None when the text is too short to look up
+    def lookup(self, c, table, text, limit=TYPEAHEAD_LIMIT):
+        prefix = normalize_query(text)
+        if len(prefix) < TYPEAHEAD_MIN_LENGTH:
+            return None
+        ids, seen = [], set()
+        for _, row_id in self.matches(c, table, prefix):
+            if row_id not in seen:
+                ids.append(row_id)
+                seen.add(row_id)
+                if len(ids) >= limit:
+                    break
+        return ids
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'refinements': self.refinements,
+                'queries': self.queries,
+            }
+
+_typeaheads = {}
+_typeaheads_lock = threading.Lock()
+
+# Process-wide typeahead cache for a database, shared by every Streamlit session
+def get_typeahead(database):
+    with _typeaheads_lock:
+        if database.path not in _typeaheads:
+            _typeaheads[database.path] = Typeahead(database)
+        return _typeaheads[database.path]
+
+# Build a JOIN clause restricting a listing to the typeahead matches of `text` on `table`, like
+# search.search_join. Returns (join_sql, params), or None when the text is too short; order by
+# `hits.key` to list the rows in key order.
+def typeahead_join(c, database, key_column, table, text, limit=TYPEAHEAD_LIMIT):
+    ids = get_typeahead(database).lookup(c, table, text, limit)
+    if ids is None:
+        return None
+    return f" JOIN json_each(?) AS hits ON hits.value = {key_column}", (json.dumps(ids),)
@@ -0,0 +1,28 @@
+import importlib
+
+# Sidebar entries and the module under views/ drawing each one. A page's module, and the heavy
+# libraries and loaders it imports, are only loaded the first time someone opens that page;
+# every module exposes render(database, conn, c, writes).
+PAGES = {
+    "Home": "home",
+    "Manage Patients": "patients",
+    "Manage Appointments": "appointments",
+    "Manage Medical Records": "medical_records",
+    "Manage Doctors": "doctors",
+    "Search Database": "search_database",
+    "Analytics": "analytics",
+    "Import / Export": "import_export",
+}
+
+# Pages that only read and can be served from a replica refreshed every few seconds; the others
+# show what the user just wrote and read the primary
+REPORTING_PAGES = {"Search Database", "Analytics"}
+
+# Pages left out of the sidebar unless the app is opened with ?admin=1
+ADMIN_PAGES = {
+    "Diagnostics": "diagnostics",
+}
+
+# The page module for a sidebar entry, imported on first use and then reused from sys.modules
+def load_page(choice):
+    return importlib.import_module(f"{__name__}.{PAGES.get(choice) or ADMIN_PAGES[choice]}")
@@ -0,0 +1,62 @@
+from datetime import date
+
+import pandas as pd
+import streamlit as st
+
+from analytics import date_range, diagnosis_frequency, dimension_values, no_show_rates, slice_cube
+from archive import archives_for
+from views.common import department_list
+
+def render(database, conn, c, writes):
+    st.title("Analytics")
+
+    # Every figure on this page is read from the trigger-maintained rollup tables, never from Appointments
+    first_date, last_date = date_range(c)
+    first_date = date.fromisoformat(first_date) if first_date else date.today()
+    last_date = date.fromisoformat(last_date) if last_date else date.today()
+    with st.form("analytics_form"):
+        col1, col2, col3, col4 = st.columns(4)
+        row_dimension = col1.selectbox("Rows", ["Month", "Department", "Clinic", "Doctor", "Status", "Day", "Year"], key="cube_rows")
+        column_dimension = col2.selectbox("Columns", ["Status", "Clinic", "Department", "None"], key="cube_columns")
+        start_date = col3.date_input("From", value=first_date, key="cube_start")
+        end_date = col4.date_input("To", value=last_date, key="cube_end")
+        col1, col2, col3 = st.columns(3)
+        clinic_filter = col1.multiselect("Clinics", dimension_values(c, "Clinic"), key="cube_clinics")
+        status_filter = col2.multiselect("Statuses", dimension_values(c, "Status"), key="cube_statuses")
+        department_filter = col3.multiselect("Departments", department_list(c), key="cube_departments")
+        st.form_submit_button("Update")
+
+    filters = {"Clinic": clinic_filter, "Status": status_filter, "Department": department_filter}
+    group_by = [row_dimension] if column_dimension in ("None", row_dimension) else [row_dimension, column_dimension]
+    # Archived years come from their partitions' rollups, attached only when the dates reach back to them
+    with archives_for(c, start_date, end_date) as (cube_c, archives):
+        cube_rows = slice_cube(cube_c, group_by, filters, start_date, end_date, archives)
+        rates = no_show_rates(cube_c, [row_dimension], filters, start_date, end_date, archives)
+    if archives:
+        st.caption(f"Includes archived appointments from {', '.join(schema[len('archive'):] for schema in archives)}")
+
+    st.write("Appointments")
+    if cube_rows:
+        cube_df = pd.DataFrame(cube_rows, columns=group_by + ["Appointments"])
+        if len(group_by) == 2:
+            cube_df = cube_df.pivot_table(index=row_dimension, columns=column_dimension, values="Appointments",
+                                          aggfunc="sum", fill_value=0, margins=True, margins_name="Total")
+        st.dataframe(cube_df, use_container_width=True)
+    else:
+        st.write("No appointments in this selection.")
+
+    # No-show rate: missed appointments over completed plus missed ones
+    if rates:
+        rates_df = pd.DataFrame(rates, columns=[row_dimension, "Appointments", "No Shows", "No-Show Rate"])
+        st.write("No-Show Rate")
+        st.bar_chart(rates_df.set_index(row_dimension)["No-Show Rate"])
+
+    st.write("Diagnosis Frequency by Department")
+    diagnosis_department = st.selectbox("Department", ["All"] + department_list(c), key="cube_diagnosis_department")
+    # Diagnoses are counted over all time, archived records included from their totals in the active database
+    diagnoses = diagnosis_frequency(c, None if diagnosis_department == "All" else diagnosis_department)
+    if diagnoses:
+        diagnoses_df = pd.DataFrame(diagnoses, columns=["Department", "Diagnosis", "Records"])
+        st.dataframe(diagnoses_df, use_container_width=True, hide_index=True)
+    else:
+        st.write("No medical records found.")
@@ -0,0 +1,164 @@
+import sqlite3
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+import streamlit as st
+
+from archive import appointments_between
+from crud import delete_appointment, update_appointment
+from reference import get_reference_snapshot
+from scheduling import book, get_slot_cache, next_free_slots, reschedule
+from search import search_join
+from views.common import show_listing, typeahead_search
+
+# Rows shown by the appointment history lookup
+HISTORY_LIMIT = 500
+
+def render(database, conn, c, writes):
+    st.title("Manage Appointments")
+
+    col1, col2 = st.columns([1, 2])  # Split into columns
+
+    with col1:
+        # Add New Appointment
+        with st.form("new_appointment_form", clear_on_submit=True):
+            st.write("Schedule New Appointment")
+            patient_id = st.number_input("Patient ID", min_value=1, step=1, key="new_app_patient_id")
+            doctor_id = st.number_input("Doctor ID", min_value=1, step=1, key="new_app_doctor_id")
+            appointment_date = st.date_input("Appointment Date", min_value=datetime.today(), key="new_app_date")
+            appointment_time = st.time_input("Appointment Time", key="new_app_time")
+            location = st.text_input("Location", key="new_app_location")
+            submit_button_appointment = st.form_submit_button("Schedule Appointment")
+
+            if submit_button_appointment:
+                try:
+                    writes.run(book, patient_id, doctor_id, appointment_date, appointment_time, location)
+                except (ValueError, sqlite3.IntegrityError) as e:
+                    st.error(f"Could not schedule: {e}")
+                else:
+                    st.success("Appointment Scheduled Successfully")
+
+        # Modify Appointment
+        with st.form("modify_appointment_form", clear_on_submit=True):
+            appointment_id = st.number_input("Appointment ID to Modify", min_value=1, step=1, key="mod_app_id")
+            new_appointment_date = st.date_input("New Appointment Date", min_value=date(1900, 1, 1), key="mod_app_date")
+            new_appointment_time = st.time_input("New Appointment Time", key="mod_app_time")
+            new_location = st.text_input("New Location", key="mod_app_location")
+            new_status = st.selectbox("Select New Status", ["Scheduled", "Confirmed", "Cancelled", "No Show", "Completed"], key="mod_app_status")
+            submit_button_modify_appointment = st.form_submit_button("Update Appointment")
+
+            if submit_button_modify_appointment:
+                try:
+                    writes.run(update_appointment, appointment_id, new_appointment_date, new_appointment_time, new_status, new_location)
+                except sqlite3.IntegrityError as e:
+                    st.error(f"Could not update: {e}")
+                else:
+                    st.success("Appointment Updated Successfully")
+
+        # Delete Appointment
+        with st.form("delete_appointment_form", clear_on_submit=True):
+            st.write("Delete Appointment")
+            appointment_id_delete = st.number_input("Appointment ID to Delete", min_value=1, step=1, key="del_app_id")
+            submit_button_delete_appointment = st.form_submit_button("Delete Appointment")
+
+            if submit_button_delete_appointment:
+                writes.run(delete_appointment, appointment_id_delete)
+                st.success("Appointment Deleted Successfully")
+
+        # Find Free Slots from the in-memory slot bitmaps
+        with st.form("free_slots_form"):
+            st.write("Find Free Slots")
+            slot_search_by = st.selectbox("Find by", ["Doctor ID", "Department", "Clinic"], key="slots_by")
+            slot_search_value = st.text_input("Doctor ID, department or clinic", key="slots_value")
+            slot_count = st.number_input("Number of slots", min_value=1, max_value=100, value=10, step=1, key="slots_count")
+            submit_button_slots = st.form_submit_button("Find Slots")
+
+            if submit_button_slots and slot_search_value:
+                if slot_search_by == "Doctor ID" and not slot_search_value.isdigit():
+                    st.error("Doctor ID must be a number")
+                else:
+                    slots = next_free_slots(conn, get_slot_cache(database), int(slot_count),
+                                            doctor_id=int(slot_search_value) if slot_search_by == "Doctor ID" else None,
+                                            department=slot_search_value if slot_search_by == "Department" else None,
+                                            location=slot_search_value if slot_search_by == "Clinic" else None)
+                    if slots:
+                        slots_df = pd.DataFrame(slots, columns=["Date", "Time", "Doctor ID"])
+                        st.dataframe(slots_df, use_container_width=True, hide_index=True)
+                    else:
+                        st.write("No free slots found.")
+
+        # Move a doctor's whole day, keeping the times; all appointments move or none do
+        with st.form("reschedule_day_form", clear_on_submit=True):
+            st.write("Reschedule a Doctor's Day")
+            reschedule_doctor_id = st.number_input("Doctor ID", min_value=1, step=1, key="resched_doctor_id")
+            reschedule_from = st.date_input("From Date", key="resched_from")
+            reschedule_to = st.date_input("To Date", min_value=datetime.today(), key="resched_to")
+            submit_button_reschedule = st.form_submit_button("Reschedule Day")
+
+            if submit_button_reschedule:
+                day_appointments = conn.execute('''
+                    SELECT AppointmentID, AppointmentTime FROM Appointments
+                    WHERE DoctorID = ? AND AppointmentDate = ? AND Status IN ('Scheduled', 'Confirmed')
+                ''', (reschedule_doctor_id, reschedule_from.strftime("%Y-%m-%d"))).fetchall()
+                try:
+                    moved = writes.run(reschedule, [(appointment_id, reschedule_to, appointment_time)
+                                                    for appointment_id, appointment_time in day_appointments])
+                except (ValueError, sqlite3.IntegrityError) as e:
+                    st.error(f"Could not reschedule: {e}")
+                else:
+                    st.success(f"Moved {moved} appointments")
+
+    with col2:
+        st.write("Search Appointments")
+        with st.form("search_appointments_form"):
+            search_field_appointments = st.selectbox("Search by", ["Appointment ID", "Patient Name", "Doctor Name", "Date"])
+            search_query_appointments = st.text_input("Search Query")
+            submit_button_search_appointments = st.form_submit_button("Search")
+
+        # Keep the submitted search across reruns so paging does not drop it
+        if submit_button_search_appointments:
+            st.session_state["appointments_search"] = (search_field_appointments, search_query_appointments)
+        search_field_appointments, search_query_appointments = st.session_state.get("appointments_search", ("Appointment ID", ""))
+
+        search, where, params = None, None, ()
+        if search_query_appointments:
+            if search_field_appointments == "Appointment ID":
+                where, params = "Appointments.AppointmentID LIKE ?", ("%"+search_query_appointments+"%",)
+            elif search_field_appointments == "Patient Name":
+                search = search_join(c, "Appointments.PatientID", "Patients", search_query_appointments, ["FirstName", "LastName"])
+            elif search_field_appointments == "Doctor Name":
+                search = search_join(c, "Appointments.DoctorID", "Doctors", search_query_appointments, ["FirstName", "LastName"])
+            elif search_field_appointments == "Date":
+                where, params = "Appointments.AppointmentDate LIKE ?", ("%"+search_query_appointments+"%",)
+
+        # Search as you type takes over from the form while its box holds text
+        quick = typeahead_search(c, "appointments", {"Patient": ("Patients", "Appointments.PatientID"),
+                                                     "Doctor": ("Doctors", "Appointments.DoctorID")})
+        if quick:
+            search, where, params = quick, None, ()
+
+        # Display Appointments
+        st.write("Scheduled Appointments")
+        show_listing(c, "Appointments", "No appointments found.", search, where, params)
+
+        # Appointments of a date range, archived ones included; archive files are only opened when
+        # the range reaches back past what the active table holds
+        with st.expander("Appointment history, including archives"):
+            with st.form("appointment_history_form"):
+                history_col1, history_col2, history_col3 = st.columns(3)
+                history_from = history_col1.date_input("From", value=date.today() - timedelta(days=365), key="history_from")
+                history_to = history_col2.date_input("To", value=date.today(), key="history_to")
+                history_patient = history_col3.number_input("Patient ID (0 for all)", min_value=0, step=1, key="history_patient")
+                submit_button_history = st.form_submit_button("Show")
+
+            if submit_button_history:
+                history, archived_years = appointments_between(c, history_from, history_to, history_patient or None,
+                                                               limit=HISTORY_LIMIT)
+                names = get_reference_snapshot(database).names
+                patients = names('Patients', [row[1] for row in history])
+                doctors = names('Doctors', [row[2] for row in history])
+                history = [(row[0], patient, doctor) + tuple(row[3:]) for row, patient, doctor in zip(history, patients, doctors)]
+                st.dataframe(pd.DataFrame(history, columns=["Appointment ID", "Patient Name", "Doctor Name", "Date", "Time", "Status", "Location"]),
+                             use_container_width=True, hide_index=True)
+                source = f"the active table and the archives of {', '.join(archived_years)}" if archived_years else "the active table only"
+                st.caption(f"{len(history)} appointments (at most {HISTORY_LIMIT}) read from {source}")
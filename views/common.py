@@ -0,0 +1,153 @@
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from analytics import dimension_values
+from columnar import ArrowPage
+from crud import get_write_queue
+from db import get_database
+from executor import QueryCancelled, QueryTimeout, get_query_executor
+from instrumentation import get_timings, span
+from pagination import LISTINGS, PAGE_SIZES, DEFAULT_PAGE_SIZE, page_query, split_page, estimate_count, count_rows
+from query_cache import get_query_cache
+from reference import REFERENCE_TABLES, get_reference_snapshot
+from typeahead import typeahead_join
+
+# Objects shared by every session, built on the first run in the process and reused by every rerun:
+# the connection pool (opening it checks and upgrades the schema), the query cache answering listing,
+# count and search queries, and the queue grouping form submissions into shared commits. Timings
+# start being exported for Prometheus here too.
+@st.cache_resource
+def get_resources():
+    database = get_database()
+    database.add_write_hook(_forget_departments)
+    get_timings().start_export()
+    return database, get_query_cache(database), get_write_queue(database)
+
+# Departments offered by the filters, read once and read again after a write to Doctors.
+# The cursor argument is not part of the cache key.
+@st.cache_resource
+def department_list(_c):
+    return dimension_values(_c, 'Department')
+
+def _forget_departments(tables):
+    if 'Doctors' in tables:
+        department_list.clear()
+
+# Key under which the executor tracks one kind of query of the current session; None outside a
+# Streamlit session (bare runs), where nothing is superseded
+def session_key(name):
+    ctx = get_script_run_ctx()
+    return (ctx.session_id, name) if ctx else None
+
+# Search-as-you-type box next to a search form. Its text is looked up on every rerun it triggers
+# (Enter, or leaving the box) as a bounded prefix match on names and contact numbers (typeahead.py),
+# answered from the results of the shorter prefix typed before when possible. `targets` maps a label
+# to the (table, key column) looked up. Returns a (join, params) pair for show_listing, or None
+# while the box holds too little text. The lookup runs on the cursor's connection, not through the
+# query cache: Typeahead keeps its own prefix results.
+def typeahead_search(c, name, targets):
+    label = next(iter(targets))
+    if len(targets) > 1:
+        label = st.radio("Find", list(targets), horizontal=True, key=name + "_typeahead_target")
+    text = st.text_input(f"Find {label.lower()} by name or contact as you type", key=name + "_typeahead")
+    table, key_column = targets[label]
+    with span("typeahead", name):
+        return typeahead_join(c.connection, c.cache.database, key_column, table, text)
+
+# Show one page of a listing with sort, page size and previous/next controls and return its rows.
+# `search` is an optional (join, params) pair from search_join, `where`/`params` filter the listing.
+def show_listing(c, name, empty_message, search=None, where=None, params=()):
+    listing = LISTINGS[name]
+    source = listing['source']
+    sort_options = dict(listing['sort'])
+    if search:
+        source += search[0]
+        params = tuple(search[1]) + tuple(params)
+        sort_options = {"Relevance": ("hits.key",), **sort_options}
+
+    sort_col, size_col, order_col = st.columns(3)
+    sort_label = sort_col.selectbox("Sort by", list(sort_options), key=name + "_sort")
+    page_size = size_col.selectbox("Rows per page", PAGE_SIZES, index=PAGE_SIZES.index(DEFAULT_PAGE_SIZE), key=name + "_page_size")
+    descending = order_col.checkbox("Descending", key=name + "_descending")
+
+    # Start again from the first page whenever the query or its ordering changes
+    signature = (source, where, tuple(params), sort_label, page_size, descending)
+    if st.session_state.get(name + "_signature") != signature:
+        st.session_state[name + "_signature"] = signature
+        st.session_state[name + "_cursors"] = [None]
+    cursors = st.session_state[name + "_cursors"]
+
+    # Each step is timed as a span (instrumentation.py): reading the page, building the table, sending it
+    placeholder = st.empty()
+    page = None
+    with span("listing.read", name):
+        if listing['table'] in REFERENCE_TABLES and not search and not where:
+            # Unfiltered Patients and Doctors pages come from the in-memory reference snapshot
+            snapshot = get_reference_snapshot(get_resources()[0])
+            sort = tuple(expression.split('.')[-1] for expression in sort_options[sort_label])
+            rows, next_cursor = snapshot.page(listing['table'], sort, cursors[-1], page_size, descending)
+            total, exact = snapshot.count(listing['table']), True
+        else:
+            if 'types' in listing:
+                # Typed listings are built as Arrow batches while the rows arrive, ids shown as names
+                page = ArrowPage(listing, page_size, get_reference_snapshot(get_resources()[0]).names)
+            rows, next_cursor, total, exact = _query_page(c, listing, placeholder, page, source, sort_options[sort_label],
+                                                          where, params, cursors[-1], page_size, descending)
+
+    if rows:
+        with span("listing.dataframe", name):
+            data = page.table() if page else pd.DataFrame(rows, columns=listing['columns'])
+        with span("listing.render", name):
+            placeholder.dataframe(data, height=600, use_container_width=True, hide_index=True)
+    elif total is not None:
+        placeholder.write(empty_message)
+
+    approx = "" if exact else "~"
+    prev_col, next_col, info_col = st.columns([1, 1, 4])
+    prev_col.button("Previous", key=name + "_previous", disabled=len(cursors) == 1, on_click=cursors.pop)
+    next_col.button("Next", key=name + "_next", disabled=next_cursor is None, on_click=cursors.append, args=(next_cursor,))
+    if total is None:
+        info_col.write(f"Page {len(cursors)} (too many rows to count)")
+    else:
+        info_col.write(f"Page {len(cursors)} of {approx}{max(1, -(-total // page_size))} ({approx}{total} rows)")
+    return rows
+
+# One page of a listing read with SQL, as (rows, next_cursor, total, exact). The page and the count
+# run on the executor of the database `c` reads (the primary or a replica): rows are drawn as they arrive, a query past its time budget is
+# stopped, and a rerun of this session cancels the previous run's queries. Batches also go into
+# `page` (an ArrowPage) when one is given.
+def _query_page(c, listing, placeholder, page, source, sort, where, params, after, page_size, descending):
+    name = listing['table']
+    executor = get_query_executor(c.cache.database, c.cache)
+    if source != listing['source'] or where:
+        counting = executor.call(session_key(name + "_count"), count_rows, source, where, params)
+    else:
+        counting = None
+    query, args, width = page_query(listing['select'], source, listing['key'], sort,
+                                    where, params, after, page_size, descending)
+    rows = []
+    paging = executor.stream(session_key(name + "_page"), query, args)
+    try:
+        for batch in paging.batches():
+            rows += batch
+            if page is not None:
+                page.append(batch)
+            # Rows so far, while more are still being read
+            if not paging.done():
+                partial = page.table() if page else pd.DataFrame([row[:-width] for row in rows[:page_size]], columns=listing['columns'])
+                placeholder.dataframe(partial, height=600, use_container_width=True, hide_index=True)
+    except QueryCancelled:
+        st.stop()
+    except QueryTimeout:
+        rows = []
+        placeholder.warning("This search took too long and was stopped. Try a more specific search.")
+    rows, next_cursor = split_page(rows, page_size, width)
+
+    try:
+        total, exact = counting.result() if counting else estimate_count(c, listing['table'])
+    except QueryCancelled:
+        st.stop()
+    except QueryTimeout:
+        total, exact = None, False
+    return rows, next_cursor, total, exact
@@ -0,0 +1,70 @@
+from datetime import datetime
+
+import pandas as pd
+import streamlit as st
+
+from changelog import consumer_lag
+from executor import get_query_executor
+from instrumentation import PROMETHEUS_FILE, SLOW_QUERY_SECONDS, get_timings
+from views.common import get_resources
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+def render(database, conn, c, writes):
+    st.title("Diagnostics")
+
+    timings = get_timings()
+    col1, col2 = st.columns([1, 5])
+    if col1.button("Reset"):
+        timings.reset()
+    if col2.button(f"Export to {PROMETHEUS_FILE}"):
+        timings.export()
+        st.success(f"Wrote {PROMETHEUS_FILE}")
+
+    queries, spans, slow = timings.report()
+    st.caption(f"Collected since {datetime.fromtimestamp(timings.started):%Y-%m-%d %H:%M:%S} by this server process")
+
+    # Page runs and their sections: where a rerun spends its time outside SQL
+    st.subheader("Pages and sections")
+    if spans:
+        spans_df = pd.DataFrame([(kind, name, count, _ms(p50), _ms(p95), _ms(p99), _ms(total))
+                                 for kind, name, count, p50, p95, p99, total in spans],
+                                columns=["Span", "Name", "Count", "p50 ms", "p95 ms", "p99 ms", "Total ms"])
+        st.dataframe(spans_df, use_container_width=True, hide_index=True)
+    else:
+        st.write("No page has run yet.")
+
+    # Every statement run on an instrumented connection, split into SQLite's work and the fetch into tuples
+    st.subheader("SQL statements")
+    if queries:
+        queries_df = pd.DataFrame([(name, count, _ms(p50), _ms(p95), _ms(p99), _ms(execute / count), _ms(fetch / count),
+                                    rows / count, _ms(total))
+                                   for name, count, p50, p95, p99, total, execute, fetch, rows in queries],
+                                  columns=["Statement", "Count", "p50 ms", "p95 ms", "p99 ms", "Execute ms (mean)",
+                                           "Fetch ms (mean)", "Rows (mean)", "Total ms"])
+        st.dataframe(queries_df, use_container_width=True, hide_index=True)
+    else:
+        st.write("No statement has run yet.")
+
+    st.subheader(f"Slow statements (over {SLOW_QUERY_SECONDS * 1000:.0f} ms)")
+    if not slow:
+        st.write("None so far.")
+    for entry in slow:
+        with st.expander(f"{_ms(entry['seconds'])} ms, {entry['rows']} rows at {datetime.fromtimestamp(entry['at']):%H:%M:%S}"):
+            st.code(entry['statement'], language="sql")
+            st.write(f"Execute {_ms(entry['execute_seconds'])} ms, fetch {_ms(entry['fetch_seconds'])} ms")
+            st.code("\n".join(entry['plan']) or "(no plan)")
+
+    executor_stats = get_query_executor(*get_resources()[:2]).stats()
+    st.caption(f"Query executor: {executor_stats['running']} running, {executor_stats['cancelled']} cancelled, "
+               f"{executor_stats['timeouts']} timed out")
+
+    # Downstream readers of the change log and how far behind they are
+    st.subheader("Change log consumers")
+    lag = consumer_lag(conn)
+    if lag:
+        st.dataframe(pd.DataFrame(lag, columns=["Consumer", "Acknowledged", "Waiting", "Last acknowledged"]),
+                     use_container_width=True, hide_index=True)
+    else:
+        st.write("No consumer registered; changes are not logged.")
@@ -0,0 +1,80 @@
+import streamlit as st
+
+from crud import add_doctor, delete_doctor, update_doctor
+from search import search_join
+from views.common import show_listing, typeahead_search
+
+def render(database, conn, c, writes):
+    st.title("Manage Doctors")
+
+    col1, col2 = st.columns([1, 2])  # Split into columns
+
+    with col1:
+        # Add New Doctor
+        with st.form("new_doctor_form", clear_on_submit=True):
+            st.write("Add New Doctor")
+            first_name = st.text_input("First Name", key="doc_first_name")
+            last_name = st.text_input("Last Name", key="doc_last_name")
+            department = st.text_input("Department", key="doc_department")
+            contact = st.text_input("Contact Number", key="doc_contact")
+            submit_button = st.form_submit_button("Add Doctor")
+
+            if submit_button:
+                writes.run(add_doctor, first_name, last_name, department, contact)
+                st.success("Doctor Added Successfully")
+
+        # Modify Doctor Information
+        with st.form("modify_doctor_form", clear_on_submit=True):
+            st.write("Modify Doctor Information")
+            doctor_id = st.number_input("Doctor ID to Modify", min_value=1, step=1, key="modify_doc_id")
+            first_name = st.text_input("First Name", key="modify_doc_first_name")
+            last_name = st.text_input("Last Name", key="modify_doc_last_name")
+            department = st.text_input("Department", key="modify_doc_department")
+            contact = st.text_input("Contact Number", key="modify_doc_contact")
+            submit_button_modify = st.form_submit_button("Update Doctor")
+
+            if submit_button_modify:
+                writes.run(update_doctor, doctor_id, first_name, last_name, department, contact)
+                st.success("Doctor Information Updated Successfully")
+
+        # Delete Doctor
+        with st.form("delete_doctor_form", clear_on_submit=True):
+            st.write("Delete Doctor")
+            doctor_id_delete = st.number_input("Doctor ID to Delete", min_value=1, step=1, key="delete_doc_id")
+            submit_button_delete = st.form_submit_button("Delete Doctor")
+
+            if submit_button_delete:
+                writes.run(delete_doctor, doctor_id_delete)
+                st.success("Doctor Deleted Successfully")
+
+    with col2:
+        st.write("Search Doctors")
+        with st.form("search_doctors_form"):
+            search_field_doctors = st.selectbox("Search by", ["Doctor ID", "First Name", "Last Name", "Department"])
+            search_query_doctors = st.text_input("Search Query")
+            submit_button_search_doctors = st.form_submit_button("Search")
+
+        # Keep the submitted search across reruns so paging does not drop it
+        if submit_button_search_doctors:
+            st.session_state["doctors_search"] = (search_field_doctors, search_query_doctors)
+        search_field_doctors, search_query_doctors = st.session_state.get("doctors_search", ("Doctor ID", ""))
+
+        search, where, params = None, None, ()
+        if search_query_doctors:
+            if search_field_doctors == "Doctor ID":
+                where, params = "Doctors.DoctorID LIKE ?", ("%"+search_query_doctors+"%",)
+            elif search_field_doctors == "First Name":
+                search = search_join(c, "Doctors.DoctorID", "Doctors", search_query_doctors, ["FirstName"])
+            elif search_field_doctors == "Last Name":
+                search = search_join(c, "Doctors.DoctorID", "Doctors", search_query_doctors, ["LastName"])
+            elif search_field_doctors == "Department":
+                search = search_join(c, "Doctors.DoctorID", "Doctors", search_query_doctors, ["Department"])
+
+        # Search as you type takes over from the form while its box holds text
+        quick = typeahead_search(c, "doctors", {"Doctor": ("Doctors", "Doctors.DoctorID")})
+        if quick:
+            search, where, params = quick, None, ()
+
+        # Display Doctors
+        st.write("Registered Doctors")
+        show_listing(c, "Doctors", "No doctors found.", search, where, params)
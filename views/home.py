@@ -0,0 +1,40 @@
+import streamlit as st
+
+from charts import get_chart_service
+from instrumentation import span
+from metrics import get_metrics
+
+def render(database, conn, c, writes):
+    st.title("Healthcare Patient Management System - Home")
+    st.write("Welcome to the Healthcare Patient Management System")
+
+    # System Introduction and Description
+    st.markdown("""
+    The Healthcare Patient Management System is designed to streamline the management of patient records, appointments, medical histories, and doctor information in a healthcare setting. This system allows for efficient organization and access to patient and doctor information, enhancing the quality of care provided. Key features include:
+
+    - **Patient Management**: Register new patients, update their details, or remove patient records as needed. Keep track of personal details like names, birth dates, and contact information.
+
+    - **Doctor Management**: Manage doctor profiles, including adding new doctors, updating their information, and removing them from the system. Keep track of doctors' names, departments, and contact information.
+
+    - **Appointment Scheduling**: Schedule, view, update, or cancel appointments. Manage appointment dates and times, and keep track of upcoming and past appointments.
+
+    - **Medical Record Keeping**: Maintain comprehensive medical records for each patient. Add new records, update diagnoses, and manage historical health data.
+    """)
+
+    # Quick Summary of System Data, read from the trigger-maintained summary tables and cached across sessions
+    metrics = get_metrics(database)
+
+    # Visualization of Patient Age Distribution from the precomputed bin counts: drawn on the chart
+    # service's workers while the metrics below are sent, and only redrawn when the counts change
+    age_chart = get_chart_service().submit('age_histogram', {'edges': metrics['age_edges'], 'counts': metrics['age_counts']})
+
+    col1, col2, col3, col4, col5 = st.columns(5)
+    col1.metric("Total Patients", metrics['total_patients'])
+    col2.metric("Total Doctors", metrics['total_doctors'])
+    col3.metric("Total Appointments", metrics['total_appointments'])
+    col4.metric("Upcoming Appointments", metrics['upcoming_appointments'])
+    col5.metric("Total Medical Records", metrics['total_medical_records'])
+
+    with span("chart", "age_histogram"):
+        image = age_chart.result()
+    st.image(image, width=400)
@@ -0,0 +1,103 @@
+import os
+import sqlite3
+import tempfile
+import time
+
+import pandas as pd
+import streamlit as st
+
+from bulk_io import FORMATS, TABLES, detect_format, export, import_file
+from replication import get_replicas
+
+# Largest export offered for download here; Streamlit reads the whole file into memory
+# for the button, so bigger tables go through the command line (python bulk_io.py export)
+EXPORT_MAX_ROWS = 100000
+# Prepared exports older than this are removed, including those of sessions that have ended
+EXPORT_MAX_AGE = 3600
+
+def render(database, conn, c, writes):
+    st.title("Import / Export")
+
+    col1, col2 = st.columns(2)  # Split into columns
+
+    with col1:
+        # Bulk import: the file is read, validated and inserted in chunks
+        with st.form("import_form", clear_on_submit=True):
+            st.write("Import Data")
+            import_table = st.selectbox("Table", list(TABLES), key="import_table")
+            uploaded_file = st.file_uploader("CSV, Parquet or NDJSON file", type=["csv", "parquet", "ndjson", "jsonl", "json"])
+            submit_button_import = st.form_submit_button("Import")
+
+            if submit_button_import and uploaded_file is not None:
+                try:
+                    summary = import_file(database, import_table, uploaded_file, detect_format(uploaded_file.name))
+                except (ValueError, sqlite3.Error) as e:
+                    st.error(f"Import failed: {e}")
+                else:
+                    st.success(f"Imported {summary['loaded']} rows into {import_table}, rejected {summary['rejected']}")
+                    if summary['errors']:
+                        errors_df = pd.DataFrame(summary['errors'], columns=["Row", "Problem"])
+                        st.dataframe(errors_df, use_container_width=True, hide_index=True)
+
+    with col2:
+        # Export: rows are streamed to the file in chunks, then offered for download
+        with st.form("export_form"):
+            st.write("Export Data")
+            export_table = st.selectbox("Table", list(TABLES), key="export_table")
+            export_format = st.selectbox("Format", FORMATS, key="export_format")
+            submit_button_export = st.form_submit_button("Prepare Export")
+
+        if submit_button_export:
+            # Full-table reads go to a replica when one is fresh enough, away from the primary.
+            # Rows are streamed to a temporary file, so only the download itself reads them back.
+            _sweep_exports()
+            _discard_export()
+            source = get_replicas(database).route()
+            try:
+                rows = source.reader().execute(
+                    f"SELECT COUNT(*) FROM (SELECT 1 FROM {export_table} LIMIT {EXPORT_MAX_ROWS + 1})").fetchone()[0]
+                if rows > EXPORT_MAX_ROWS:
+                    st.warning(f"{export_table} has more than {EXPORT_MAX_ROWS} rows; export it from the command line: "
+                               f"python bulk_io.py export {export_table} {export_table}.{export_format}")
+                else:
+                    handle = tempfile.NamedTemporaryFile(prefix="export_", suffix="." + export_format, delete=False)
+                    try:
+                        with handle:
+                            exported = export(source, export_table, handle.file, export_format)
+                    except ValueError as e:
+                        os.remove(handle.name)
+                        st.error(f"Export failed: {e}")
+                    else:
+                        st.session_state["export_file"] = (f"{export_table}.{export_format}", handle.name, exported)
+            finally:
+                if source is not database:
+                    source.release_reader()
+
+        if "export_file" in st.session_state:
+            file_name, path, exported = st.session_state["export_file"]
+            if os.path.exists(path):
+                st.write(f"{exported} rows ready")
+                with open(path, 'rb') as data:
+                    st.download_button("Download " + file_name, data, file_name=file_name)
+            else:
+                del st.session_state["export_file"]
+
+# Remove the file of the previously prepared export
+def _discard_export():
+    previous = st.session_state.pop("export_file", None)
+    if previous and os.path.exists(previous[1]):
+        os.remove(previous[1])
+
+# Remove prepared exports older than EXPORT_MAX_AGE, whichever session made them
+def _sweep_exports():
+    cutoff = time.time() - EXPORT_MAX_AGE
+    directory = tempfile.gettempdir()
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if not name.startswith("export_"):
+            continue
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass  # already removed by another session
@@ -0,0 +1,76 @@
+import streamlit as st
+
+from crud import add_medical_record, delete_medical_record, update_medical_record
+from search import search_join
+from views.common import show_listing, typeahead_search
+
+def render(database, conn, c, writes):
+    st.title("Manage Medical Records")
+
+    col1, col2 = st.columns([1, 2])  # Split into columns
+
+    with col1:
+        # Add New Medical Record
+        with st.form("new_medical_record_form", clear_on_submit=True):
+            st.write("Add New Medical Record")
+            appointment_id_record = st.number_input("Appointment ID for Record", min_value=1, step=1, key="new_med_rec_app_id")
+            diagnosis = st.text_area("Diagnosis", key="new_med_rec_diagnosis")
+            details = st.text_area("Details", key="new_med_rec_details")
+            submit_button_record = st.form_submit_button("Submit Medical Record")
+
+            if submit_button_record:
+                writes.run(add_medical_record, appointment_id_record, diagnosis, details)
+                st.success("Medical Record Added Successfully")
+
+        # Modify Medical Record
+        with st.form("modify_medical_record_form", clear_on_submit=True):
+            st.write("Modify Medical Record")
+            record_id = st.number_input("Record ID to Modify", min_value=1, step=1, key="mod_med_rec_id")
+            new_diagnosis = st.text_area("New Diagnosis", key="mod_med_rec_diagnosis")
+            new_details = st.text_area("New Details", key="mod_med_rec_details")
+            submit_button_modify_record = st.form_submit_button("Update Medical Record")
+
+            if submit_button_modify_record:
+                writes.run(update_medical_record, record_id, new_diagnosis, new_details)
+                st.success("Medical Record Updated Successfully")
+
+        # Delete Medical Record
+        with st.form("delete_medical_record_form", clear_on_submit=True):
+            st.write("Delete Medical Record")
+            record_id_delete = st.number_input("Record ID to Delete", min_value=1, step=1, key="del_med_rec_id")
+            submit_button_delete_record = st.form_submit_button("Delete Medical Record")
+
+            if submit_button_delete_record:
+                writes.run(delete_medical_record, record_id_delete)
+                st.success("Medical Record Deleted Successfully")
+
+    with col2:
+        st.write("Search Medical Records")
+        with st.form("search_medical_records_form"):
+            search_field_medical_records = st.selectbox("Search by", ["Patient Name", "Doctor Name", "Diagnosis"])
+            search_query_medical_records = st.text_input("Search Query")
+            submit_button_search_medical_records = st.form_submit_button("Search")
+
+        # Keep the submitted search across reruns so paging does not drop it
+        if submit_button_search_medical_records:
+            st.session_state["medical_records_search"] = (search_field_medical_records, search_query_medical_records)
+        search_field_medical_records, search_query_medical_records = st.session_state.get("medical_records_search", ("Patient Name", ""))
+
+        search = None
+        if search_query_medical_records:
+            if search_field_medical_records == "Patient Name":
+                search = search_join(c, "Appointments.PatientID", "Patients", search_query_medical_records, ["FirstName", "LastName"])
+            elif search_field_medical_records == "Doctor Name":
+                search = search_join(c, "Appointments.DoctorID", "Doctors", search_query_medical_records, ["FirstName", "LastName"])
+            elif search_field_medical_records == "Diagnosis":
+                search = search_join(c, "MedicalRecords.RecordID", "MedicalRecords", search_query_medical_records, ["Diagnosis"])
+
+        # Search as you type takes over from the form while its box holds text
+        quick = typeahead_search(c, "medical_records", {"Patient": ("Patients", "Appointments.PatientID"),
+                                                        "Doctor": ("Doctors", "Appointments.DoctorID")})
+        if quick:
+            search = quick
+
+        # Display Medical Records
+        st.write("Existing Medical Records")
+        show_listing(c, "MedicalRecords", "No medical records found.", search)
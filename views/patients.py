@@ -0,0 +1,82 @@
+from datetime import date
+
+import streamlit as st
+
+from crud import add_patient, delete_patient, update_patient
+from search import search_join
+from views.common import show_listing, typeahead_search
+
+def render(database, conn, c, writes):
+    st.title("Manage Patients")
+  
+    col1, col2 = st.columns([1,2]) # Split into columns
+    
+    with col1:
+        # Add New Patient
+        with st.form("new_patient_form", clear_on_submit=True):
+            st.write("Add New Patient")
+            first_name = st.text_input("First Name")
+            last_name = st.text_input("Last Name")
+            dob = st.date_input("Date of Birth", min_value=date(1900, 1, 1))
+            contact = st.text_input("Contact Number")
+            submit_button = st.form_submit_button("Submit")
+
+            if submit_button:
+                writes.run(add_patient, first_name, last_name, dob, contact)
+                st.success("Patient Added Successfully")
+
+        # Modify Patient Information
+        with st.form("modify_patient_form", clear_on_submit=True):
+            st.write("Modify Patient Information")
+            patient_id = st.number_input("Patient ID to Modify", min_value=1, step=1)
+            first_name = st.text_input("First Name")
+            last_name = st.text_input("Last Name")
+            dob = st.date_input("Date of Birth", min_value=date(1900, 1, 1))
+            contact = st.text_input("Contact Number")
+            submit_button_modify = st.form_submit_button("Update Patient")
+
+            if submit_button_modify:
+                writes.run(update_patient, patient_id, first_name, last_name, dob, contact)
+                st.success("Patient Information Updated Successfully")
+
+        # Delete Patient
+        with st.form("delete_patient_form", clear_on_submit=True):
+            st.write("Delete Patient")
+            patient_id_delete = st.number_input("Patient ID to Delete", min_value=1, step=1)
+            submit_button_delete = st.form_submit_button("Delete Patient")
+
+            if submit_button_delete:
+                writes.run(delete_patient, patient_id_delete)
+                st.success("Patient Deleted Successfully")
+
+    with col2:
+        st.write("Search Patients")
+        with st.form("search_patients_form"):
+            search_field_patients = st.selectbox("Search by", ["Patient ID", "First Name", "Last Name", "Contact"])
+            search_query_patients = st.text_input("Search Query")
+            submit_button_search_patients = st.form_submit_button("Search")
+
+        # Keep the submitted search across reruns so paging does not drop it
+        if submit_button_search_patients:
+            st.session_state["patients_search"] = (search_field_patients, search_query_patients)
+        search_field_patients, search_query_patients = st.session_state.get("patients_search", ("Patient ID", ""))
+
+        search, where, params = None, None, ()
+        if search_query_patients:
+            if search_field_patients == "Patient ID":
+                where, params = "Patients.PatientID LIKE ?", ("%"+search_query_patients+"%",)
+            elif search_field_patients == "First Name":
+                search = search_join(c, "Patients.PatientID", "Patients", search_query_patients, ["FirstName"])
+            elif search_field_patients == "Last Name":
+                search = search_join(c, "Patients.PatientID", "Patients", search_query_patients, ["LastName"])
+            elif search_field_patients == "Contact":
+                search = search_join(c, "Patients.PatientID", "Patients", search_query_patients, ["ContactNumber"])
+
+        # Search as you type takes over from the form while its box holds text
+        quick = typeahead_search(c, "patients", {"Patient": ("Patients", "Patients.PatientID")})
+        if quick:
+            search, where, params = quick, None, ()
+
+        # Display Patients
+        st.write("Registered Patients")
+        show_listing(c, "Patients", "No patients found.", search, where, params)
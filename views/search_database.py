@@ -0,0 +1,92 @@
+import pandas as pd
+import streamlit as st
+
+from history import appointment_records
+from search import search_join
+from views.common import show_listing
+
+def render(database, conn, c, writes):
+    st.title("Search Patient Records")
+
+    # Step 1: Selection of the search field
+    key = 'search_field'
+    if key not in st.session_state:
+        st.session_state[key] = "Patient ID"
+
+    new_search_field = st.selectbox("Choose a field to search by", 
+                                    ["Patient ID", "First Name", "Last Name", "Date of Birth", "Contact Number"],
+                                    key=key)
+
+    # Reset the confirmation state if the selection changes
+    if new_search_field != st.session_state[key]:
+        st.session_state[key] = new_search_field
+        if 'search_field_confirmed' in st.session_state:
+            del st.session_state['search_field_confirmed']
+        if 'search_database' in st.session_state:
+            del st.session_state['search_database']
+
+    if st.button("Press to Confirm Search Field"):
+        st.session_state['search_field_confirmed'] = new_search_field
+
+    # Step 2: Input and Search
+    if 'search_field_confirmed' in st.session_state:
+        with st.form("search_patient_form"):
+            search_field = st.session_state['search_field_confirmed']
+
+            if search_field == "Patient ID":
+                search_value = st.number_input("Patient ID", min_value=0, step=1)
+            elif search_field == "First Name":
+                search_value = st.text_input("First Name")
+            elif search_field == "Last Name":
+                search_value = st.text_input("Last Name")
+            elif search_field == "Date of Birth":
+                search_value = st.date_input("Date of Birth")
+            elif search_field == "Contact Number":
+                search_value = st.text_input("Contact Number")
+
+            submit_button_search = st.form_submit_button("Search")
+
+        # Keep the submitted search across reruns so paging does not drop it
+        if submit_button_search:
+            if search_field == "Date of Birth":
+                search_value = search_value.strftime("%Y-%m-%d")
+            st.session_state['search_database'] = (search_field, search_value)
+
+    if 'search_database' in st.session_state:
+        search_field, search_value = st.session_state['search_database']
+
+        # Matching patients are listed once each; the chosen patient's history comes from the timeline table
+        search, where, params = None, None, ()
+        if search_field == "Patient ID":
+            where, params = "Patients.PatientID = ?", (search_value,)
+        elif search_field == "First Name":
+            search = search_join(c, "Patients.PatientID", "Patients", search_value, ["FirstName"])
+        elif search_field == "Last Name":
+            search = search_join(c, "Patients.PatientID", "Patients", search_value, ["LastName"])
+        elif search_field == "Date of Birth":
+            where, params = "Patients.DateOfBirth = ?", (search_value,)
+        elif search_field == "Contact Number":
+            search = search_join(c, "Patients.PatientID", "Patients", search_value, ["ContactNumber"])
+
+        # Display the search results
+        patients = show_listing(c, "Patients", "No patients found with the provided search criteria.", search, where, params)
+
+        if patients:
+            patient = st.selectbox("Open patient", patients, key="timeline_patient",
+                                   format_func=lambda row: f"{row[0]} - {row[1]} {row[2]}")
+            patient_id, first_name, last_name, dob, contact = patient
+            st.subheader(f"{first_name} {last_name}")
+            st.write(f"Patient ID {patient_id} · Born {dob} · Contact {contact}")
+
+            # Appointments in date order, one row each, with record counts instead of the records themselves
+            visits = show_listing(c, "PatientTimeline", "No appointments recorded for this patient.",
+                                  where="PatientTimeline.PatientID = ?", params=(patient_id,))
+
+            # Records are only read for the appointments the user expands
+            with_records = [visit for visit in visits if visit[7]]
+            expanded = st.multiselect("Show medical records for", with_records, key="timeline_expanded",
+                                      format_func=lambda visit: f"{visit[1]} {visit[2]} - {visit[8]}")
+            if expanded:
+                records = appointment_records(c, [visit[0] for visit in expanded])
+                records_df = pd.DataFrame(records, columns=["Record ID", "Appointment ID", "Diagnosis", "Details"])
+                st.dataframe(records_df, use_container_width=True, hide_index=True)